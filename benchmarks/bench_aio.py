@@ -0,0 +1,132 @@
+"""
+Benchmark lado a lado: servidor AV com pool de threads vs grpc.aio
+Mede chamadas unárias concorrentes, com e sem streams WatchResults abertos
+"""
+
+import argparse
+import asyncio
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+
+import grpc
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from generated import voting_pb2
+from generated import voting_pb2_grpc
+from servers.signed_credentials import CredentialSigner, load_key
+
+
+ROOT = os.path.join(os.path.dirname(__file__), '..')
+# Credenciais como as da AR (o servidor verifica o MAC com a mesma chave)
+SIGNER = CredentialSigner(load_key()[0])
+
+
+def free_port():
+    """Porta TCP livre em localhost"""
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def start_server(port, use_aio):
+    """Arranca o servidor AV num processo separado"""
+    cmd = [sys.executable, os.path.join(ROOT, "servers", "voting_server.py"), "--port", str(port)]
+    if use_aio:
+        cmd.append("--aio")
+    return subprocess.Popen(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+
+async def load(stub, concurrency, calls, deadline, first=0):
+    """`concurrency` tarefas a fazer Vote/GetResults em ciclo fechado (séries a partir de `first`)"""
+    latencies = []
+    errors = 0
+    
+    async def worker(index):
+        nonlocal errors
+        for n in range(calls):
+            start = time.perf_counter()
+            try:
+                if n % 2:
+                    await stub.GetResults(voting_pb2.GetResultsRequest(), timeout=deadline)
+                else:
+                    await stub.Vote(voting_pb2.VoteRequest(
+                        voting_credential=SIGNER.sign(first + index * calls + n),
+                        candidate_id=n % 4 + 1
+                    ), timeout=deadline)
+                latencies.append(time.perf_counter() - start)
+            except grpc.aio.AioRpcError:
+                errors += 1
+    
+    start = time.perf_counter()
+    await asyncio.gather(*(worker(i) for i in range(concurrency)))
+    elapsed = time.perf_counter() - start
+    
+    latencies.sort()
+    if not latencies:
+        return 0, float("nan"), float("nan"), errors
+    p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))]
+    return len(latencies) / elapsed, statistics.median(latencies) * 1000, p99 * 1000, errors
+
+
+async def measure(port, args):
+    """Mede a carga unária sem e com observadores abertos"""
+    async with grpc.aio.insecure_channel(f'127.0.0.1:{port}') as channel:
+        stub = voting_pb2_grpc.VotingServiceStub(channel)
+        await channel.channel_ready()
+        
+        report = {"sem observadores": await load(stub, args.concurrency, args.calls, args.deadline)}
+        
+        # Streams abertos e inativos (ex.: dashboards à espera de alterações)
+        watchers = [stub.WatchResults(voting_pb2.WatchResultsRequest()) for _ in range(args.watchers)]
+        await asyncio.sleep(1)
+        report[f"{args.watchers} observadores"] = await load(
+            stub, args.concurrency, args.calls, args.deadline, first=args.concurrency * args.calls
+        )
+        for call in watchers:
+            call.cancel()
+    
+    return report
+
+
+async def compare(args):
+    """Mede os dois modos no mesmo event loop do cliente"""
+    reports = {}
+    for label, use_aio in (("threads", False), ("asyncio", True)):
+        port = free_port()
+        process = start_server(port, use_aio)
+        try:
+            reports[label] = await measure(port, args)
+        finally:
+            process.terminate()
+            process.wait()
+    return reports
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--concurrency", type=int, default=200,
+                        help="Chamadas em curso em simultâneo")
+    parser.add_argument("--calls", type=int, default=50,
+                        help="Chamadas por tarefa")
+    parser.add_argument("--watchers", type=int, default=500,
+                        help="Streams WatchResults abertos na segunda medição")
+    parser.add_argument("--deadline", type=float, default=5.0,
+                        help="Deadline por chamada (s)")
+    args = parser.parse_args()
+    
+    reports = asyncio.run(compare(args))
+    
+    print(f"🧪 {args.concurrency} chamadas concorrentes x {args.calls}\n")
+    print(f"{'modo':<9} {'cenário':<18} {'chamadas/s':>11} {'p50 (ms)':>9} {'p99 (ms)':>9} {'erros':>6}")
+    for label, report in reports.items():
+        for scenario, (rate, p50, p99, errors) in report.items():
+            print(f"{label:<9} {scenario:<18} {rate:>11.0f} {p50:>9.2f} {p99:>9.2f} {errors:>6}")
+
+
+if __name__ == "__main__":
+    main()
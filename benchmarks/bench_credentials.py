@@ -0,0 +1,95 @@
+"""
+Benchmark das credenciais usadas (AR e AV)
+Memória e tempo de consulta: set de strings vs CredentialStore (com e sem Bloom)
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from servers.credential_store import CredentialStore
+from servers.tally import credential_digest
+
+
+def credential(n):
+    """Credencial sintética no formato das emitidas pela AR"""
+    return f"CRED-{n:06d}-{n * 7919 % 1_000_000:06d}"
+
+
+def set_bytes(used):
+    """Memória do set: tabela do set + um objeto str por credencial"""
+    return sys.getsizeof(used) + sum(sys.getsizeof(c) for c in used)
+
+
+def lookup_rate(contains, keys):
+    """Consultas por segundo"""
+    start = time.perf_counter()
+    for key in keys:
+        contains(key)
+    return len(keys) / (time.perf_counter() - start)
+
+
+def run_set(size, lookups):
+    used = {credential(n) for n in range(size)}
+    hits = [credential(random.randrange(size)) for _ in range(lookups)]
+    misses = [credential(size + n) for n in range(lookups)]
+    memory = set_bytes(used)
+    rates = (
+        lookup_rate(lambda c: c in used, hits),
+        lookup_rate(lambda c: c in used, misses),
+    )
+    return memory, rates
+
+
+def run_store(size, lookups, bloom_bits):
+    store = CredentialStore(capacity=size, bloom_bits=bloom_bits)
+    for n in range(size):
+        store.add(credential_digest(credential(n)))
+    hits = [credential(random.randrange(size)) for _ in range(lookups)]
+    misses = [credential(size + n) for n in range(lookups)]
+    # O digest faz parte da consulta (é o que o handler paga)
+    rates = (
+        lookup_rate(lambda c: credential_digest(c) in store, hits),
+        lookup_rate(lambda c: credential_digest(c) in store, misses),
+    )
+    return store.nbytes, rates
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sizes", default="10000000,50000000",
+                        help="Números de credenciais usadas a testar")
+    parser.add_argument("--lookups", type=int, default=200_000)
+    parser.add_argument("--bloom-bits", type=int, default=10)
+    parser.add_argument("--set-limit", type=int, default=10_000_000,
+                        help="Acima deste tamanho a memória do set é estimada (não construído)")
+    args = parser.parse_args()
+    
+    print(f"{'credenciais':>12} {'estrutura':>14} {'MB':>9} {'B/cred':>7} "
+          f"{'hit/s':>10} {'miss/s':>10}")
+    
+    set_per_entry = None
+    for size in (int(s) for s in args.sizes.split(",")):
+        if size <= args.set_limit:
+            memory, (hit, miss) = run_set(size, args.lookups)
+            set_per_entry = memory / size
+            print(f"{size:>12} {'set[str]':>14} {memory / 2**20:>9.1f} {set_per_entry:>7.1f} "
+                  f"{hit:>10.0f} {miss:>10.0f}")
+        elif set_per_entry is not None:
+            memory = set_per_entry * size
+            print(f"{size:>12} {'set[str] est.':>14} {memory / 2**20:>9.1f} {set_per_entry:>7.1f} "
+                  f"{'-':>10} {'-':>10}")
+        
+        for bloom_bits in (0, args.bloom_bits):
+            memory, (hit, miss) = run_store(size, args.lookups, bloom_bits)
+            name = f"store+bloom{bloom_bits}" if bloom_bits else "store"
+            print(f"{size:>12} {name:>14} {memory / 2**20:>9.1f} {memory / size:>7.1f} "
+                  f"{hit:>10.0f} {miss:>10.0f}")
+
+
+if __name__ == "__main__":
+    main()
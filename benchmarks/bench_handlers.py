@@ -0,0 +1,304 @@
+"""
+Microbenchmark dos handlers em processo (sem rede nem gRPC)
+Chama os métodos dos servicers diretamente com um contexto falso e compara com uma baseline
+    
+    python benchmarks/bench_handlers.py --save-baseline baseline.json
+    python benchmarks/bench_handlers.py --baseline baseline.json --threshold 0.15
+"""
+
+import argparse
+import itertools
+import json
+import os
+import platform
+import sys
+import threading
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from generated import voting_pb2
+from generated import voter_pb2
+from servers import request_log
+from servers.candidates import CandidateRegistry
+from servers.credential_pool import CredentialPool
+from servers.signed_credentials import CredentialSigner, load_key
+from servers.voter_server import VoterRegistrationService
+from servers.voting_server import VotingService
+
+
+# Credenciais como as da AR (a AV verifica o MAC com a mesma chave)
+SIGNER = CredentialSigner(load_key()[0])
+
+
+class FakeContext:
+    """Contexto mínimo de um handler unário (nunca cancelado, sem metadados)"""
+    
+    def __init__(self):
+        self.code = None
+        self.details = None
+    
+    def is_active(self):
+        return True
+    
+    def time_remaining(self):
+        return None
+    
+    def invocation_metadata(self):
+        return ()
+    
+    def peer(self):
+        return "ipv4:127.0.0.1:0"
+    
+    def set_code(self, code):
+        self.code = code
+    
+    def set_details(self, details):
+        self.details = details
+    
+    def add_callback(self, callback):
+        return True
+    
+    def abort(self, code, details):
+        raise RuntimeError(f"{code}: {details}")
+
+
+class Everyone:
+    """Caderno eleitoral em que todos os cartões são elegíveis"""
+    
+    def __contains__(self, citizen_card_number):
+        return True
+
+
+def synthetic_ballot(size):
+    return CandidateRegistry(
+        (cid, f"Candidato {cid}", f"Eleição {cid % 10}", f"Círculo {cid % 20}")
+        for cid in range(1, size + 1)
+    )
+
+
+def parse_sizes(text):
+    return [int(value) for value in text.split(",") if value]
+
+
+def voting_service(candidates, electorate, log):
+    """AV com `electorate` credenciais já usadas (séries 0 a electorate - 1)"""
+    service = VotingService(candidates=synthetic_ballot(candidates), log=log)
+    ids = service.candidates.ids()
+    batch = 100_000
+    for start in range(0, electorate, batch):
+        service.tally.cast_many([
+            (SIGNER.sign(n), ids[n % len(ids)]) for n in range(start, min(electorate, start + batch))
+        ])
+    return service
+
+
+def voter_service(electorate, log):
+    """AR com `electorate` cartões a que já foi emitida credencial"""
+    service = VoterRegistrationService(
+        log=log, pool=CredentialPool(block_size=50_000), registry=Everyone()
+    )
+    batch = 10_000
+    for start in range(0, electorate, batch):
+        service._issue_batch([
+            voter_pb2.VoterRequest(citizen_card_number=f"PRE{n:09d}")
+            for n in range(start, min(electorate, start + batch))
+        ])
+    return service
+
+
+def cases(args, log):
+    """
+    Casos a medir: (nome, parâmetros, fábrica)
+    
+    A fábrica prepara o estado e devolve (call(i), close); call(i) faz a
+    i-ésima chamada com pedidos nunca repetidos.
+    """
+    for electorate in args.electorates:
+        def vote(electorate=electorate):
+            service = voting_service(args.candidates[0], electorate, log)
+            ids = service.candidates.ids()
+            context = FakeContext()
+            # Séries novas a seguir às já usadas; assinar conta na medição
+            # (~HMAC, o mesmo custo que a verificação no handler)
+            requests = lambda i: voting_pb2.VoteRequest(
+                voting_credential=SIGNER.sign(electorate + i), candidate_id=ids[i % len(ids)]
+            )
+            return (lambda i: service.Vote(requests(i), context)), (lambda: None)
+        yield "Vote", {"electorate": electorate, "candidates": args.candidates[0]}, vote
+        
+        def issue(electorate=electorate):
+            service = voter_service(electorate, log)
+            context = FakeContext()
+            requests = lambda i: voter_pb2.VoterRequest(citizen_card_number=f"BENCH{i:09d}")
+            return (lambda i: service.IssueVotingCredential(requests(i), context)), service.pool.close
+        yield "IssueVotingCredential", {"electorate": electorate}, issue
+    
+    for candidates in args.candidates:
+        for name, request in (
+            ("GetResults", voting_pb2.GetResultsRequest()),
+            ("GetCandidates", voting_pb2.GetCandidatesRequest()),
+        ):
+            def read(candidates=candidates, name=name, request=request):
+                service = voting_service(candidates, 0, log)
+                handler, context = getattr(service, name), FakeContext()
+                return (lambda i: handler(request, context)), (lambda: None)
+            yield name, {"candidates": candidates}, read
+
+
+def measure_rate(call, calls, threads, offset):
+    """Chamadas por segundo com `threads` threads a repartir `calls` chamadas"""
+    per_thread = calls // threads
+    barrier = threading.Barrier(threads + 1)
+    
+    def worker(index):
+        first = offset + index * per_thread
+        barrier.wait()
+        for i in range(first, first + per_thread):
+            call(i)
+    
+    pool = [threading.Thread(target=worker, args=(t,)) for t in range(threads)]
+    for t in pool:
+        t.start()
+    barrier.wait()
+    start = time.perf_counter()
+    for t in pool:
+        t.join()
+    return per_thread * threads / (time.perf_counter() - start)
+
+
+def measure_allocations(call, calls, offset):
+    """
+    Memória por chamada (uma thread, com tracemalloc)
+    
+    Returns:
+        tuple: (pico de bytes alocados por chamada, blocos retidos por chamada)
+    """
+    tracemalloc.start()
+    try:
+        peak_total = 0
+        before_blocks = sys.getallocatedblocks()
+        for i in range(offset, offset + calls):
+            tracemalloc.reset_peak()
+            current, _ = tracemalloc.get_traced_memory()
+            call(i)
+            _, peak = tracemalloc.get_traced_memory()
+            peak_total += peak - current
+        retained = sys.getallocatedblocks() - before_blocks
+    finally:
+        tracemalloc.stop()
+    return peak_total / calls, retained / calls
+
+
+def case_key(name, params, threads):
+    values = ",".join(f"{k}={v}" for k, v in sorted(params.items()))
+    return f"{name}[{values},threads={threads}]"
+
+
+def run(args):
+    log = request_log.RequestLog(stream=open(os.devnull, "w"), level=request_log.LEVELS[args.log_level])
+    results = {}
+    try:
+        for name, params, factory in cases(args, log):
+            if args.only and name not in args.only:
+                continue
+            call, close = factory()
+            offset = itertools.count(0, 10 * args.calls)
+            try:
+                # Aquecimento (caches de respostas, crescimento das tabelas)
+                measure_rate(call, min(args.calls, 1000), 1, next(offset))
+                alloc_bytes, retained_blocks = measure_allocations(call, args.alloc_calls, next(offset))
+                for threads in args.threads:
+                    best = max(
+                        measure_rate(call, args.calls, threads, next(offset))
+                        for _ in range(args.repeat)
+                    )
+                    key = case_key(name, params, threads)
+                    results[key] = {
+                        "ops_per_sec": round(best, 1),
+                        "alloc_bytes_per_call": round(alloc_bytes, 1),
+                        "retained_blocks_per_call": round(retained_blocks, 3),
+                    }
+                    print(f"   {key:<58}{best:>12,.0f} op/s{alloc_bytes:>10,.0f} B/chamada")
+            finally:
+                close()
+    finally:
+        log.close()
+    return results
+
+
+def compare(results, baseline, threshold):
+    """
+    Casos piores do que a baseline além do limiar
+    
+    Returns:
+        list: Mensagens das regressões
+    """
+    regressions = []
+    for key, current in results.items():
+        old = baseline.get(key)
+        if old is None:
+            continue
+        change = current["ops_per_sec"] / old["ops_per_sec"] - 1
+        marker = "❌" if change < -threshold else "  "
+        print(f"{marker} {key:<58}{change * 100:>+8.1f}% op/s")
+        if change < -threshold:
+            regressions.append(f"{key}: {old['ops_per_sec']:,.0f} → {current['ops_per_sec']:,.0f} op/s")
+        # Alocações: só conta se crescerem mais do que o limiar e 64 bytes
+        grown = current["alloc_bytes_per_call"] - old["alloc_bytes_per_call"]
+        if grown > 64 and grown > threshold * old["alloc_bytes_per_call"]:
+            regressions.append(
+                f"{key}: {old['alloc_bytes_per_call']:,.0f} → "
+                f"{current['alloc_bytes_per_call']:,.0f} bytes por chamada"
+            )
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--electorates", type=parse_sizes, default=parse_sizes("1000,200000"),
+                        help="Credenciais já usadas/emitidas antes da medição")
+    parser.add_argument("--candidates", type=parse_sizes, default=parse_sizes("4,200"),
+                        help="Número de candidatos do boletim")
+    parser.add_argument("--threads", type=parse_sizes, default=parse_sizes("1,8"),
+                        help="Threads a chamar o handler em simultâneo")
+    parser.add_argument("--calls", type=int, default=20_000,
+                        help="Chamadas por medição")
+    parser.add_argument("--alloc-calls", type=int, default=500,
+                        help="Chamadas medidas com tracemalloc")
+    parser.add_argument("--repeat", type=int, default=3,
+                        help="Repetições por medição (conta a melhor)")
+    parser.add_argument("--only", action="append",
+                        help="Só este handler (repetível), ex.: --only Vote")
+    parser.add_argument("--log-level", choices=sorted(request_log.LEVELS), default="warning",
+                        help="Nível do registo de pedidos durante a medição")
+    parser.add_argument("--baseline", help="Resultados de referência (JSON)")
+    parser.add_argument("--threshold", type=float, default=0.10,
+                        help="Perda de op/s (fração) a partir da qual há regressão")
+    parser.add_argument("--save-baseline", help="Grava os resultados como nova baseline")
+    args = parser.parse_args()
+    
+    print(f"🧪 Handlers em processo (Python {platform.python_version()})")
+    results = run(args)
+    
+    if args.save_baseline:
+        with open(args.save_baseline, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+        print(f"\n💾 Baseline: {args.save_baseline}")
+    
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+        print(f"\n⚖️  Comparação com {args.baseline} (limiar {args.threshold:.0%})")
+        regressions = compare(results, baseline, args.threshold)
+        if regressions:
+            print("\n❌ Regressões:")
+            for message in regressions:
+                print(f"   {message}")
+            sys.exit(1)
+        print("\n✅ Sem regressões")
+
+
+if __name__ == "__main__":
+    main()
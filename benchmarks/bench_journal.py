@@ -0,0 +1,69 @@
+"""
+Benchmark do diário de votos da AV
+Votos duráveis por segundo para diferentes janelas de group commit
+"""
+
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from servers.journal import VoteJournal
+from servers.tally import TallyEngine, CastResult
+
+
+def run(window_ms, threads, votes_per_thread, directory):
+    """Executa uma medição e devolve votos duráveis por segundo"""
+    path = os.path.join(directory, f"bench-{window_ms}")
+    journal = VoteJournal(path, flush_window=window_ms / 1000)
+    tally = TallyEngine([1, 2, 3, 4])
+    barrier = threading.Barrier(threads + 1)
+    
+    def worker(index):
+        barrier.wait()
+        for n in range(votes_per_thread):
+            credential = f"CRED-{index}-{n}"
+            if tally.cast(credential, n % 4 + 1) is CastResult.ACCEPTED:
+                journal.append(credential, n % 4 + 1).result()
+    
+    pool = [threading.Thread(target=worker, args=(i,)) for i in range(threads)]
+    for t in pool:
+        t.start()
+    barrier.wait()
+    start = time.perf_counter()
+    for t in pool:
+        t.join()
+    elapsed = time.perf_counter() - start
+    
+    journal.close()
+    shutil.rmtree(path)
+    return threads * votes_per_thread / elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--threads", type=int, default=32)
+    parser.add_argument("--votes", type=int, default=200,
+                        help="Votos por thread")
+    parser.add_argument("--windows", default="0,0.5,1,2,5,10",
+                        help="Janelas de group commit a testar (ms)")
+    parser.add_argument("--dir",
+                        help="Diretório dos ficheiros (disco real); temporário por defeito")
+    args = parser.parse_args()
+    
+    print(f"🧪 {args.threads} threads x {args.votes} votos (fsync em cada lote)\n")
+    print(f"{'janela (ms)':>12} {'votos/s':>12}")
+    
+    with tempfile.TemporaryDirectory(dir=args.dir) as directory:
+        for window in args.windows.split(","):
+            rate = run(float(window), args.threads, args.votes, directory)
+            print(f"{window:>12} {rate:>12.0f}")
+
+
+if __name__ == "__main__":
+    main()
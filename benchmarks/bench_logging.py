@@ -0,0 +1,110 @@
+"""
+Benchmark do registo de pedidos da AV
+Latência do handler Vote com um destino de log lento: escrita síncrona vs RequestLog
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from servers.request_log import RequestLog, format_text
+from servers.signed_credentials import CredentialSigner, load_key
+from servers.voting_server import VotingService
+from generated import voting_pb2
+
+
+SIGNER = CredentialSigner(load_key()[0])
+
+
+class SlowSink:
+    """Destino que demora `delay` segundos por escrita (ex.: pipe cheio)"""
+    
+    def __init__(self, delay):
+        self.delay = delay
+        self._lock = threading.Lock()
+    
+    def write(self, text):
+        # Um pipe só aceita uma escrita de cada vez
+        with self._lock:
+            time.sleep(self.delay)
+    
+    def flush(self):
+        pass
+
+
+class SyncLog:
+    """Equivalente aos print() anteriores: formata e escreve no handler"""
+    
+    def __init__(self, stream):
+        self.stream = stream
+    
+    def log(self, level, event, **fields):
+        self.stream.write(format_text((time.time(), level, event, fields)) + "\n")
+        self.stream.flush()
+    
+    def debug(self, event, **fields):
+        self.log(10, event, **fields)
+    
+    def info(self, event, **fields):
+        self.log(20, event, **fields)
+    
+    def close(self):
+        pass
+
+
+def run(log, threads, votes_per_thread):
+    """Executa uma medição e devolve as latências do Vote (segundos)"""
+    service = VotingService(log=log)
+    barrier = threading.Barrier(threads + 1)
+    latencies = [[] for _ in range(threads)]
+    
+    def worker(index):
+        barrier.wait()
+        for n in range(votes_per_thread):
+            request = voting_pb2.VoteRequest(
+                voting_credential=SIGNER.sign(index * votes_per_thread + n),
+                candidate_id=n % 4 + 1
+            )
+            start = time.perf_counter()
+            service.Vote(request, None)
+            latencies[index].append(time.perf_counter() - start)
+    
+    pool = [threading.Thread(target=worker, args=(i,)) for i in range(threads)]
+    for t in pool:
+        t.start()
+    barrier.wait()
+    for t in pool:
+        t.join()
+    
+    log.close()
+    return sorted(l for per_thread in latencies for l in per_thread)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--threads", type=int, default=10)
+    parser.add_argument("--votes", type=int, default=200,
+                        help="Votos por thread")
+    parser.add_argument("--sink-delays", default="0,0.0001,0.001",
+                        help="Tempo por escrita do destino de log (s)")
+    args = parser.parse_args()
+    
+    print(f"🧪 {args.threads} threads x {args.votes} votos\n")
+    print(f"{'destino (s)':>12} {'modo':>12} {'p50 (µs)':>10} {'p99 (µs)':>10}")
+    
+    for delay in args.sink_delays.split(","):
+        sink = SlowSink(float(delay))
+        for name, log in (("síncrono", SyncLog(sink)), ("RequestLog", RequestLog(stream=sink))):
+            latencies = run(log, args.threads, args.votes)
+            p50 = statistics.median(latencies) * 1e6
+            p99 = latencies[int(len(latencies) * 0.99)] * 1e6
+            print(f"{delay:>12} {name:>12} {p50:>10.1f} {p99:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
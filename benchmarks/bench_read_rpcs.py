@@ -0,0 +1,133 @@
+"""
+Benchmark das RPCs de leitura da AV (GetCandidates / GetResults)
+Compara latência com e sem a cache de respostas pré-serializadas
+"""
+
+from concurrent import futures
+import argparse
+import contextlib
+import os
+import statistics
+import sys
+import threading
+import time
+
+import grpc
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from generated import voting_pb2
+from generated import voting_pb2_grpc
+from servers.voting_server import VotingService, add_voting_service_to_server
+from servers.candidates import CandidateRegistry
+from servers.signed_credentials import CredentialSigner, load_key
+
+
+SIGNER = CredentialSigner(load_key()[0])
+
+
+def percentile(samples, p):
+    """Percentil p (0-100) de uma lista ordenada"""
+    return samples[min(len(samples) - 1, int(len(samples) * p / 100))]
+
+
+def synthetic_ballot(size, races=10):
+    """Boletim sintético com `size` candidatos repartidos por eleições"""
+    return CandidateRegistry(
+        (cid, f"Candidato {cid}", f"Eleição {cid % races}", f"Círculo {cid % 20}")
+        for cid in range(1, size + 1)
+    )
+
+
+def run(cache, threads, calls, votes_per_sec, ballot_size):
+    """Mede as duas RPCs de leitura com um servidor em processo"""
+    server = grpc.server(futures.ThreadPoolExecutor(max_workers=threads))
+    service = VotingService(cache_responses=cache, candidates=synthetic_ballot(ballot_size))
+    add_voting_service_to_server(service, server)
+    port = server.add_insecure_port('127.0.0.1:0')
+    server.start()
+    
+    channel = grpc.insecure_channel(f'127.0.0.1:{port}')
+    stub = voting_pb2_grpc.VotingServiceStub(channel)
+    stop = threading.Event()
+    
+    def voter():
+        # Votos em fundo para invalidar a cache de resultados
+        n = 0
+        while not stop.wait(1 / votes_per_sec):
+            stub.Vote(voting_pb2.VoteRequest(voting_credential=SIGNER.sign(n), candidate_id=n % ballot_size + 1))
+            n += 1
+    
+    report = {}
+    for name, call, request in (
+        ("GetCandidates", stub.GetCandidates, voting_pb2.GetCandidatesRequest()),
+        ("GetResults", stub.GetResults, voting_pb2.GetResultsRequest()),
+    ):
+        latencies = []
+        lock = threading.Lock()
+        
+        def reader():
+            local = []
+            for _ in range(calls):
+                start = time.perf_counter()
+                call(request)
+                local.append(time.perf_counter() - start)
+            with lock:
+                latencies.extend(local)
+        
+        background = threading.Thread(target=voter, daemon=True) if votes_per_sec else None
+        if background:
+            background.start()
+        
+        pool = [threading.Thread(target=reader) for _ in range(threads)]
+        start = time.perf_counter()
+        for t in pool:
+            t.start()
+        for t in pool:
+            t.join()
+        elapsed = time.perf_counter() - start
+        
+        stop.set()
+        if background:
+            background.join()
+        stop.clear()
+        
+        latencies.sort()
+        report[name] = (
+            len(latencies) / elapsed,
+            statistics.median(latencies) * 1000,
+            percentile(latencies, 99) * 1000,
+        )
+    
+    channel.close()
+    server.stop(0)
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--threads", type=int, default=64)
+    parser.add_argument("--calls", type=int, default=200,
+                        help="Chamadas por thread")
+    parser.add_argument("--votes-per-sec", type=float, default=50,
+                        help="Votos em fundo por segundo (0 para desativar)")
+    parser.add_argument("--ballot-size", type=int, default=4,
+                        help="Número de candidatos do boletim")
+    args = parser.parse_args()
+    
+    # Os prints dos handlers não entram na medição
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        results = {
+            label: run(cache, args.threads, args.calls, args.votes_per_sec, args.ballot_size)
+            for label, cache in (("sem cache", False), ("com cache", True))
+        }
+    
+    print(f"🧪 {args.threads} threads x {args.calls} chamadas, {args.ballot_size} candidatos\n")
+    print(f"{'RPC':<14} {'modo':<10} {'chamadas/s':>11} {'p50 (ms)':>9} {'p99 (ms)':>9}")
+    for label, report in results.items():
+        for name, (rate, p50, p99) in report.items():
+            print(f"{name:<14} {label:<10} {rate:>11.0f} {p50:>9.2f} {p99:>9.2f}")
+
+
+if __name__ == "__main__":
+    main()
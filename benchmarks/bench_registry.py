@@ -0,0 +1,72 @@
+"""
+Benchmark do índice do caderno eleitoral (AR)
+Construção a partir de CSV, custo de arranque e pesquisas por segundo (mmap + bisseção)
+"""
+
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from servers.citizen_registry import CitizenRegistry, build_index
+
+
+def card(n):
+    """Número de cartão sintético (8 dígitos + 2 letras + dígito de controlo)"""
+    return f"{n:08d}ZZ{n % 10}"
+
+
+def write_roll(path, size):
+    """Caderno eleitoral sintético com os números pares (ímpares = ausentes)"""
+    with open(path, "w", encoding="utf-8") as f:
+        f.write("citizen_card_number\n")
+        for start in range(0, size, 100_000):
+            f.write("".join(f"{card(2 * n)}\n" for n in range(start, min(size, start + 100_000))))
+
+
+def lookup_rate(registry, cards):
+    start = time.perf_counter()
+    for c in cards:
+        c in registry
+    return len(cards) / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--size", type=int, default=10_000_000,
+                        help="Número de cidadãos no caderno")
+    parser.add_argument("--lookups", type=int, default=200_000)
+    parser.add_argument("--dir",
+                        help="Diretório dos ficheiros; temporário por defeito")
+    args = parser.parse_args()
+    
+    with tempfile.TemporaryDirectory(dir=args.dir) as directory:
+        roll = os.path.join(directory, "roll.csv")
+        index = os.path.join(directory, "roll.idx")
+        
+        start = time.perf_counter()
+        write_roll(roll, args.size)
+        print(f"🧪 CSV com {args.size} cidadãos ({time.perf_counter() - start:.1f}s)")
+        
+        start = time.perf_counter()
+        build_index(roll, index)
+        print(f"   Construção do índice: {time.perf_counter() - start:.1f}s "
+              f"({os.path.getsize(index) / 2**20:.0f} MB)")
+        
+        start = time.perf_counter()
+        registry = CitizenRegistry(index)
+        print(f"   Abertura do índice: {(time.perf_counter() - start) * 1e3:.2f} ms")
+        
+        hits = [card(2 * random.randrange(args.size)) for _ in range(args.lookups)]
+        misses = [card(2 * random.randrange(args.size) + 1) for _ in range(args.lookups)]
+        print(f"   Pesquisas (presentes): {lookup_rate(registry, hits):,.0f}/s")
+        print(f"   Pesquisas (ausentes):  {lookup_rate(registry, misses):,.0f}/s")
+        registry.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,362 @@
+"""
+Teste de carga do fluxo completo AR → AV (eleitorado simulado)
+Emite credenciais, vota e consulta resultados com muitos clientes concorrentes,
+em ciclo fechado ou aberto, e escreve um relatório JSON comparável entre versões
+    
+    python benchmarks/load_test.py --duration 30 --clients 200 --report carga.json
+    python benchmarks/load_test.py --rate 2000 --compare carga.json
+"""
+
+import argparse
+import asyncio
+from collections import deque
+import datetime
+import json
+import os
+import platform
+import random
+import shlex
+import socket
+import subprocess
+import sys
+import time
+
+import grpc
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from src.voter_client import AsyncVoterRegistrationClient
+from src.voting_client import AsyncVotingClient
+
+
+ROOT = os.path.join(os.path.dirname(__file__), '..')
+
+# Operações do eleitorado e RPC medido por cada uma
+OPERATIONS = {
+    "issue": "IssueVotingCredential",
+    "vote": "Vote",
+    "results": "GetResults",
+}
+
+
+def free_port():
+    """Porta TCP livre em localhost"""
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def parse_mix(text):
+    """'issue=1,vote=1,results=0.1' -> {"issue": 1.0, ...}"""
+    mix = {}
+    for item in text.split(","):
+        name, _, weight = item.partition("=")
+        if name.strip() not in OPERATIONS:
+            raise argparse.ArgumentTypeError(f"Operação desconhecida: {name!r}")
+        mix[name.strip()] = float(weight or 1)
+    return mix
+
+
+def percentile(samples, p):
+    """Percentil de uma lista já ordenada"""
+    if not samples:
+        return None
+    return samples[min(len(samples) - 1, int(len(samples) * p / 100))]
+
+
+def start_servers(args):
+    """
+    Arranca AR e AV locais em portas livres
+    
+    Returns:
+        tuple: (processos, endereço da AR, endereço da AV)
+    """
+    ar_port, av_port = free_port(), free_port()
+    quiet = ["--log-level", args.server_log_level]
+    ar_cmd = [sys.executable, os.path.join(ROOT, "servers", "voter_server.py"),
+              "--port", str(ar_port)] + quiet + shlex.split(args.ar_args)
+    av_cmd = [sys.executable, os.path.join(ROOT, "servers", "voting_server.py"),
+              "--port", str(av_port)] + quiet + shlex.split(args.av_args)
+    processes = [
+        subprocess.Popen(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        for cmd in (ar_cmd, av_cmd)
+    ]
+    return processes, f"127.0.0.1:{ar_port}", f"127.0.0.1:{av_port}"
+
+
+async def wait_ready(address, timeout=30):
+    """Espera até o servidor aceitar ligações"""
+    async with grpc.aio.insecure_channel(address) as channel:
+        await asyncio.wait_for(channel.channel_ready(), timeout)
+
+
+class Stats:
+    """Latências e erros por RPC durante a janela de medição"""
+    
+    def __init__(self):
+        self.latencies = {rpc: [] for rpc in OPERATIONS.values()}
+        self.errors = {rpc: {} for rpc in OPERATIONS.values()}
+        self.rejected = {rpc: 0 for rpc in OPERATIONS.values()}
+        self.measuring = False
+    
+    def record(self, rpc, seconds):
+        if self.measuring:
+            self.latencies[rpc].append(seconds)
+    
+    def error(self, rpc, code):
+        if self.measuring:
+            self.errors[rpc][code] = self.errors[rpc].get(code, 0) + 1
+    
+    def reject(self, rpc):
+        """Resposta negativa do servidor (não elegível, credencial usada)"""
+        if self.measuring:
+            self.rejected[rpc] += 1
+    
+    def summary(self, elapsed):
+        """Débito e percentis por RPC (milissegundos)"""
+        report = {}
+        for rpc, samples in self.latencies.items():
+            samples.sort()
+            ms = lambda value: None if value is None else round(value * 1000, 3)
+            report[rpc] = {
+                "count": len(samples),
+                "errors": sum(self.errors[rpc].values()),
+                "error_codes": self.errors[rpc],
+                "rejected": self.rejected[rpc],
+                "throughput": round(len(samples) / elapsed, 1),
+                "p50_ms": ms(percentile(samples, 50)),
+                "p95_ms": ms(percentile(samples, 95)),
+                "p99_ms": ms(percentile(samples, 99)),
+                "max_ms": ms(samples[-1] if samples else None),
+            }
+        return report
+
+
+class Electorate:
+    """Eleitores simulados: cartões únicos e credenciais à espera de voto"""
+    
+    def __init__(self, ar, av, candidate_ids, stats, mix):
+        self.ar = ar
+        self.av = av
+        self.candidate_ids = candidate_ids
+        self.stats = stats
+        self.kinds = list(mix)
+        self.weights = [mix[k] for k in self.kinds]
+        # Prefixo por execução: cartões nunca repetidos contra uma AR externa
+        self._prefix = f"{random.randrange(10**6):06d}"
+        self._next_card = 0
+        self.credentials = deque()
+    
+    def next_kind(self):
+        return random.choices(self.kinds, self.weights)[0]
+    
+    async def run(self, kind, started=None):
+        """
+        Executa uma operação
+        
+        Args:
+            kind: "issue", "vote" ou "results"
+            started: Instante previsto do início (ciclo aberto); a latência
+                inclui a espera por um cliente livre
+        """
+        # Sem credenciais por usar, um voto começa por emitir uma
+        if kind == "vote" and not self.credentials:
+            kind = "issue"
+        rpc = OPERATIONS[kind]
+        start = started if started is not None else time.perf_counter()
+        
+        try:
+            if kind == "issue":
+                self._next_card += 1
+                card = f"{self._prefix}{self._next_card:09d}"
+                eligible, credential = await self.ar.issue_voting_credential(card)
+                if eligible:
+                    self.credentials.append(credential)
+                else:
+                    self.stats.reject(rpc)
+            elif kind == "vote":
+                credential = self.credentials.popleft()
+                success, _ = await self.av.vote(credential, random.choice(self.candidate_ids))
+                if not success:
+                    self.stats.reject(rpc)
+            else:
+                await self.av.get_results()
+        except grpc.RpcError as e:
+            self.stats.error(rpc, e.code().name)
+            return
+        
+        self.stats.record(rpc, time.perf_counter() - start)
+
+
+async def closed_loop(electorate, clients, deadline):
+    """`clients` eleitores em ciclo: cada um só avança quando recebe a resposta"""
+    async def client():
+        while time.perf_counter() < deadline:
+            await electorate.run(electorate.next_kind())
+    
+    await asyncio.gather(*(client() for _ in range(clients)))
+
+
+async def open_loop(electorate, rate, clients, deadline):
+    """
+    Chegadas de Poisson a `rate` operações/s, independentes das respostas
+    
+    A latência conta a partir do instante previsto de cada chegada, por
+    isso um servidor saturado aparece nos percentis em vez de abrandar o
+    gerador (coordinated omission).
+    """
+    slots = asyncio.Semaphore(clients)
+    tasks = set()
+    
+    async def operation(kind, started):
+        async with slots:
+            await electorate.run(kind, started)
+    
+    next_arrival = time.perf_counter()
+    while next_arrival < deadline:
+        delay = next_arrival - time.perf_counter()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        task = asyncio.create_task(operation(electorate.next_kind(), next_arrival))
+        tasks.add(task)
+        task.add_done_callback(tasks.discard)
+        next_arrival += random.expovariate(rate)
+    
+    await asyncio.gather(*tasks)
+
+
+async def run_load(args, ar_address, av_address):
+    """Executa o aquecimento e a medição; devolve o resumo"""
+    ar_host, ar_port = ar_address.rsplit(":", 1)
+    av_host, av_port = av_address.rsplit(":", 1)
+    stats = Stats()
+    
+    async with AsyncVoterRegistrationClient(ar_host, int(ar_port), pool_size=args.channels) as ar, \
+            AsyncVotingClient(av_host, int(av_port), pool_size=args.channels) as av:
+        candidate_ids = [cid for cid, _ in await av.get_candidates()]
+        electorate = Electorate(ar, av, candidate_ids, stats, args.mix)
+        
+        async def run(seconds):
+            deadline = time.perf_counter() + seconds
+            if args.rate:
+                await open_loop(electorate, args.rate, args.clients, deadline)
+            else:
+                await closed_loop(electorate, args.clients, deadline)
+        
+        if args.warmup:
+            await run(args.warmup)
+        
+        stats.measuring = True
+        start = time.perf_counter()
+        await run(args.duration)
+        elapsed = time.perf_counter() - start
+        stats.measuring = False
+    
+    return stats.summary(elapsed), elapsed
+
+
+def git_revision():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=ROOT,
+            capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _format_ms(value):
+    """Percentil para a tabela ("-" se não houve pedidos com sucesso)"""
+    return f"{value:>9.2f}" if value is not None else f"{'-':>9}"
+
+
+def print_report(rpcs, elapsed):
+    print(f"\n📊 Medição de {elapsed:.1f}s")
+    print(f"   {'RPC':<24}{'pedidos':>9}{'/s':>10}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'erros':>7}")
+    for rpc, r in rpcs.items():
+        if not r["count"] and not r["errors"]:
+            continue
+        print(f"   {rpc:<24}{r['count']:>9}{r['throughput']:>10.1f}"
+              f"{_format_ms(r['p50_ms'])}{_format_ms(r['p95_ms'])}{_format_ms(r['p99_ms'])}{r['errors']:>7}")
+
+
+def print_comparison(rpcs, baseline_path):
+    """Diferenças em relação a um relatório anterior"""
+    with open(baseline_path, encoding="utf-8") as f:
+        baseline = json.load(f)
+    print(f"\n⚖️  Comparação com {baseline_path} ({baseline['meta'].get('git') or '?'})")
+    for rpc, r in rpcs.items():
+        old = baseline["rpcs"].get(rpc)
+        if not old or not old["count"] or not r["count"]:
+            continue
+        change = lambda new, before: f"{(new - before) / before * 100:+.1f}%" if before else "n/a"
+        print(f"   {rpc:<24}débito {change(r['throughput'], old['throughput']):>8}"
+              f"   p99 {old['p99_ms']:.2f} → {r['p99_ms']:.2f} ms ({change(r['p99_ms'], old['p99_ms'])})")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--duration", type=float, default=30.0,
+                        help="Duração da medição (s)")
+    parser.add_argument("--warmup", type=float, default=3.0,
+                        help="Aquecimento antes da medição (s)")
+    parser.add_argument("--clients", type=int, default=100,
+                        help="Clientes concorrentes (ciclo aberto: pedidos em curso no máximo)")
+    parser.add_argument("--rate", type=float, default=0,
+                        help="Operações/s em ciclo aberto (0 = ciclo fechado)")
+    parser.add_argument("--mix", type=parse_mix, default=parse_mix("issue=1,vote=1,results=0.1"),
+                        help="Pesos das operações, ex.: issue=1,vote=1,results=0.1")
+    parser.add_argument("--channels", type=int, default=4,
+                        help="Canais (ligações) do pool de cada cliente")
+    parser.add_argument("--ar", help="Endereço de uma AR já a correr (host:porta)")
+    parser.add_argument("--av", help="Endereço de uma AV já a correr (host:porta)")
+    parser.add_argument("--ar-args", default="",
+                        help="Argumentos extra da AR local, ex.: --ar-args='--aio'")
+    parser.add_argument("--av-args", default="",
+                        help="Argumentos extra da AV local, ex.: --av-args='--aio --journal av.wal'")
+    parser.add_argument("--server-log-level", default="warning",
+                        help="Nível de log dos servidores locais")
+    parser.add_argument("--report", help="Ficheiro JSON do relatório")
+    parser.add_argument("--compare", help="Relatório anterior para comparação")
+    args = parser.parse_args()
+    
+    processes = []
+    ar_address, av_address = args.ar, args.av
+    if not ar_address or not av_address:
+        processes, local_ar, local_av = start_servers(args)
+        ar_address, av_address = ar_address or local_ar, av_address or local_av
+    
+    try:
+        for address in (ar_address, av_address):
+            asyncio.run(wait_ready(address))
+        mode = f"ciclo aberto, {args.rate:g} op/s" if args.rate else "ciclo fechado"
+        print(f"🧪 AR {ar_address} → AV {av_address} ({mode}, {args.clients} clientes)")
+        rpcs, elapsed = asyncio.run(run_load(args, ar_address, av_address))
+    finally:
+        for process in processes:
+            process.terminate()
+            process.wait()
+    
+    print_report(rpcs, elapsed)
+    if args.compare:
+        print_comparison(rpcs, args.compare)
+    
+    if args.report:
+        options = {k: v for k, v in vars(args).items() if k not in ("report", "compare")}
+        report = {
+            "meta": {
+                "timestamp": datetime.datetime.now().isoformat(timespec="seconds"),
+                "git": git_revision(),
+                "python": platform.python_version(),
+                "options": options,
+            },
+            "duration_s": round(elapsed, 3),
+            "rpcs": rpcs,
+        }
+        with open(args.report, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"\n💾 Relatório: {args.report}")
+
+
+if __name__ == "__main__":
+    main()
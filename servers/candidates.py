@@ -0,0 +1,114 @@
+"""
+Registo de candidatos da Autoridade de Votação (AV)
+Carregado de um ficheiro CSV e indexado por ID, eleição (race) e círculo
+"""
+
+from collections import namedtuple
+import csv
+import hashlib
+import os
+
+
+CandidateInfo = namedtuple("CandidateInfo", ["id", "name", "race", "district"])
+
+# Ficheiro de candidatos por defeito (boletim do servidor mock)
+DEFAULT_PATH = os.path.join(os.path.dirname(__file__), "candidates.csv")
+
+
+class CandidateRegistry:
+    """
+    Candidatos de um boletim com várias eleições e círculos
+    
+    Validação e nome por ID em O(1); listas por eleição/círculo
+    pré-calculadas para servir o GetCandidates filtrado.
+    
+    `version` identifica o conteúdo do boletim (digest de todos os
+    candidatos): é igual em todos os processos e réplicas com o mesmo
+    ficheiro e muda com qualquer alteração.
+    """
+    
+    def __init__(self, candidates):
+        """
+        Args:
+            candidates: Iterável de CandidateInfo (ou tuplos equivalentes)
+        """
+        self.candidates = tuple(CandidateInfo(*c) for c in candidates)
+        self.by_id = {}
+        self._index = {}
+        
+        for candidate in self.candidates:
+            if candidate.id in self.by_id:
+                raise ValueError(f"ID de candidato repetido: {candidate.id}")
+            self.by_id[candidate.id] = candidate
+            
+            # Chaves (race, district) com "" a significar "qualquer"; sem
+            # círculo (ou sem eleição) as chaves coincidem e contam uma vez
+            keys = {
+                (candidate.race, ""),
+                ("", candidate.district),
+                (candidate.race, candidate.district),
+            } - {("", "")}
+            for key in keys:
+                self._index.setdefault(key, []).append(candidate)
+        
+        digest = hashlib.blake2b(digest_size=8)
+        for candidate in self.candidates:
+            digest.update(repr(tuple(candidate)).encode("utf-8"))
+        self.version = digest.hexdigest()
+    
+    @classmethod
+    def load(cls, path=DEFAULT_PATH):
+        """
+        Carrega candidatos de um CSV com colunas id,name,race,district
+        
+        Args:
+            path: Caminho do ficheiro CSV
+        """
+        with open(path, newline="", encoding="utf-8") as f:
+            rows = csv.DictReader(f)
+            return cls(
+                CandidateInfo(
+                    int(row["id"]),
+                    row["name"],
+                    row.get("race") or "",
+                    row.get("district") or ""
+                )
+                for row in rows
+            )
+    
+    def __contains__(self, candidate_id):
+        return candidate_id in self.by_id
+    
+    def __len__(self):
+        return len(self.candidates)
+    
+    def ids(self):
+        """IDs de todos os candidatos, pela ordem do ficheiro"""
+        return [c.id for c in self.candidates]
+    
+    def name(self, candidate_id):
+        """Nome do candidato (KeyError se não existir)"""
+        return self.by_id[candidate_id].name
+    
+    def names(self):
+        """Dicionário {id: name}"""
+        return {c.id: c.name for c in self.candidates}
+    
+    def is_filter(self, race="", district=""):
+        """Indica se o filtro corresponde a uma eleição/círculo existente"""
+        return (race, district) == ("", "") or (race, district) in self._index
+    
+    def filter(self, race="", district=""):
+        """
+        Candidatos de uma eleição e/ou círculo
+        
+        Args:
+            race: Eleição ("" para todas)
+            district: Círculo ("" para todos)
+        
+        Returns:
+            list: Lista de CandidateInfo
+        """
+        if not race and not district:
+            return list(self.candidates)
+        return list(self._index.get((race, district), ()))
@@ -0,0 +1,227 @@
+"""
+Índice do caderno eleitoral da Autoridade de Registo (AR)
+Números de cartão de cidadão ordenados num ficheiro binário de largura fixa, lido com mmap
+
+Construção do índice a partir de um CSV:
+    python servers/citizen_registry.py roll.csv roll.idx
+"""
+
+import argparse
+import csv
+import heapq
+import mmap
+import os
+import struct
+import sys
+import tempfile
+import time
+
+
+_MAGIC = b"CCIDX1\0\0"
+# Número de registos, largura de cada número de cartão
+_HEADER = struct.Struct("<QI")
+_DATA_OFFSET = len(_MAGIC) + _HEADER.size
+
+DEFAULT_KEY_WIDTH = 16
+
+
+def normalize(citizen_card_number):
+    """Forma canónica do número de cartão (sem espaços, maiúsculas)"""
+    return citizen_card_number.replace(" ", "").strip().upper()
+
+
+def encode_key(citizen_card_number, key_width=DEFAULT_KEY_WIDTH):
+    """
+    Chave de largura fixa (ASCII, completada com zeros)
+    
+    Números com caracteres fora do ASCII não têm chave: substituí-los
+    (ex.: por "?") faria números diferentes colidir na mesma chave.
+    
+    Returns:
+        bytes: Chave ou None se o número não couber na largura ou não for ASCII
+    """
+    try:
+        key = normalize(citizen_card_number).encode("ascii")
+    except UnicodeEncodeError:
+        return None
+    if not key or len(key) > key_width:
+        return None
+    return key.ljust(key_width, b"\0")
+
+
+class CitizenRegistry:
+    """
+    Caderno eleitoral só de leitura, pesquisado por bisseção sobre mmap
+    
+    Abrir o índice só lê o cabeçalho: as páginas são carregadas pelo
+    sistema operativo à medida que as pesquisas lhes tocam e ficam na
+    page cache, partilhadas por todos os processos que abrem o mesmo
+    ficheiro. Uma pesquisa compara ~log2(N) chaves diretamente no mapa,
+    sem objetos Python por registo.
+    """
+    
+    def __init__(self, path):
+        """
+        Args:
+            path: Ficheiro criado por build_index
+        
+        Raises:
+            ValueError: Se o ficheiro não for um índice válido
+        """
+        self.path = path
+        with open(path, "rb") as f:
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        
+        if self._map[:len(_MAGIC)] != _MAGIC:
+            self._map.close()
+            raise ValueError(f"Índice do caderno eleitoral inválido: {path}")
+        
+        self.count, self.key_width = _HEADER.unpack_from(self._map, len(_MAGIC))
+        if len(self._map) != _DATA_OFFSET + self.count * self.key_width:
+            self._map.close()
+            raise ValueError(f"Índice do caderno eleitoral truncado: {path}")
+    
+    def __len__(self):
+        return self.count
+    
+    def __contains__(self, citizen_card_number):
+        key = encode_key(citizen_card_number, self.key_width)
+        if key is None:
+            return False
+        
+        data, width = self._map, self.key_width
+        low, high = 0, self.count
+        while low < high:
+            middle = (low + high) // 2
+            offset = _DATA_OFFSET + middle * width
+            current = data[offset:offset + width]
+            if current < key:
+                low = middle + 1
+            elif current > key:
+                high = middle
+            else:
+                return True
+        return False
+    
+    def close(self):
+        self._map.close()
+
+
+def _read_cards(csv_path, column):
+    """Números de cartão do CSV (coluna `column` ou a primeira sem cabeçalho)"""
+    with open(csv_path, newline="", encoding="utf-8") as f:
+        rows = csv.reader(f)
+        first = next(rows, None)
+        if first is None:
+            return
+        if column in first:
+            index = first.index(column)
+        else:
+            index = 0
+            yield first[0]
+        for row in rows:
+            if len(row) > index:
+                yield row[index]
+
+
+def _write_run(keys, directory):
+    """Escreve um bloco ordenado num ficheiro temporário"""
+    keys.sort()
+    fd, path = tempfile.mkstemp(suffix=".run", dir=directory)
+    with os.fdopen(fd, "wb") as f:
+        f.write(b"".join(keys))
+    return path
+
+
+def _iter_run(path, key_width):
+    with open(path, "rb") as f:
+        while True:
+            key = f.read(key_width)
+            if len(key) < key_width:
+                return
+            yield key
+
+
+def build_index(csv_path, index_path, column="citizen_card_number",
+                key_width=DEFAULT_KEY_WIDTH, run_size=1_000_000):
+    """
+    Constrói o índice ordenado a partir de um CSV
+    
+    Ordenação externa: blocos de `run_size` chaves são ordenados e escritos
+    em ficheiros temporários e depois juntos com heapq.merge, por isso a
+    memória não depende do tamanho do caderno. Números repetidos ficam
+    uma só vez.
+    
+    Args:
+        csv_path: CSV com os números de cartão de cidadão
+        index_path: Ficheiro do índice a criar
+        column: Coluna dos números (sem cabeçalho: primeira coluna)
+        key_width: Largura de cada chave, em bytes
+        run_size: Chaves ordenadas em memória de cada vez
+    
+    Returns:
+        int: Número de registos no índice
+    
+    Raises:
+        ValueError: Se um número não couber em `key_width` ou não for ASCII
+    """
+    directory = os.path.dirname(os.path.abspath(index_path))
+    runs = []
+    try:
+        keys = []
+        for card in _read_cards(csv_path, column):
+            key = encode_key(card, key_width)
+            if key is None:
+                if not normalize(card):
+                    continue
+                if not normalize(card).isascii():
+                    raise ValueError(f"Número de cartão com caracteres não ASCII: {card!r}")
+                raise ValueError(f"Número de cartão com mais de {key_width} caracteres: {card!r}")
+            keys.append(key)
+            if len(keys) >= run_size:
+                runs.append(_write_run(keys, directory))
+                keys = []
+        runs.append(_write_run(keys, directory))
+        
+        tmp_path = index_path + ".tmp"
+        count = 0
+        with open(tmp_path, "wb") as f:
+            f.write(_MAGIC + _HEADER.pack(0, key_width))
+            previous = None
+            for key in heapq.merge(*(_iter_run(r, key_width) for r in runs)):
+                if key != previous:
+                    f.write(key)
+                    count += 1
+                    previous = key
+            f.seek(len(_MAGIC))
+            f.write(_HEADER.pack(count, key_width))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, index_path)
+        return count
+    finally:
+        for run in runs:
+            os.remove(run)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Constrói o índice do caderno eleitoral a partir de um CSV")
+    parser.add_argument("csv", help="CSV com os números de cartão de cidadão")
+    parser.add_argument("index", help="Ficheiro do índice a criar")
+    parser.add_argument("--column", default="citizen_card_number",
+                        help="Coluna dos números de cartão")
+    parser.add_argument("--key-width", type=int, default=DEFAULT_KEY_WIDTH,
+                        help="Largura máxima de um número de cartão")
+    args = parser.parse_args()
+    
+    start = time.perf_counter()
+    try:
+        count = build_index(args.csv, args.index, args.column, args.key_width)
+    except ValueError as e:
+        print(f"❌ {e}")
+        sys.exit(1)
+    print(f"✅ {count} cidadãos indexados em {args.index} ({time.perf_counter() - start:.1f}s)")
+
+
+if __name__ == "__main__":
+    main()
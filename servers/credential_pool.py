@@ -0,0 +1,154 @@
+"""
+Pool de credenciais de voto pré-geradas da Autoridade de Registo (AR)
+Emissão O(1) a partir de uma lista livre, reabastecida por uma thread própria
+"""
+
+from collections import deque
+import os
+import secrets
+import struct
+import threading
+
+
+# Registo do ficheiro do pool: próximo número de série livre após um bloco
+_SERIAL = struct.Struct("<Q")
+
+
+def make_credential(serial):
+    """
+    Credencial com número de série único e sufixo aleatório
+    
+    O número de série garante que não há colisões; o sufixo impede que
+    uma credencial seja adivinhada a partir das anteriores.
+    """
+    return f"CRED-{serial:08d}-{secrets.token_hex(4).upper()}"
+
+
+class CredentialPool:
+    """
+    Credenciais pré-geradas, emitidas por ordem a partir de uma lista livre
+    
+    `issue()` só retira a próxima credencial da lista. Quando restam menos
+    de `low_water` credenciais, a thread de reabastecimento gera um bloco
+    de `block_size` novas credenciais. Com um `signer` (CredentialSigner)
+    cada credencial leva o MAC do seu número de série e a AV valida-a sem
+    consultar nada.
+    
+    O ficheiro `path` guarda só a numeração: antes de um bloco entrar na
+    lista é acrescentado (e sincronizado) o primeiro número de série a
+    seguir ao bloco, por isso num reinício a numeração continua sem
+    reutilizar números. Números de blocos gerados mas não emitidos antes
+    de uma paragem ficam por usar.
+    """
+    
+    def __init__(self, path=None, block_size=10_000, low_water=None, signer=None):
+        """
+        Args:
+            path: Ficheiro com a numeração já reservada (None = só memória)
+            block_size: Credenciais geradas por reabastecimento
+            low_water: Tamanho da lista livre que dispara o reabastecimento
+                (default: metade do bloco)
+            signer: CredentialSigner para credenciais assinadas (None =
+                sufixo aleatório, só aceite por uma AV em modo legado)
+        """
+        self.path = path
+        self.block_size = block_size
+        self.low_water = block_size // 2 if low_water is None else low_water
+        self._make = signer.sign if signer is not None else make_credential
+        
+        self._next_serial = 0
+        self._file = None
+        if path is not None:
+            self._file = open(path, "ab")
+            # Um registo incompleto no fim corresponde a uma escrita interrompida
+            size = self._file.tell()
+            size -= size % _SERIAL.size
+            self._file.truncate(size)
+            if size:
+                with open(path, "rb") as f:
+                    f.seek(size - _SERIAL.size)
+                    (self._next_serial,) = _SERIAL.unpack(f.read(_SERIAL.size))
+        
+        self.issued = 0
+        self._free = deque()
+        self._cond = threading.Condition()
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+    
+    def __len__(self):
+        """Credenciais disponíveis na lista livre"""
+        return len(self._free)
+    
+    def issue(self):
+        """
+        Emite a próxima credencial livre
+        
+        Só espera se a lista livre estiver vazia (procura acima do ritmo de
+        reabastecimento).
+        
+        Returns:
+            str: Credencial de voto nunca emitida
+        """
+        return self.issue_many(1)[0]
+    
+    def issue_many(self, count):
+        """
+        Emite `count` credenciais com uma única aquisição do lock
+        
+        Returns:
+            list: Credenciais de voto nunca emitidas
+        """
+        credentials = []
+        with self._cond:
+            while len(credentials) < count:
+                if not self._free:
+                    if self._closed:
+                        raise RuntimeError("Pool de credenciais fechado")
+                    self._cond.notify_all()
+                    self._cond.wait()
+                    continue
+                
+                take = min(count - len(credentials), len(self._free))
+                credentials.extend(self._free.popleft() for _ in range(take))
+            
+            self.issued += count
+            if len(self._free) < self.low_water:
+                self._cond.notify_all()
+        return credentials
+    
+    def _generate(self):
+        """Reserva os números de série de um bloco e gera as credenciais"""
+        start = self._next_serial
+        end = start + self.block_size
+        
+        if self._file is not None:
+            self._file.write(_SERIAL.pack(end))
+            self._file.flush()
+            os.fsync(self._file.fileno())
+        
+        self._next_serial = end
+        return [self._make(serial) for serial in range(start, end)]
+    
+    def _run(self):
+        """Thread de reabastecimento: um bloco sempre que a lista desce do limite"""
+        while True:
+            with self._cond:
+                self._cond.wait_for(lambda: self._closed or len(self._free) < self.low_water)
+                if self._closed:
+                    return
+            
+            block = self._generate()
+            
+            with self._cond:
+                self._free.extend(block)
+                self._cond.notify_all()
+    
+    def close(self):
+        """Para o reabastecimento e fecha o ficheiro da numeração"""
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        self._thread.join()
+        if self._file is not None:
+            self._file.close()
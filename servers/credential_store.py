@@ -0,0 +1,227 @@
+"""
+Conjunto compacto de credenciais usadas (AR e AV)
+Digests de tamanho fixo numa tabela de endereçamento aberto sobre um bytearray
+"""
+
+import math
+
+
+class BloomFilter:
+    """
+    Filtro de Bloom sobre digests já uniformes (sem hashing adicional)
+    
+    Responde "de certeza ausente" ou "talvez presente"; as posições dos bits
+    são derivadas do próprio digest por double hashing.
+    """
+    
+    def __init__(self, capacity, bits_per_entry=10):
+        """
+        Args:
+            capacity: Número de entradas previsto
+            bits_per_entry: Bits por entrada (10 ≈ 1% de falsos positivos)
+        """
+        self.size = max(64, capacity * bits_per_entry)
+        self.hashes = max(1, round(bits_per_entry * math.log(2)))
+        self._bits = bytearray((self.size + 7) // 8)
+    
+    def _positions(self, digest):
+        h1 = int.from_bytes(digest[4:12], "little")
+        h2 = int.from_bytes(digest[8:16], "little") | 1
+        return ((h1 + i * h2) % self.size for i in range(self.hashes))
+    
+    def add(self, digest):
+        bits = self._bits
+        for position in self._positions(digest):
+            bits[position >> 3] |= 1 << (position & 7)
+    
+    def __contains__(self, digest):
+        bits = self._bits
+        for position in self._positions(digest):
+            if not bits[position >> 3] & (1 << (position & 7)):
+                return False
+        return True
+    
+    @property
+    def nbytes(self):
+        return len(self._bits)
+
+
+class CredentialStore:
+    """
+    Conjunto exato de digests de credenciais usadas
+    
+    Substitui um `set` de strings: cada credencial ocupa `digest_size` bytes
+    numa tabela contínua (sondagem linear, carga máxima de 70%) em vez de
+    um objeto str mais a entrada do set. O slot vazio é o digest a zeros;
+    esse digest, se aparecer, é guardado à parte para manter a semântica
+    exata. A tabela duplica quando enche.
+    
+    Com `value_size` cada entrada guarda também um valor de largura fixa
+    a seguir ao digest (get/put), o que faz da tabela um dicionário
+    compacto digest -> bytes.
+    
+    Com `bloom_bits` um filtro de Bloom à frente da tabela responde às
+    consultas negativas (credenciais ainda não usadas) sem tocar na tabela.
+    
+    Não é thread-safe: o chamador usa os seus próprios locks (ex.: faixas
+    do TallyEngine).
+    """
+    
+    MAX_LOAD = 0.7
+    
+    def __init__(self, capacity=1024, digest_size=16, bloom_bits=0, value_size=0):
+        """
+        Args:
+            capacity: Número de entradas previsto (evita redimensionamentos)
+            digest_size: Tamanho de cada digest, em bytes
+            bloom_bits: Bits por entrada do filtro de Bloom (0 = sem filtro)
+            value_size: Tamanho do valor guardado com cada digest, em bytes
+        """
+        self.digest_size = digest_size
+        self.value_size = value_size
+        self.entry_size = digest_size + value_size
+        self.bloom_bits = bloom_bits
+        self._empty = bytes(digest_size)
+        self._count = 0
+        self._empty_value = None
+        self._allocate(max(8, int(capacity / self.MAX_LOAD) + 1))
+    
+    def _allocate(self, slots):
+        """Tabela (e filtro) novos e vazios com `slots` posições"""
+        self._slots = slots
+        self._limit = int(slots * self.MAX_LOAD)
+        self._table = bytearray(slots * self.entry_size)
+        self._bloom = BloomFilter(self._limit, self.bloom_bits) if self.bloom_bits else None
+    
+    def _find(self, digest):
+        """
+        Procura o digest na tabela
+        
+        Returns:
+            tuple: (encontrado, offset do slot)
+        """
+        table, size, entry = self._table, self.digest_size, self.entry_size
+        slot = int.from_bytes(digest[4:12], "little") % self._slots
+        
+        while True:
+            offset = slot * entry
+            current = table[offset:offset + size]
+            if current == digest:
+                return True, offset
+            if current == self._empty:
+                return False, offset
+            slot += 1
+            if slot == self._slots:
+                slot = 0
+    
+    def _grow(self):
+        """
+        Duplica a tabela e volta a inserir todas as entradas
+        
+        As entradas são copiadas diretamente dos slots da tabela antiga para
+        os da nova (memoryview), sem criar um objeto bytes por entrada.
+        """
+        old, size, entry, empty = self._table, self.digest_size, self.entry_size, self._empty
+        self._allocate(self._slots * 2)
+        slots, bloom = self._slots, self._bloom
+        
+        with memoryview(old) as source, memoryview(self._table) as target:
+            for start in range(0, len(old), entry):
+                key = source[start:start + size]
+                if key == empty:
+                    continue
+                # Sondagem linear na tabela nova (só tem entradas distintas)
+                slot = int.from_bytes(key[4:12], "little") % slots
+                while target[slot * entry:slot * entry + size] != empty:
+                    slot += 1
+                    if slot == slots:
+                        slot = 0
+                offset = slot * entry
+                target[offset:offset + entry] = source[start:start + entry]
+                if bloom is not None:
+                    bloom.add(key)
+    
+    def _iter_entries(self):
+        table, size, entry, empty = self._table, self.digest_size, self.entry_size, self._empty
+        for offset in range(0, len(table), entry):
+            if table[offset:offset + size] != empty:
+                yield bytes(table[offset:offset + entry])
+    
+    def __contains__(self, digest):
+        if digest == self._empty:
+            return self._empty_value is not None
+        if self._bloom is not None and digest not in self._bloom:
+            return False
+        return self._find(digest)[0]
+    
+    def add(self, digest):
+        """
+        Acrescenta um digest
+        
+        Returns:
+            bool: True se o digest ainda não existia
+        """
+        return self.put(digest, bytes(self.value_size)) is None
+    
+    def get(self, digest, default=None):
+        """
+        Valor guardado com o digest
+        
+        Returns:
+            bytes: Valor (largura fixa) ou `default` se o digest não existir
+        """
+        if digest == self._empty:
+            return default if self._empty_value is None else self._empty_value
+        if self._bloom is not None and digest not in self._bloom:
+            return default
+        found, offset = self._find(digest)
+        if not found:
+            return default
+        start = offset + self.digest_size
+        return bytes(self._table[start:start + self.value_size])
+    
+    def put(self, digest, value=b""):
+        """
+        Guarda o digest com o valor, se o digest ainda não existir
+        
+        Returns:
+            bytes: Valor já guardado ou None se a entrada for nova
+        """
+        if len(digest) != self.digest_size:
+            raise ValueError(f"Digest com {len(digest)} bytes (esperados {self.digest_size})")
+        if len(value) != self.value_size:
+            raise ValueError(f"Valor com {len(value)} bytes (esperados {self.value_size})")
+        
+        if digest == self._empty:
+            if self._empty_value is not None:
+                return self._empty_value
+            self._empty_value = bytes(value)
+            self._count += 1
+            return None
+        
+        found, offset = self._find(digest)
+        if found:
+            start = offset + self.digest_size
+            return bytes(self._table[start:start + self.value_size])
+        
+        self._table[offset:offset + self.entry_size] = digest + value
+        if self._bloom is not None:
+            self._bloom.add(digest)
+        self._count += 1
+        if self._count > self._limit:
+            self._grow()
+        return None
+    
+    def __len__(self):
+        return self._count
+    
+    def __iter__(self):
+        if self._empty_value is not None:
+            yield self._empty
+        for entry in self._iter_entries():
+            yield entry[:self.digest_size]
+    
+    @property
+    def nbytes(self):
+        """Memória ocupada pela tabela e pelo filtro, em bytes"""
+        return len(self._table) + (self._bloom.nbytes if self._bloom is not None else 0)
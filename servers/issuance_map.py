@@ -0,0 +1,229 @@
+"""
+Credenciais já emitidas por cartão de cidadão (AR)
+Dicionário compacto cartão -> credencial, persistido num ficheiro append-only
+"""
+
+from concurrent import futures
+import hashlib
+import os
+import threading
+
+from servers.citizen_registry import normalize
+from servers.credential_store import CredentialStore
+
+
+# Digest do número de cartão e largura máxima de uma credencial
+# (assinada: CRED- + até 12 dígitos + - + MAC em hexadecimal)
+CARD_DIGEST_SIZE = 16
+CREDENTIAL_WIDTH = 34
+_RECORD_SIZE = CARD_DIGEST_SIZE + CREDENTIAL_WIDTH
+
+
+def card_digest(citizen_card_number):
+    """Digest de tamanho fixo do número de cartão (forma canónica)"""
+    return hashlib.blake2b(
+        normalize(citizen_card_number).encode("utf-8"),
+        digest_size=CARD_DIGEST_SIZE
+    ).digest()
+
+
+def _encode_credential(credential):
+    value = credential.encode("ascii")
+    if len(value) > CREDENTIAL_WIDTH:
+        raise ValueError(f"Credencial com mais de {CREDENTIAL_WIDTH} caracteres: {credential}")
+    return value.ljust(CREDENTIAL_WIDTH, b"\0")
+
+
+def _decode_credential(value):
+    return value.rstrip(b"\0").decode("ascii")
+
+
+class IssuanceMap:
+    """
+    Credencial emitida a cada cartão de cidadão, para emissão idempotente
+    
+    As entradas (digest do cartão + credencial com largura fixa) vivem num
+    CredentialStore com valores: um pedido repetido custa um digest e uma
+    pesquisa na tabela, sem retirar nada do pool.
+    
+    Cada nova atribuição é acrescentada ao ficheiro `path` (registos de
+    largura fixa) antes de a credencial ser devolvida ao cliente; no
+    arranque o ficheiro é relido e um registo incompleto no fim (escrita
+    interrompida) é descartado.
+    
+    Com `fsync`, o fsync é feito fora do lock da tabela e partilhado (group
+    commit): quem espera pelo disco enquanto outro fsync decorre fica
+    coberto pelo seguinte, que inclui todos os registos já escritos.
+    
+    O lock da tabela só cobre consultas e reservas: os cartões em falta são
+    reservados, as credenciais retiradas do pool (que pode bloquear) e
+    escritas fora dele, e só depois publicadas. Um pedido concorrente para
+    um cartão reservado espera por essa atribuição em vez de criar outra.
+    """
+    
+    def __init__(self, path=None, capacity=1024, fsync=False):
+        """
+        Args:
+            path: Ficheiro das atribuições (None = só memória)
+            capacity: Número de cidadãos previsto
+            fsync: Só devolver as atribuições depois de estarem em disco
+        """
+        self.path = path
+        self.fsync = fsync
+        self._map = CredentialStore(
+            capacity=capacity,
+            digest_size=CARD_DIGEST_SIZE,
+            value_size=CREDENTIAL_WIDTH
+        )
+        self._lock = threading.Lock()
+        # Cartões com atribuição em curso -> Future da credencial
+        self._pending = {}
+        self._file = None
+        # Escritas no ficheiro; lotes escritos / já em disco (group commit)
+        self._file_lock = threading.Lock()
+        self._sync_lock = threading.Lock()
+        self._written = 0
+        self._synced = 0
+        
+        if path is not None:
+            self._load(path)
+            self._file = open(path, "ab")
+    
+    def _load(self, path):
+        """Relê as atribuições guardadas"""
+        if not os.path.exists(path):
+            return
+        with open(path, "rb") as f:
+            data = f.read()
+        
+        valid = len(data) - len(data) % _RECORD_SIZE
+        for offset in range(0, valid, _RECORD_SIZE):
+            record = data[offset:offset + _RECORD_SIZE]
+            self._map.put(record[:CARD_DIGEST_SIZE], record[CARD_DIGEST_SIZE:])
+        
+        if valid < len(data):
+            with open(path, "r+b") as f:
+                f.truncate(valid)
+    
+    def __len__(self):
+        return len(self._map)
+    
+    def get(self, citizen_card_number):
+        """
+        Credencial já emitida ao cartão
+        
+        Returns:
+            str: Credencial ou None se ainda não foi emitida
+        """
+        digest = card_digest(citizen_card_number)
+        with self._lock:
+            value = self._map.get(digest)
+        return None if value is None else _decode_credential(value)
+    
+    def get_or_assign(self, citizen_card_numbers, allocate):
+        """
+        Credenciais dos cartões, atribuindo novas só aos que ainda não têm
+        
+        Args:
+            citizen_card_numbers: Lista de números de cartão
+            allocate: Função allocate(n) -> lista de n credenciais novas
+        
+        Returns:
+            list: (credencial, nova) de cada cartão, pela mesma ordem
+        """
+        digests = [card_digest(cc) for cc in citizen_card_numbers]
+        
+        # Consulta e reserva dos cartões sem credencial (repetidos no mesmo
+        # lote contam uma vez); os reservados por outro pedido ficam à espera
+        with self._lock:
+            existing = [self._map.get(d) for d in digests]
+            missing = []
+            waiting = {}
+            for digest in dict.fromkeys(d for d, v in zip(digests, existing) if v is None):
+                if digest in self._pending:
+                    waiting[digest] = self._pending[digest]
+                else:
+                    self._pending[digest] = futures.Future()
+                    missing.append(digest)
+        
+        assigned = {}
+        if missing:
+            assigned = self._assign(missing, allocate)
+        values = {digest: pending.result() for digest, pending in waiting.items()}
+        
+        results = []
+        for digest, value in zip(digests, existing):
+            if value is not None:
+                results.append((_decode_credential(value), False))
+            elif digest in assigned:
+                # Só a primeira ocorrência do cartão no lote é nova
+                results.append((_decode_credential(assigned.pop(digest)), True))
+            elif digest in values:
+                results.append((_decode_credential(values[digest]), False))
+            else:
+                results.append((results[digests.index(digest)][0], False))
+        return results
+    
+    def _assign(self, missing, allocate):
+        """
+        Atribui credenciais novas aos cartões reservados (sem o lock da tabela)
+        
+        Returns:
+            dict: Digest do cartão -> credencial codificada
+        """
+        try:
+            values = [_encode_credential(c) for c in allocate(len(missing))]
+            written = self._persist(b"".join(d + v for d, v in zip(missing, values)))
+            if written is not None:
+                self._sync(written)
+        except BaseException as e:
+            # Liberta as reservas: quem esperava recebe o mesmo erro
+            with self._lock:
+                pending = [self._pending.pop(d) for d in missing]
+            for future in pending:
+                future.set_exception(e)
+            raise
+        
+        # Publica: a partir daqui os pedidos encontram a credencial na tabela
+        with self._lock:
+            for digest, value in zip(missing, values):
+                self._map.put(digest, value)
+            pending = [self._pending.pop(d) for d in missing]
+        for future, value in zip(pending, values):
+            future.set_result(value)
+        return dict(zip(missing, values))
+    
+    def _persist(self, records):
+        """
+        Acrescenta registos ao ficheiro
+        
+        Returns:
+            int: Número do lote escrito (None sem ficheiro)
+        """
+        with self._file_lock:
+            if self._file is None:
+                return None
+            self._file.write(records)
+            self._file.flush()
+            self._written += 1
+            return self._written
+    
+    def _sync(self, written):
+        """Espera que o lote `written` esteja em disco (um fsync por grupo)"""
+        if not self.fsync:
+            return
+        with self._sync_lock:
+            if self._synced >= written or self._file is None:
+                return
+            # Todos os lotes escritos até aqui ficam cobertos por este fsync
+            target = self._written
+            os.fsync(self._file.fileno())
+            self._synced = target
+    
+    def close(self):
+        with self._sync_lock, self._file_lock:
+            if self._file is not None:
+                if self.fsync:
+                    os.fsync(self._file.fileno())
+                self._file.close()
+                self._file = None
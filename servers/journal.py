@@ -0,0 +1,235 @@
+"""
+Diário de votos da Autoridade de Votação (AV)
+Segmentos binários append-only com group commit (um fsync partilhado por lote)
+"""
+
+from concurrent.futures import Future
+import os
+import re
+import struct
+import threading
+import time
+import zlib
+
+
+# Cabeçalho de cada registo: comprimento do payload + CRC32 do payload
+_HEADER = struct.Struct("<II")
+# Payload: ID do candidato seguido da credencial em UTF-8
+_CANDIDATE = struct.Struct("<i")
+
+_SEGMENT_NAME = re.compile(r"^segment-(\d{8})\.log$")
+
+
+def segment_path(directory, segment_id):
+    """Caminho do ficheiro de um segmento"""
+    return os.path.join(directory, f"segment-{segment_id:08d}.log")
+
+
+def list_segments(directory):
+    """IDs dos segmentos existentes, por ordem crescente"""
+    if not os.path.isdir(directory):
+        return []
+    matches = (_SEGMENT_NAME.match(name) for name in os.listdir(directory))
+    return sorted(int(m.group(1)) for m in matches if m)
+
+
+def read_segments(directory, after=0):
+    """
+    Lê os votos de todos os segmentos com ID superior a `after`
+    
+    Returns:
+        list: Lista de tuplos (credential, candidate_id)
+    """
+    records = []
+    for segment_id in list_segments(directory):
+        if segment_id > after:
+            records.extend(read_records(segment_path(directory, segment_id))[0])
+    return records
+
+
+def encode_record(credential, candidate_id):
+    """Codifica um voto aceite num registo com prefixo de comprimento"""
+    payload = _CANDIDATE.pack(candidate_id) + credential.encode("utf-8")
+    return _HEADER.pack(len(payload), zlib.crc32(payload)) + payload
+
+
+def read_records(path):
+    """
+    Lê os votos de um diário, parando no primeiro registo incompleto
+    
+    Um registo truncado ou corrompido no fim do ficheiro corresponde a uma
+    escrita interrompida por um crash: esse voto nunca foi confirmado ao
+    cliente e é descartado.
+    
+    Args:
+        path: Caminho do ficheiro do diário
+    
+    Returns:
+        tuple: (lista de (credential, candidate_id), bytes válidos lidos)
+    """
+    records = []
+    offset = 0
+    
+    if not os.path.exists(path):
+        return records, offset
+    
+    with open(path, "rb") as f:
+        data = f.read()
+    
+    while offset + _HEADER.size <= len(data):
+        length, crc = _HEADER.unpack_from(data, offset)
+        start = offset + _HEADER.size
+        payload = data[start:start + length]
+        if len(payload) < length or zlib.crc32(payload) != crc:
+            break
+        
+        (candidate_id,) = _CANDIDATE.unpack_from(payload)
+        records.append((payload[_CANDIDATE.size:].decode("utf-8"), candidate_id))
+        offset = start + length
+    
+    return records, offset
+
+
+class VoteJournal:
+    """
+    Diário durável de votos aceites
+    
+    Os votos são acumulados em memória e escritos por uma thread própria.
+    Depois do primeiro voto de um lote, a thread espera `flush_window`
+    segundos para juntar mais votos, escreve-os de uma vez e faz um único
+    fsync; todos os votos do lote são confirmados ao mesmo tempo. Janelas
+    maiores dão mais votos por fsync à custa de latência.
+    
+    Uma falha de escrita (ou de fsync) fica registada em `error`: o
+    segmento pode ter ficado com um registo parcial, e votos escritos a
+    seguir a ele seriam perdidos na releitura, por isso todos os lotes e
+    pedidos seguintes falham até o diário ser reaberto.
+    
+    O diário é um diretório de segmentos numerados. Cada arranque abre um
+    segmento novo e um segmento é fechado quando excede `segment_bytes` ou
+    quando é pedido (rotate), para poder ser compactado num snapshot.
+    """
+    
+    def __init__(self, directory, flush_window=0.002, fsync=True,
+                 segment_bytes=64 * 1024 * 1024):
+        """
+        Args:
+            directory: Diretório dos segmentos do diário
+            flush_window: Janela de group commit, em segundos
+            fsync: Forçar escrita em disco em cada lote
+            segment_bytes: Tamanho a partir do qual o segmento é fechado
+        """
+        self.directory = directory
+        self.flush_window = flush_window
+        self.fsync = fsync
+        self.segment_bytes = segment_bytes
+        
+        os.makedirs(directory, exist_ok=True)
+        # Segmentos anteriores ficam só para leitura (cauda incompleta ignorada)
+        segments = list_segments(directory)
+        self.active_segment = (segments[-1] if segments else 0) + 1
+        self._file = open(segment_path(directory, self.active_segment), "ab")
+        self._file_lock = threading.Lock()
+        
+        self._cond = threading.Condition()
+        self._pending = []
+        self._batch = Future()
+        self._closed = False
+        self.error = None
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+    
+    def append(self, credential, candidate_id):
+        """
+        Acrescenta um voto ao lote atual
+        
+        Returns:
+            Future: Concluído quando o lote estiver em disco
+        """
+        return self.append_many([(credential, candidate_id)])
+    
+    def append_many(self, ballots):
+        """
+        Acrescenta vários votos ao lote atual
+        
+        Args:
+            ballots: Lista de tuplos (credential, candidate_id)
+        
+        Returns:
+            Future: Concluído quando o lote estiver em disco
+        
+        Raises:
+            OSError: Se uma escrita anterior falhou
+        """
+        if self.error is not None:
+            raise self.error
+        records = [encode_record(c, cid) for c, cid in ballots]
+        if not records:
+            done = Future()
+            done.set_result(0)
+            return done
+        
+        with self._cond:
+            if self._closed:
+                raise RuntimeError("Diário de votos fechado")
+            self._pending.extend(records)
+            self._cond.notify()
+            return self._batch
+    
+    def rotate(self):
+        """
+        Fecha o segmento ativo (se tiver votos) e abre o seguinte
+        
+        Returns:
+            int: ID do último segmento fechado
+        """
+        with self._file_lock:
+            if self._file.tell() > 0:
+                self._file.close()
+                self.active_segment += 1
+                self._file = open(segment_path(self.directory, self.active_segment), "ab")
+            return self.active_segment - 1
+    
+    def _run(self):
+        """Thread de escrita: um write + fsync por lote"""
+        while True:
+            with self._cond:
+                self._cond.wait_for(lambda: self._pending or self._closed)
+                if not self._pending and self._closed:
+                    return
+            
+            # Dá tempo a outros votos para entrarem no mesmo lote
+            if self.flush_window:
+                time.sleep(self.flush_window)
+            
+            with self._cond:
+                records, self._pending = self._pending, []
+                batch, self._batch = self._batch, Future()
+            
+            if self.error is not None:
+                batch.set_exception(self.error)
+                continue
+            
+            try:
+                with self._file_lock:
+                    self._file.write(b"".join(records))
+                    self._file.flush()
+                    if self.fsync:
+                        os.fsync(self._file.fileno())
+                    full = self._file.tell() >= self.segment_bytes
+                if full:
+                    self.rotate()
+            except OSError as e:
+                self.error = e
+                batch.set_exception(e)
+            else:
+                batch.set_result(len(records))
+    
+    def close(self):
+        """Escreve os votos pendentes e fecha o ficheiro"""
+        with self._cond:
+            self._closed = True
+            self._cond.notify()
+        self._thread.join()
+        with self._file_lock:
+            self._file.close()
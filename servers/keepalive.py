@@ -0,0 +1,12 @@
+"""
+Opções gRPC de keepalive comuns aos servidores AR e AV
+Os clientes (src/channels.py) enviam pings a cada 30 s, também sem chamadas ativas
+"""
+
+
+# Sem estas opções o servidor só aceita um ping a cada 5 minutos sem
+# dados e fecha a ligação (GOAWAY too_many_pings) a clientes com keepalive
+SERVER_OPTIONS = [
+    ("grpc.http2.min_ping_interval_without_data_ms", 20_000),
+    ("grpc.keepalive_permit_without_calls", 1),
+]
@@ -0,0 +1,541 @@
+"""
+Métricas por RPC dos servidores AR e AV
+Histogramas de latência (buckets estilo HDR), pedidos em curso e códigos de erro,
+recolhidos por um interceptor em buffers por thread; profiler por amostragem de stacks
+
+Endpoint local (--metrics-port):
+    GET  /metrics                 formato de texto do Prometheus
+    GET  /metrics.json            o mesmo em JSON
+    POST /profile?seconds=N       amostra as stacks de todas as threads durante N s
+Sinais (Unix): SIGUSR1 inicia o profiler, SIGUSR2 grava as métricas em ficheiro
+"""
+
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+import asyncio
+import inspect
+import json
+import os
+import signal
+import sys
+import threading
+import time
+
+import grpc
+
+
+# Buckets log-lineares em microssegundos: valores < 16 µs exatos, depois 8
+# sub-buckets por potência de 2 (erro relativo máximo de 12,5%)
+_SUB_BITS = 3
+_SUB = 1 << _SUB_BITS
+_LINEAR = 2 * _SUB
+BUCKETS = 320
+
+
+def bucket_index(micros):
+    """Índice do bucket de uma latência em microssegundos"""
+    if micros < _LINEAR:
+        return max(micros, 0)
+    shift = micros.bit_length() - 1 - _SUB_BITS
+    return min((shift + 1) * _SUB + (micros >> shift) - _SUB, BUCKETS - 1)
+
+
+def bucket_upper(index):
+    """Limite superior (exclusivo) do bucket, em microssegundos"""
+    if index < _LINEAR:
+        return index + 1
+    shift = index // _SUB - 1
+    return ((index % _SUB) + _SUB + 1) << shift
+
+
+class _MethodStats:
+    """Contadores de um método numa thread (só essa thread escreve)"""
+    
+    __slots__ = ("buckets", "started", "finished", "total_us", "max_us", "codes")
+    
+    def __init__(self):
+        self.buckets = [0] * BUCKETS
+        self.started = 0
+        self.finished = 0
+        self.total_us = 0
+        self.max_us = 0
+        self.codes = {}
+
+
+class Metrics:
+    """
+    Métricas por método gRPC
+    
+    Cada thread escreve no seu próprio buffer (threading.local), sem
+    locks no caminho de um pedido; o lock só é usado quando uma thread
+    regista o seu buffer pela primeira vez e quando um leitor junta os
+    buffers. Uma leitura concorrente pode ver um pedido a meio de ser
+    contado, o que não afeta os totais seguintes.
+    """
+    
+    def __init__(self):
+        self._local = threading.local()
+        self._buffers = []
+        self._lock = threading.Lock()
+        self.started_at = time.time()
+    
+    def _stats(self, method):
+        buffer = getattr(self._local, "buffer", None)
+        if buffer is None:
+            buffer = self._local.buffer = {}
+            with self._lock:
+                self._buffers.append(buffer)
+        stats = buffer.get(method)
+        if stats is None:
+            stats = buffer[method] = _MethodStats()
+        return stats
+    
+    def begin(self, method):
+        """Início de um pedido; devolve o instante para end()"""
+        self._stats(method).started += 1
+        return time.perf_counter()
+    
+    def end(self, method, started, code="OK"):
+        """Fim de um pedido com o código de estado `code`"""
+        micros = int((time.perf_counter() - started) * 1_000_000)
+        stats = self._stats(method)
+        stats.buckets[bucket_index(micros)] += 1
+        stats.finished += 1
+        stats.total_us += micros
+        if micros > stats.max_us:
+            stats.max_us = micros
+        stats.codes[code] = stats.codes.get(code, 0) + 1
+    
+    def snapshot(self):
+        """
+        Junta os buffers de todas as threads
+        
+        Returns:
+            dict: {método: {count, inflight, codes, total_us, max_us, buckets}}
+        """
+        with self._lock:
+            buffers = list(self._buffers)
+        
+        merged = {}
+        for buffer in buffers:
+            for method, stats in list(buffer.items()):
+                entry = merged.setdefault(method, {
+                    "count": 0, "inflight": 0, "codes": Counter(),
+                    "total_us": 0, "max_us": 0, "buckets": [0] * BUCKETS,
+                })
+                entry["count"] += stats.finished
+                entry["inflight"] += stats.started - stats.finished
+                entry["codes"].update(stats.codes)
+                entry["total_us"] += stats.total_us
+                entry["max_us"] = max(entry["max_us"], stats.max_us)
+                entry["buckets"] = [a + b for a, b in zip(entry["buckets"], stats.buckets)]
+        return merged
+    
+    def summary(self):
+        """Métricas legíveis: percentis (ms), pedidos em curso e códigos"""
+        report = {}
+        for method, entry in sorted(self.snapshot().items()):
+            report[method] = {
+                "count": entry["count"],
+                "inflight": max(entry["inflight"], 0),
+                "codes": dict(entry["codes"]),
+                "mean_ms": round(entry["total_us"] / entry["count"] / 1000, 3) if entry["count"] else None,
+                "p50_ms": _percentile(entry["buckets"], entry["count"], 50),
+                "p90_ms": _percentile(entry["buckets"], entry["count"], 90),
+                "p99_ms": _percentile(entry["buckets"], entry["count"], 99),
+                "p999_ms": _percentile(entry["buckets"], entry["count"], 99.9),
+                "max_ms": entry["max_us"] / 1000,
+            }
+        return {"pid": os.getpid(), "uptime_s": round(time.time() - self.started_at, 1), "methods": report}
+    
+    def render_prometheus(self):
+        """Métricas no formato de texto do Prometheus"""
+        lines = [
+            "# TYPE grpc_server_handling_seconds histogram",
+        ]
+        snapshot = sorted(self.snapshot().items())
+        for method, entry in snapshot:
+            cumulative = 0
+            for index, count in enumerate(entry["buckets"]):
+                if not count:
+                    continue
+                cumulative += count
+                le = bucket_upper(index) / 1_000_000
+                lines.append(f'grpc_server_handling_seconds_bucket{{method="{method}",le="{le:g}"}} {cumulative}')
+            lines.append(f'grpc_server_handling_seconds_bucket{{method="{method}",le="+Inf"}} {entry["count"]}')
+            lines.append(f'grpc_server_handling_seconds_sum{{method="{method}"}} {entry["total_us"] / 1_000_000:g}')
+            lines.append(f'grpc_server_handling_seconds_count{{method="{method}"}} {entry["count"]}')
+        
+        lines.append("# TYPE grpc_server_handled_total counter")
+        for method, entry in snapshot:
+            for code, count in sorted(entry["codes"].items()):
+                lines.append(f'grpc_server_handled_total{{method="{method}",code="{code}"}} {count}')
+        
+        lines.append("# TYPE grpc_server_inflight gauge")
+        for method, entry in snapshot:
+            lines.append(f'grpc_server_inflight{{method="{method}"}} {max(entry["inflight"], 0)}')
+        return "\n".join(lines) + "\n"
+    
+    def dump(self, path):
+        """Grava o resumo das métricas em JSON"""
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.summary(), f, indent=2)
+        os.replace(tmp_path, path)
+        return path
+
+
+def _percentile(buckets, count, p):
+    """Percentil (ms) a partir dos buckets: limite superior do bucket"""
+    if not count:
+        return None
+    target = count * p / 100
+    seen = 0
+    for index, n in enumerate(buckets):
+        seen += n
+        if seen >= target:
+            return bucket_upper(index) / 1000
+    return bucket_upper(BUCKETS - 1) / 1000
+
+
+def _code_name(context):
+    """Código de estado definido pelo handler (None = não definido)"""
+    code = getattr(context, "code", None)
+    code = code() if callable(code) else None
+    return code.name if isinstance(code, grpc.StatusCode) else None
+
+
+def _failure_code(error, context):
+    """Código de um handler asyncio que terminou com uma exceção"""
+    if isinstance(error, (GeneratorExit, asyncio.CancelledError)):
+        # Cliente desligou ou o prazo expirou
+        return "CANCELLED"
+    return _code_name(context) or "UNKNOWN"
+
+
+def _method_name(handler_call_details):
+    return handler_call_details.method.rsplit("/", 1)[-1]
+
+
+class MetricsInterceptor(grpc.ServerInterceptor):
+    """Interceptor do servidor com pool de threads"""
+    
+    def __init__(self, metrics):
+        self.metrics = metrics
+    
+    def intercept_service(self, continuation, handler_call_details):
+        handler = continuation(handler_call_details)
+        if handler is None:
+            return None
+        method = _method_name(handler_call_details)
+        
+        if handler.unary_unary:
+            return handler._replace(unary_unary=self._unary(method, handler.unary_unary))
+        if handler.stream_unary:
+            return handler._replace(stream_unary=self._unary(method, handler.stream_unary))
+        if handler.unary_stream:
+            return handler._replace(unary_stream=self._stream(method, handler.unary_stream))
+        return handler._replace(stream_stream=self._stream(method, handler.stream_stream))
+    
+    def _unary(self, method, behavior):
+        metrics = self.metrics
+        
+        def wrapper(request, context):
+            started = metrics.begin(method)
+            code = None
+            try:
+                return behavior(request, context)
+            except Exception:
+                code = _code_name(context) or "UNKNOWN"
+                raise
+            finally:
+                metrics.end(method, started, code or _code_name(context) or "OK")
+        
+        return wrapper
+    
+    def _stream(self, method, behavior):
+        metrics = self.metrics
+        
+        def wrapper(request, context):
+            started = metrics.begin(method)
+            code = None
+            try:
+                yield from behavior(request, context)
+            except GeneratorExit:
+                # Cliente desligou a meio do stream
+                code = "CANCELLED"
+                raise
+            except Exception:
+                code = _code_name(context) or "UNKNOWN"
+                raise
+            finally:
+                metrics.end(method, started, code or _code_name(context) or "OK")
+        
+        return wrapper
+
+
+class AsyncMetricsInterceptor(grpc.aio.ServerInterceptor):
+    """Interceptor do servidor grpc.aio"""
+    
+    def __init__(self, metrics):
+        self.metrics = metrics
+    
+    async def intercept_service(self, continuation, handler_call_details):
+        handler = await continuation(handler_call_details)
+        if handler is None:
+            return None
+        method = _method_name(handler_call_details)
+        
+        for kind in ("unary_unary", "stream_unary", "unary_stream", "stream_stream"):
+            behavior = getattr(handler, kind)
+            if behavior is None:
+                continue
+            if inspect.isasyncgenfunction(behavior):
+                return handler._replace(**{kind: self._stream(method, behavior)})
+            return handler._replace(**{kind: self._unary(method, behavior)})
+        return handler
+    
+    def _unary(self, method, behavior):
+        metrics = self.metrics
+        
+        async def wrapper(request, context):
+            started = metrics.begin(method)
+            code = None
+            try:
+                return await behavior(request, context)
+            except BaseException as e:
+                code = _failure_code(e, context)
+                raise
+            finally:
+                metrics.end(method, started, code or _code_name(context) or "OK")
+        
+        return wrapper
+    
+    def _stream(self, method, behavior):
+        metrics = self.metrics
+        
+        async def wrapper(request, context):
+            started = metrics.begin(method)
+            code = None
+            try:
+                async for response in behavior(request, context):
+                    yield response
+            except BaseException as e:
+                code = _failure_code(e, context)
+                raise
+            finally:
+                metrics.end(method, started, code or _code_name(context) or "OK")
+        
+        return wrapper
+
+
+class StackSampler:
+    """
+    Profiler por amostragem: stacks de todas as threads a cada `interval`
+    
+    Ao contrário do cProfile (só vê a thread que o ativa), apanha as
+    threads do servidor sem as instrumentar; o custo é uma leitura de
+    sys._current_frames() por amostra. O resultado é um ficheiro de
+    stacks "dobradas" (uma linha por stack com o número de amostras),
+    o formato aceite pelos geradores de flame graphs.
+    """
+    
+    def __init__(self, directory=".", interval=0.005):
+        """
+        Args:
+            directory: Diretório dos ficheiros de perfil
+            interval: Intervalo entre amostras, em segundos
+        """
+        self.directory = directory
+        self.interval = interval
+        self._thread = None
+        self._lock = threading.Lock()
+        self.last_path = None
+    
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+    
+    def start(self, seconds):
+        """
+        Inicia uma amostragem de `seconds` segundos em fundo
+        
+        Returns:
+            str: Ficheiro onde o perfil vai ser gravado (None se já houver
+            uma amostragem a decorrer)
+        """
+        with self._lock:
+            if self.running:
+                return None
+            stamp = time.strftime("%Y%m%d-%H%M%S")
+            path = os.path.join(self.directory, f"profile-{os.getpid()}-{stamp}.folded")
+            self._thread = threading.Thread(
+                target=self._run, args=(seconds, path), name="stack-sampler", daemon=True
+            )
+            self._thread.start()
+            return path
+    
+    def _run(self, seconds, path):
+        own = threading.get_ident()
+        stacks = Counter()
+        samples = 0
+        deadline = time.monotonic() + seconds
+        while time.monotonic() < deadline:
+            for ident, frame in sys._current_frames().items():
+                if ident == own:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+                    frame = frame.f_back
+                stacks[";".join(reversed(stack))] += 1
+            samples += 1
+            time.sleep(self.interval)
+        
+        os.makedirs(self.directory, exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            for stack, count in stacks.most_common():
+                f.write(f"{stack} {count}\n")
+        self.last_path = path
+        print(f"🔬 Perfil gravado em {path} ({samples} amostras)")
+
+
+class _Handler(BaseHTTPRequestHandler):
+    """Pedidos do endpoint de métricas (ver docstring do módulo)"""
+    
+    metrics = None
+    sampler = None
+    profile_seconds = 10
+    
+    def do_GET(self):
+        route = urlparse(self.path).path
+        if route == "/metrics":
+            self._reply(200, self.metrics.render_prometheus(), "text/plain; version=0.0.4")
+        elif route == "/metrics.json":
+            self._reply(200, json.dumps(self.metrics.summary(), indent=2), "application/json")
+        else:
+            self._reply(404, "not found\n")
+    
+    def do_POST(self):
+        url = urlparse(self.path)
+        if url.path != "/profile":
+            self._reply(404, "not found\n")
+            return
+        try:
+            seconds = float(parse_qs(url.query).get("seconds", [self.profile_seconds])[0])
+        except ValueError:
+            self._reply(400, "seconds inválido\n")
+            return
+        path = self.sampler.start(seconds)
+        if path is None:
+            self._reply(409, "profiler já ativo\n")
+        else:
+            self._reply(202, json.dumps({"seconds": seconds, "path": path}) + "\n", "application/json")
+    
+    def _reply(self, status, body, content_type="text/plain"):
+        data = body.encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+    
+    def log_message(self, format, *args):
+        # Pedidos de scraping não entram no terminal
+        pass
+
+
+class MetricsAdmin:
+    """
+    Métricas e profiler de um processo servidor
+    
+    Cria o Metrics e os interceptores, o endpoint HTTP local (opcional) e
+    os sinais SIGUSR1/SIGUSR2 (só na thread principal, em Unix).
+    """
+    
+    def __init__(self, port=None, directory=".", profile_seconds=10, profile_interval=0.005):
+        """
+        Args:
+            port: Porta do endpoint HTTP em 127.0.0.1 (None = sem endpoint)
+            directory: Diretório dos perfis e dos ficheiros de métricas
+            profile_seconds: Duração de um perfil pedido por sinal
+            profile_interval: Intervalo entre amostras do profiler
+        """
+        self.metrics = Metrics()
+        self.directory = directory
+        self.profile_seconds = profile_seconds
+        self.sampler = StackSampler(directory, profile_interval)
+        self._http = None
+        
+        if port is not None:
+            handler = type("MetricsHandler", (_Handler,), {
+                "metrics": self.metrics,
+                "sampler": self.sampler,
+                "profile_seconds": profile_seconds,
+            })
+            self._http = ThreadingHTTPServer(("127.0.0.1", port), handler)
+            self._http.daemon_threads = True
+            threading.Thread(target=self._http.serve_forever, name="metrics-http", daemon=True).start()
+            print(f"📈 Métricas em http://127.0.0.1:{self._http.server_address[1]}/metrics")
+    
+    @property
+    def port(self):
+        return None if self._http is None else self._http.server_address[1]
+    
+    def interceptors(self, use_aio=False):
+        """Interceptores para grpc.server / grpc.aio.server"""
+        if use_aio:
+            return [AsyncMetricsInterceptor(self.metrics)]
+        return [MetricsInterceptor(self.metrics)]
+    
+    def install_signals(self):
+        """SIGUSR1: perfil de profile_seconds; SIGUSR2: grava as métricas"""
+        if not hasattr(signal, "SIGUSR1") or threading.current_thread() is not threading.main_thread():
+            return
+        signal.signal(signal.SIGUSR1, lambda *_: self.sampler.start(self.profile_seconds))
+        signal.signal(signal.SIGUSR2, lambda *_: self.dump())
+    
+    def dump(self):
+        """Grava as métricas em metrics-<pid>.json no diretório configurado"""
+        os.makedirs(self.directory, exist_ok=True)
+        path = self.metrics.dump(os.path.join(self.directory, f"metrics-{os.getpid()}.json"))
+        print(f"📈 Métricas gravadas em {path}")
+        return path
+    
+    def close(self, dump=True):
+        """Para o endpoint e grava as métricas finais"""
+        if self._http is not None:
+            self._http.shutdown()
+            self._http.server_close()
+            self._http = None
+        if dump:
+            self.dump()
+
+
+def add_arguments(parser):
+    """Acrescenta as opções de métricas a um argparse.ArgumentParser"""
+    parser.add_argument("--metrics-port", type=int,
+                        help="Porta do endpoint local de métricas/profiler em 127.0.0.1")
+    parser.add_argument("--metrics-dir",
+                        help="Diretório dos ficheiros de métricas e de perfis "
+                             "(ativa as métricas sem endpoint; default com --metrics-port: .)")
+    parser.add_argument("--profile-seconds", type=float, default=10.0,
+                        help="Duração de um perfil pedido por SIGUSR1")
+
+
+def options_from_args(args):
+    """
+    Argumentos do MetricsAdmin a partir das opções da linha de comandos
+    
+    Returns:
+        dict: Opções ou None se as métricas não foram pedidas
+    """
+    if args.metrics_port is None and args.metrics_dir is None:
+        return None
+    return {
+        "port": args.metrics_port,
+        "directory": args.metrics_dir or ".",
+        "profile_seconds": args.profile_seconds,
+    }
@@ -0,0 +1,243 @@
+"""
+Registo estruturado de pedidos dos servidores mock (AR e AV)
+Os handlers só põem registos numa fila; uma thread própria formata e escreve em lote
+"""
+
+from collections import deque
+import json
+import random
+import sys
+import threading
+import time
+
+
+DEBUG = 10
+INFO = 20
+WARNING = 30
+ERROR = 40
+
+LEVELS = {"debug": DEBUG, "info": INFO, "warning": WARNING, "error": ERROR}
+_LEVEL_NAMES = {value: name.upper() for name, value in LEVELS.items()}
+
+
+def parse_sampling(specs):
+    """
+    Converte especificações "nível=taxa" num dicionário de amostragem
+    
+    Args:
+        specs: Lista de strings, ex.: ["debug=0.01", "info=0.5"]
+    
+    Returns:
+        dict: {nível: taxa entre 0 e 1}
+    
+    Raises:
+        ValueError: Se o nível ou a taxa forem inválidos
+    """
+    sampling = {}
+    for spec in specs or ():
+        name, _, rate = spec.partition("=")
+        if name.lower() not in LEVELS:
+            raise ValueError(f"Nível de log desconhecido: {name}")
+        rate = float(rate)
+        if not 0.0 <= rate <= 1.0:
+            raise ValueError(f"Taxa de amostragem fora de [0, 1]: {spec}")
+        sampling[LEVELS[name.lower()]] = rate
+    return sampling
+
+
+def format_text(record):
+    """Linha legível: hora, nível, evento e campos chave=valor"""
+    timestamp, level, event, fields = record
+    clock = time.strftime("%H:%M:%S", time.localtime(timestamp))
+    millis = int(timestamp * 1000) % 1000
+    pairs = " ".join(f"{key}={value}" for key, value in fields.items())
+    return f"{clock}.{millis:03d} {_LEVEL_NAMES[level]:<7} {event} {pairs}".rstrip()
+
+
+def format_json(record):
+    """Uma linha JSON por registo"""
+    timestamp, level, event, fields = record
+    return json.dumps(
+        {"ts": round(timestamp, 6), "level": _LEVEL_NAMES[level].lower(), "event": event, **fields},
+        ensure_ascii=False
+    )
+
+
+FORMATS = {"text": format_text, "json": format_json}
+
+
+class RequestLog:
+    """
+    Registo de pedidos fora do caminho crítico
+    
+    `log()` só decide se o registo é aceite (nível e amostragem) e acrescenta
+    um tuplo à fila; nunca formata nem escreve. A thread de escrita acorda a
+    cada `flush_interval` segundos (ou quando a fila enche), formata o lote
+    inteiro e faz uma única escrita + flush.
+    
+    A fila é limitada: quando passa de `shed_at` registos pendentes os
+    registos DEBUG são descartados (se `shed_debug`) e quando chega a
+    `max_pending` todos são descartados, exceto ERROR. Um destino lento
+    perde registos em vez de atrasar os pedidos; os descartes são contados
+    e reportados no próprio log.
+    """
+    
+    def __init__(self, stream=None, level=DEBUG, sampling=None, fmt="text",
+                 flush_interval=0.05, max_pending=10_000, shed_debug=True):
+        """
+        Args:
+            stream: Destino (objeto com write/flush; default: sys.stdout atual)
+            level: Nível mínimo registado
+            sampling: {nível: taxa entre 0 e 1} (default: tudo)
+            fmt: Formato das linhas ("text" ou "json")
+            flush_interval: Intervalo máximo entre escritas, em segundos
+            max_pending: Registos pendentes a partir dos quais há descartes
+            shed_debug: Descartar DEBUG quando a fila passa de metade
+        """
+        self.stream = stream
+        self.level = level
+        self.sampling = dict(sampling or {})
+        self.format = FORMATS[fmt]
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self.shed_at = max_pending // 2 if shed_debug else max_pending
+        
+        # deque.append é atómico: os handlers não partilham nenhum lock
+        # (só os descartes, com a fila já cheia, passam pelo _dropped_lock)
+        self._pending = deque()
+        self._wakeup = threading.Event()
+        self._closed = False
+        self.dropped = 0
+        self._dropped_lock = threading.Lock()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+    
+    def log(self, level, event, **fields):
+        """
+        Acrescenta um registo à fila (não bloqueia)
+        
+        Args:
+            level: Nível do registo (DEBUG, INFO, WARNING, ERROR)
+            event: Nome do evento, ex.: "vote"
+            **fields: Campos do registo
+        """
+        if level < self.level or self._closed:
+            return
+        
+        rate = self.sampling.get(level)
+        if rate is not None and random.random() >= rate:
+            return
+        
+        pending = len(self._pending)
+        if pending >= self.shed_at:
+            if (level == DEBUG or pending >= self.max_pending) and level < ERROR:
+                with self._dropped_lock:
+                    self.dropped += 1
+                return
+            self._wakeup.set()
+        
+        self._pending.append((time.time(), level, event, fields))
+    
+    def debug(self, event, **fields):
+        self.log(DEBUG, event, **fields)
+    
+    def info(self, event, **fields):
+        self.log(INFO, event, **fields)
+    
+    def warning(self, event, **fields):
+        self.log(WARNING, event, **fields)
+    
+    def error(self, event, **fields):
+        self.log(ERROR, event, **fields)
+    
+    def _drain(self):
+        """Retira da fila todos os registos pendentes"""
+        records = []
+        pending = self._pending
+        while pending:
+            records.append(pending.popleft())
+        return records
+    
+    def _write(self, records):
+        """Formata e escreve um lote de registos"""
+        with self._dropped_lock:
+            dropped, self.dropped = self.dropped, 0
+        if dropped:
+            records.append((time.time(), WARNING, "log.dropped", {"records": dropped}))
+        if not records:
+            return
+        
+        stream = self.stream or sys.stdout
+        try:
+            stream.write("".join(self.format(r) + "\n" for r in records))
+            stream.flush()
+        except (OSError, ValueError):
+            # Destino fechado (ex.: pipe do run_both.py terminou)
+            pass
+    
+    def _run(self):
+        """Thread de escrita: um write + flush por lote"""
+        while not self._closed:
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            self._write(self._drain())
+    
+    def close(self):
+        """Escreve os registos pendentes e para a thread de escrita"""
+        self._closed = True
+        self._wakeup.set()
+        self._thread.join()
+        self._write(self._drain())
+
+
+_default = None
+_default_lock = threading.Lock()
+
+
+def get_default():
+    """Registo partilhado pelos serviços do processo (criado no primeiro uso)"""
+    global _default
+    with _default_lock:
+        if _default is None:
+            _default = RequestLog()
+        return _default
+
+
+def configure(**options):
+    """
+    Substitui o registo partilhado do processo
+    
+    Args:
+        **options: Argumentos do RequestLog
+    
+    Returns:
+        RequestLog: Novo registo partilhado
+    """
+    global _default
+    with _default_lock:
+        previous, _default = _default, RequestLog(**options)
+    if previous is not None:
+        previous.close()
+    return _default
+
+
+def add_arguments(parser):
+    """Acrescenta as opções de log a um argparse.ArgumentParser"""
+    parser.add_argument("--log-level", choices=sorted(LEVELS), default="debug",
+                        help="Nível mínimo dos registos de pedidos")
+    parser.add_argument("--log-format", choices=sorted(FORMATS), default="text",
+                        help="Formato dos registos de pedidos")
+    parser.add_argument("--log-sample", action="append", default=[], metavar="NIVEL=TAXA",
+                        help="Amostragem por nível, ex.: debug=0.01 (repetível)")
+    parser.add_argument("--log-keep-debug", action="store_true",
+                        help="Não descartar registos DEBUG com a fila de log cheia")
+
+
+def options_from_args(args):
+    """Argumentos do RequestLog a partir das opções da linha de comandos"""
+    return {
+        "level": LEVELS[args.log_level],
+        "fmt": args.log_format,
+        "sampling": parse_sampling(args.log_sample),
+        "shed_debug": not args.log_keep_debug,
+    }
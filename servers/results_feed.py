@@ -0,0 +1,159 @@
+"""
+Difusão de resultados da Autoridade de Votação (AV)
+Um único diff da contagem por intervalo, partilhado por todos os observadores
+"""
+
+import asyncio
+import threading
+
+from generated import voting_pb2
+
+
+class ResultsFeed:
+    """
+    Calcula as alterações da contagem a cada intervalo e notifica observadores
+    
+    Uma thread de fundo compara a contagem atual com a do intervalo anterior
+    e publica uma única mensagem com os candidatos alterados. Os observadores
+    só esperam pela próxima mensagem; quem se atrasar mais de um intervalo
+    recebe um snapshot completo em vez dos deltas perdidos.
+    
+    Observadores em asyncio (grpc.aio) esperam num asyncio.Event por event
+    loop: cada intervalo custa uma notificação por loop, não por observador.
+    """
+    
+    def __init__(self, tally, names, interval=0.5):
+        """
+        Args:
+            tally: Motor de contagem (TallyEngine)
+            names: Nomes dos candidatos ({id: name} ou pares (id, name))
+            interval: Intervalo de agregação das alterações, em segundos
+        """
+        self.tally = tally
+        self.names = dict(names)
+        self.interval = interval
+        
+        self._cond = threading.Condition()
+        self._seq = 0
+        self._current = tally.results()
+        self._delta = None
+        self._snapshot = None
+        self._events = {}
+        self._thread = None
+        self._stopped = threading.Event()
+    
+    def _results(self, votes):
+        """Converte {id: votos} em CandidateResult"""
+        return [
+            voting_pb2.CandidateResult(id=cid, name=self.names[cid], votes=count)
+            for cid, count in votes.items()
+        ]
+    
+    def _snapshot_message(self):
+        """Snapshot da sequência atual (construído uma vez por sequência)"""
+        if self._snapshot is None:
+            self._snapshot = voting_pb2.ResultsUpdate(
+                snapshot=True,
+                results=self._results(self._current)
+            )
+        return self._snapshot
+    
+    def start(self):
+        """Inicia a thread de agregação (se ainda não estiver a correr)"""
+        with self._cond:
+            if self._thread is None:
+                # Atualiza o estado antes do primeiro snapshot
+                self.tick()
+                self._thread = threading.Thread(target=self._run, daemon=True)
+                self._thread.start()
+    
+    def stop(self):
+        """Para a thread de agregação"""
+        self._stopped.set()
+        if self._thread is not None:
+            self._thread.join()
+    
+    def _run(self):
+        """Ciclo de agregação: um diff da contagem por intervalo"""
+        while not self._stopped.wait(self.interval):
+            self.tick()
+    
+    def tick(self):
+        """Compara a contagem com a anterior e publica as alterações"""
+        votes = self.tally.results()
+        changed = {
+            cid: count for cid, count in votes.items()
+            if count != self._current.get(cid)
+        }
+        if not changed:
+            return
+        
+        delta = voting_pb2.ResultsUpdate(
+            snapshot=False,
+            results=self._results(changed)
+        )
+        
+        with self._cond:
+            self._seq += 1
+            self._current = votes
+            self._delta = delta
+            self._snapshot = None
+            self._cond.notify_all()
+            
+            for loop, event in self._events.items():
+                loop.call_soon_threadsafe(event.set)
+            self._events = {}
+    
+    def subscribe(self):
+        """
+        Snapshot inicial para um novo observador
+        
+        Returns:
+            tuple: (seq, ResultsUpdate)
+        """
+        self.start()
+        with self._cond:
+            return self._seq, self._snapshot_message()
+    
+    def wait(self, seq, timeout=None):
+        """
+        Espera pela atualização seguinte a `seq`
+        
+        Args:
+            seq: Última sequência recebida pelo observador
+            timeout: Tempo máximo de espera, em segundos
+        
+        Returns:
+            tuple: (seq, ResultsUpdate) ou None se o tempo expirar
+        """
+        with self._cond:
+            if not self._cond.wait_for(lambda: self._seq > seq, timeout):
+                return None
+            return self._update_after(seq)
+    
+    async def wait_async(self, seq):
+        """
+        Versão asyncio de wait(), para handlers grpc.aio
+        
+        Args:
+            seq: Última sequência recebida pelo observador
+        
+        Returns:
+            tuple: (seq, ResultsUpdate)
+        """
+        loop = asyncio.get_running_loop()
+        while True:
+            with self._cond:
+                if self._seq > seq:
+                    return self._update_after(seq)
+                event = self._events.get(loop)
+                if event is None:
+                    event = self._events[loop] = asyncio.Event()
+            await event.wait()
+    
+    def _update_after(self, seq):
+        """Mensagem a enviar a quem recebeu até `seq` (chamar com o lock)"""
+        if self._seq == seq + 1:
+            return self._seq, self._delta
+        # Observador atrasado: os deltas intermédios foram perdidos
+        return self._seq, self._snapshot_message()
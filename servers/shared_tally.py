@@ -0,0 +1,205 @@
+"""
+Contagem partilhada entre processos da Autoridade de Votação (AV)
+Contadores e credenciais usadas em memória partilhada, com locks por faixa
+"""
+
+import multiprocessing
+from multiprocessing import shared_memory
+import os
+import struct
+
+from servers.tally import CastResult, DIGEST_SIZE, credential_digest
+
+
+_COUNTER = struct.Struct("<q")
+_EMPTY = bytes(DIGEST_SIZE)
+
+
+class SharedTally:
+    """
+    Motor de contagem com o mesmo interface do TallyEngine, partilhado por
+    vários processos (ex.: workers com SO_REUSEPORT na mesma porta)
+    
+    Cada faixa tem um lock entre processos, uma linha própria de contadores
+    (um por candidato) e uma tabela de hash de endereçamento aberto com os
+    digests das credenciais usadas. Uma faixa só é alterada com o seu lock,
+    por isso os contadores são exatos sem operações atómicas; os totais são
+    a soma das linhas de todas as faixas.
+    """
+    
+    def __init__(self, candidate_ids, capacity=1_000_000, stripes=64, context=None):
+        """
+        Args:
+            candidate_ids: IDs dos candidatos aceites
+            capacity: Número máximo de credenciais usadas (todas as faixas)
+            stripes: Número de faixas de locks
+            context: Contexto de multiprocessing (default: fork)
+        """
+        context = context or multiprocessing.get_context("fork")
+        self.candidate_ids = tuple(candidate_ids)
+        self._column = {cid: i for i, cid in enumerate(self.candidate_ids)}
+        self._stripes = stripes
+        # Tabelas com pelo menos 50% de slots livres
+        self._slots = max(8, 2 * capacity // stripes)
+        self._locks = [context.Lock() for _ in range(stripes)]
+        
+        counters_size = stripes * len(self.candidate_ids) * _COUNTER.size
+        table_size = stripes * self._slots * DIGEST_SIZE
+        self._counters_shm = shared_memory.SharedMemory(create=True, size=max(1, counters_size))
+        self._table_shm = shared_memory.SharedMemory(create=True, size=table_size)
+        self._counters_shm.buf[:counters_size] = bytes(counters_size)
+        self._table_shm.buf[:table_size] = bytes(table_size)
+        self._owner = os.getpid()
+    
+    def __getstate__(self):
+        # Os segmentos de memória são reabertos pelo nome no processo filho
+        state = self.__dict__.copy()
+        state["_counters_shm"] = self._counters_shm.name
+        state["_table_shm"] = self._table_shm.name
+        return state
+    
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._counters_shm = shared_memory.SharedMemory(name=state["_counters_shm"])
+        self._table_shm = shared_memory.SharedMemory(name=state["_table_shm"])
+    
+    def close(self):
+        """Liberta a memória partilhada (apagada pelo processo que a criou)"""
+        self._counters_shm.close()
+        self._table_shm.close()
+        if self._owner == os.getpid():
+            self._counters_shm.unlink()
+            self._table_shm.unlink()
+    
+    def _stripe(self, digest):
+        """Índice da faixa responsável pelo digest da credencial"""
+        return int.from_bytes(digest[:4], "little") % self._stripes
+    
+    def _find(self, index, digest):
+        """
+        Procura o digest na tabela da faixa (chamar com o lock da faixa)
+        
+        Returns:
+            tuple: (encontrado, offset do slot)
+        """
+        table = self._table_shm.buf
+        base = index * self._slots
+        slot = int.from_bytes(digest[4:12], "little") % self._slots
+        
+        for _ in range(self._slots):
+            offset = (base + slot) * DIGEST_SIZE
+            current = table[offset:offset + DIGEST_SIZE]
+            if current == digest:
+                return True, offset
+            if current == _EMPTY:
+                return False, offset
+            slot = (slot + 1) % self._slots
+        
+        raise RuntimeError("Tabela de credenciais usadas cheia (aumente capacity)")
+    
+    def _add(self, index, candidate_id, count=1):
+        """Incrementa o contador da faixa (chamar com o lock da faixa)"""
+        offset = (index * len(self.candidate_ids) + self._column[candidate_id]) * _COUNTER.size
+        buf = self._counters_shm.buf
+        (value,) = _COUNTER.unpack_from(buf, offset)
+        _COUNTER.pack_into(buf, offset, value + count)
+    
+    def _cast_locked(self, index, digest, candidate_id):
+        """Regista um voto na faixa (chamar com o lock da faixa)"""
+        found, offset = self._find(index, digest)
+        if found:
+            return CastResult.ALREADY_USED
+        if candidate_id not in self._column:
+            return CastResult.UNKNOWN_CANDIDATE
+        
+        self._table_shm.buf[offset:offset + DIGEST_SIZE] = digest
+        self._add(index, candidate_id)
+        return CastResult.ACCEPTED
+    
+    def has_candidate(self, candidate_id):
+        """Indica se o candidato existe"""
+        return candidate_id in self._column
+    
+    def is_used(self, credential):
+        """Indica se a credencial já foi usada"""
+        digest = credential_digest(credential)
+        index = self._stripe(digest)
+        with self._locks[index]:
+            return self._find(index, digest)[0]
+    
+    def cast(self, credential, candidate_id):
+        """
+        Regista um voto, usando a credencial no máximo uma vez
+        
+        Returns:
+            CastResult: Resultado do registo
+        """
+        digest = credential_digest(credential)
+        index = self._stripe(digest)
+        with self._locks[index]:
+            return self._cast_locked(index, digest, candidate_id)
+    
+    def cast_many(self, ballots):
+        """
+        Regista um lote de votos numa única secção crítica
+        
+        Returns:
+            list: CastResult de cada voto, pela mesma ordem
+        """
+        digests = [credential_digest(credential) for credential, _ in ballots]
+        indexes = [self._stripe(digest) for digest in digests]
+        locks = [self._locks[i] for i in sorted(set(indexes))]
+        
+        for lock in locks:
+            lock.acquire()
+        try:
+            return [
+                self._cast_locked(index, digest, candidate_id)
+                for (_, candidate_id), digest, index in zip(ballots, digests, indexes)
+            ]
+        finally:
+            for lock in reversed(locks):
+                lock.release()
+    
+    def restore(self, counts, digests):
+        """
+        Carrega um estado guardado (snapshot) antes de aceitar votos
+        
+        Args:
+            counts: {candidate_id: votos}
+            digests: Iterável de digests de credenciais usadas
+        """
+        with self._locks[0]:
+            for cid, count in counts.items():
+                if cid in self._column:
+                    self._add(0, cid, count)
+        
+        for digest in digests:
+            index = self._stripe(digest)
+            with self._locks[index]:
+                found, offset = self._find(index, digest)
+                if not found:
+                    self._table_shm.buf[offset:offset + DIGEST_SIZE] = digest
+    
+    def results(self):
+        """
+        Soma as linhas de contadores de todas as faixas
+        
+        Returns:
+            dict: {candidate_id: votos}
+        """
+        width = len(self.candidate_ids)
+        values = struct.unpack_from(f"<{self._stripes * width}q", self._counters_shm.buf)
+        return {
+            cid: sum(values[column::width])
+            for cid, column in self._column.items()
+        }
+    
+    def version(self):
+        """Versão da contagem: cresce sempre que um voto é aceite"""
+        return self.total()
+    
+    def total(self):
+        """Número total de votos aceites"""
+        width = len(self.candidate_ids)
+        return sum(struct.unpack_from(f"<{self._stripes * width}q", self._counters_shm.buf))
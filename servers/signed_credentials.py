@@ -0,0 +1,153 @@
+"""
+Credenciais de voto assinadas (AR emite, AV verifica sem estado partilhado)
+CRED-<número de série>-<HMAC-SHA256(chave, eleição + série) truncado>
+"""
+
+import hashlib
+import hmac
+import os
+import re
+
+
+# Chave de desenvolvimento usada quando nenhuma é configurada
+DEV_KEY = b"voting-system-grpc-dev-key"
+DEFAULT_ELECTION = "eleicao-demo"
+
+# Bytes do HMAC incluídos na credencial (64 bits)
+MAC_SIZE = 8
+_FORMAT = re.compile(r"^CRED-(\d{8,12})-([0-9A-F]{%d})$" % (2 * MAC_SIZE))
+
+
+def load_key(path=None):
+    """
+    Chave partilhada entre AR e AV
+    
+    Ordem: ficheiro `path`, variável VOTING_CREDENTIAL_KEY, chave de
+    desenvolvimento.
+    
+    Returns:
+        tuple: (chave, origem)
+    """
+    if path:
+        with open(path, "rb") as f:
+            return f.read().strip(), path
+    if os.environ.get("VOTING_CREDENTIAL_KEY"):
+        return os.environ["VOTING_CREDENTIAL_KEY"].encode("utf-8"), "VOTING_CREDENTIAL_KEY"
+    return DEV_KEY, "chave de desenvolvimento"
+
+
+class CredentialSigner:
+    """
+    Assina números de série: a credencial prova que foi emitida pela AR
+    para esta eleição, sem a AV precisar de consultar nada
+    """
+    
+    def __init__(self, key, election_id=DEFAULT_ELECTION):
+        """
+        Args:
+            key: Chave secreta partilhada com a AV (bytes)
+            election_id: Identificador da eleição (incluído no MAC)
+        """
+        self._key = key
+        self._election = election_id.encode("utf-8") + b"\0"
+    
+    def _mac(self, serial):
+        message = self._election + serial.to_bytes(8, "big")
+        return hmac.new(self._key, message, hashlib.sha256).digest()[:MAC_SIZE].hex().upper()
+    
+    def sign(self, serial):
+        """Credencial com o número de série e o respetivo MAC"""
+        return f"CRED-{serial:08d}-{self._mac(serial)}"
+    
+    def verify(self, credential):
+        """
+        Verifica o formato e o MAC da credencial (só CPU)
+        
+        Returns:
+            int: Número de série ou None se a credencial for inválida
+        """
+        match = _FORMAT.match(credential)
+        if match is None:
+            return None
+        serial = int(match.group(1))
+        # Só a forma emitida pela AR: "00000007" e "000000007" seriam a
+        # mesma série com o mesmo MAC mas chaves diferentes na contagem
+        if match.group(1) != f"{serial:08d}":
+            return None
+        if not hmac.compare_digest(self._mac(serial), match.group(2)):
+            return None
+        return serial
+
+
+def serial_of(credential):
+    """Número de série de uma credencial já verificada"""
+    match = _FORMAT.match(credential)
+    if match is None or match.group(1) != f"{int(match.group(1)):08d}":
+        raise ValueError(f"Credencial sem número de série: {credential}")
+    return int(match.group(1))
+
+
+class SerialBitmap:
+    """
+    Números de série usados num bitmap denso (1 bit por série)
+    
+    Com `stride` cada bitmap guarda só as séries de uma faixa do
+    TallyEngine (série % stride fixo), sem bits desperdiçados.
+    """
+    
+    def __init__(self, stride=1):
+        self.stride = stride
+        self._bits = bytearray()
+        self._count = 0
+    
+    def _index(self, key):
+        return int.from_bytes(key, "little") // self.stride
+    
+    def __contains__(self, key):
+        index = self._index(key)
+        byte = index >> 3
+        return byte < len(self._bits) and bool(self._bits[byte] & (1 << (index & 7)))
+    
+    def add(self, key):
+        """
+        Marca a série como usada
+        
+        Returns:
+            bool: True se ainda não estava marcada
+        """
+        index = self._index(key)
+        byte, mask = index >> 3, 1 << (index & 7)
+        if byte >= len(self._bits):
+            self._bits.extend(bytes(max(byte + 1, 2 * len(self._bits)) - len(self._bits)))
+        if self._bits[byte] & mask:
+            return False
+        self._bits[byte] |= mask
+        self._count += 1
+        return True
+    
+    def __len__(self):
+        return self._count
+    
+    @property
+    def nbytes(self):
+        return len(self._bits)
+
+
+class SerialKeys:
+    """
+    Chaves do TallyEngine para credenciais assinadas
+    
+    A chave de uma credencial é o seu número de série (16 bytes, little
+    endian): a faixa é série % faixas e as séries usadas de cada faixa
+    ficam num SerialBitmap.
+    """
+    
+    def key(self, credential):
+        return serial_of(credential).to_bytes(16, "little")
+    
+    def new_store(self, stripes):
+        # A faixa vem dos 4 bytes baixos da chave: série % faixas só é
+        # constante dentro de cada bitmap se as faixas dividirem 2**32
+        if stripes & (stripes - 1):
+            raise ValueError("Número de faixas tem de ser uma potência de 2")
+        return SerialBitmap(stride=stripes)
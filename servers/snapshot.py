@@ -0,0 +1,256 @@
+"""
+Snapshots da contagem da Autoridade de Votação (AV)
+Compacta os segmentos do diário para um arranque rápido após um crash
+"""
+
+import heapq
+import os
+import re
+import struct
+import threading
+import zlib
+
+from servers.journal import list_segments, read_records, read_segments, segment_path
+from servers.tally import DIGEST_SIZE, credential_digest
+
+
+_MAGIC = b"AVSNAP1\0"
+# Último segmento incluído, número de candidatos, número de credenciais usadas
+_HEADER = struct.Struct("<QIQ")
+_COUNT = struct.Struct("<iQ")
+_CRC = struct.Struct("<I")
+
+_SNAPSHOT_NAME = re.compile(r"^snapshot-(\d{8})\.snap$")
+
+
+class Snapshot:
+    """Estado da contagem até ao fim de um segmento do diário"""
+    
+    def __init__(self, last_segment=0, counts=None, digests=b""):
+        """
+        Args:
+            last_segment: Último segmento do diário incluído
+            counts: {candidate_id: votos}
+            digests: Digests das credenciais usadas, ordenados e concatenados
+        """
+        self.last_segment = last_segment
+        self.counts = counts or {}
+        self.digests = digests
+    
+    def iter_digests(self):
+        """Digests das credenciais usadas, um a um"""
+        for offset in range(0, len(self.digests), DIGEST_SIZE):
+            yield self.digests[offset:offset + DIGEST_SIZE]
+
+
+def snapshot_path(directory, last_segment):
+    """Caminho do snapshot que cobre até `last_segment`"""
+    return os.path.join(directory, f"snapshot-{last_segment:08d}.snap")
+
+
+def list_snapshots(directory):
+    """Segmentos cobertos pelos snapshots existentes, por ordem crescente"""
+    if not os.path.isdir(directory):
+        return []
+    matches = (_SNAPSHOT_NAME.match(name) for name in os.listdir(directory))
+    return sorted(int(m.group(1)) for m in matches if m)
+
+
+def _fsync_directory(directory):
+    """Grava em disco as entradas do diretório (ex.: após um rename)"""
+    fd = os.open(directory, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def write_snapshot(directory, snapshot):
+    """
+    Escreve um snapshot de forma atómica (ficheiro temporário + rename)
+    
+    O diretório é sincronizado depois do rename: quando a função devolve,
+    o snapshot sobrevive a um crash e os ficheiros que cobre podem ser
+    apagados.
+    
+    Returns:
+        str: Caminho do snapshot escrito
+    """
+    body = bytearray(_MAGIC)
+    body += _HEADER.pack(
+        snapshot.last_segment,
+        len(snapshot.counts),
+        len(snapshot.digests) // DIGEST_SIZE
+    )
+    for cid, count in sorted(snapshot.counts.items()):
+        body += _COUNT.pack(cid, count)
+    body += snapshot.digests
+    body += _CRC.pack(zlib.crc32(body))
+    
+    path = snapshot_path(directory, snapshot.last_segment)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(body)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+    _fsync_directory(directory)
+    return path
+
+
+def read_snapshot(path):
+    """
+    Lê um snapshot, validando o CRC
+    
+    Raises:
+        ValueError: Se o ficheiro estiver corrompido
+    """
+    with open(path, "rb") as f:
+        data = f.read()
+    
+    body, (crc,) = data[:-_CRC.size], _CRC.unpack(data[-_CRC.size:])
+    if not body.startswith(_MAGIC) or zlib.crc32(body) != crc:
+        raise ValueError(f"Snapshot corrompido: {path}")
+    
+    offset = len(_MAGIC)
+    last_segment, n_counts, n_digests = _HEADER.unpack_from(body, offset)
+    offset += _HEADER.size
+    
+    counts = {}
+    for _ in range(n_counts):
+        cid, count = _COUNT.unpack_from(body, offset)
+        counts[cid] = count
+        offset += _COUNT.size
+    
+    digests = body[offset:offset + n_digests * DIGEST_SIZE]
+    return Snapshot(last_segment, counts, digests)
+
+
+def load_latest(directory):
+    """
+    Snapshot mais recente válido (ou um snapshot vazio)
+    
+    Returns:
+        Snapshot: Estado até ao último segmento compactado
+    """
+    for last_segment in reversed(list_snapshots(directory)):
+        try:
+            return read_snapshot(snapshot_path(directory, last_segment))
+        except (ValueError, struct.error):
+            print(f"⚠️  Snapshot ignorado (corrompido): segmento {last_segment}")
+    return Snapshot()
+
+
+def recover(directory):
+    """
+    Estado para reconstruir a contagem: snapshot + cauda do diário
+    
+    Returns:
+        tuple: (Snapshot, lista de (credential, candidate_id) posteriores)
+    """
+    snapshot = load_latest(directory)
+    return snapshot, read_segments(directory, after=snapshot.last_segment)
+
+
+def recover_tree(directory):
+    """
+    Recupera o diário e os diários dos workers (subdiretórios worker-N)
+    
+    Returns:
+        list: Lista de (Snapshot, votos posteriores), um por diretório
+    """
+    directories = [directory]
+    if os.path.isdir(directory):
+        directories += sorted(
+            os.path.join(directory, name) for name in os.listdir(directory)
+            if name.startswith("worker-")
+        )
+    return [recover(d) for d in directories]
+
+
+def compact(directory, up_to_segment, key=credential_digest):
+    """
+    Junta o snapshot mais recente com os segmentos fechados até `up_to_segment`
+    
+    Os segmentos e snapshots cobertos pelo novo snapshot só são apagados
+    depois de o snapshot estar em disco (ficheiro e entrada no diretório).
+    `key` converte cada credencial na chave guardada (a mesma do TallyEngine).
+    
+    Returns:
+        Snapshot: Novo snapshot ou None se não houver nada a compactar
+    """
+    previous = load_latest(directory)
+    segments = [
+        s for s in list_segments(directory)
+        if previous.last_segment < s <= up_to_segment
+    ]
+    if not segments:
+        return None
+    
+    counts = dict(previous.counts)
+    new_digests = []
+    for segment_id in segments:
+        records, _ = read_records(segment_path(directory, segment_id))
+        for credential, candidate_id in records:
+            counts[candidate_id] = counts.get(candidate_id, 0) + 1
+            new_digests.append(key(credential))
+    
+    # Junção ordenada dos digests antigos com os novos
+    new_digests.sort()
+    merged = heapq.merge(previous.iter_digests(), new_digests)
+    snapshot = Snapshot(segments[-1], counts, b"".join(merged))
+    write_snapshot(directory, snapshot)
+    
+    for segment_id in segments:
+        os.remove(segment_path(directory, segment_id))
+    for last_segment in list_snapshots(directory):
+        if last_segment < snapshot.last_segment:
+            os.remove(snapshot_path(directory, last_segment))
+    
+    return snapshot
+
+
+class Compactor:
+    """
+    Thread de fundo que cria snapshots periodicamente
+    
+    Trabalha apenas sobre ficheiros já fechados do diário: os votos
+    continuam a ser aceites normalmente enquanto o snapshot é escrito.
+    """
+    
+    def __init__(self, journal, interval=60.0, key=credential_digest):
+        """
+        Args:
+            journal: Diário de votos (VoteJournal)
+            interval: Intervalo entre snapshots, em segundos
+            key: Chave guardada por credencial (a mesma do TallyEngine)
+        """
+        self.journal = journal
+        self.interval = interval
+        self.key = key
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+    
+    def start(self):
+        """Inicia a thread de compactação"""
+        self._thread.start()
+    
+    def stop(self):
+        """Para a thread de compactação"""
+        self._stopped.set()
+        if self._thread.is_alive():
+            self._thread.join()
+    
+    def _run(self):
+        """Ciclo: fecha o segmento ativo e compacta os segmentos fechados"""
+        while not self._stopped.wait(self.interval):
+            self.run_once()
+    
+    def run_once(self):
+        """Cria um snapshot com todos os segmentos fechados"""
+        last_closed = self.journal.rotate()
+        snapshot = compact(self.journal.directory, last_closed, self.key)
+        if snapshot is not None:
+            print(f"💾 Snapshot até ao segmento {snapshot.last_segment} "
+                  f"({len(snapshot.digests) // DIGEST_SIZE} credenciais usadas)")
+        return snapshot
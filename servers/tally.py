@@ -0,0 +1,229 @@
+"""
+Motor de contagem de votos da Autoridade de Votação (AV)
+Locks por faixa de credencial e contadores por worker, agregados na leitura
+"""
+
+import enum
+import hashlib
+import threading
+
+from servers.credential_store import CredentialStore
+
+
+# Tamanho do digest guardado por credencial usada
+DIGEST_SIZE = 16
+
+
+def credential_digest(credential):
+    """Digest de tamanho fixo que identifica uma credencial usada"""
+    return hashlib.blake2b(credential.encode("utf-8"), digest_size=DIGEST_SIZE).digest()
+
+
+class DigestKeys:
+    """
+    Chaves do TallyEngine: digest da credencial, guardado num CredentialStore
+    
+    Outros esquemas de chaves (ex.: números de série de credenciais
+    assinadas) implementam os mesmos dois métodos.
+    """
+    
+    def __init__(self, bloom_bits=0):
+        self.bloom_bits = bloom_bits
+    
+    def key(self, credential):
+        """Chave de 16 bytes da credencial"""
+        return credential_digest(credential)
+    
+    def new_store(self, stripes):
+        """Conjunto das chaves usadas de uma faixa"""
+        return CredentialStore(digest_size=DIGEST_SIZE, bloom_bits=self.bloom_bits)
+
+
+class CastResult(enum.Enum):
+    """Resultado do registo de um voto no motor de contagem"""
+    ACCEPTED = "accepted"
+    ALREADY_USED = "already_used"
+    UNKNOWN_CANDIDATE = "unknown_candidate"
+
+
+class _Shard:
+    """Contadores privados de uma thread (só essa thread escreve)"""
+    
+    __slots__ = ("counts", "applied")
+    
+    def __init__(self, candidate_ids):
+        self.counts = dict.fromkeys(candidate_ids, 0)
+        self.applied = 0
+
+
+class TallyEngine:
+    """
+    Contagem de votos segura para múltiplas threads
+    
+    As credenciais usadas são repartidas por faixas (stripes), cada uma com
+    o seu lock e o seu CredentialStore (digests numa tabela compacta),
+    escolhidas pelo hash da credencial: votos com credenciais diferentes
+    raramente disputam o mesmo lock. Cada thread incrementa o seu próprio
+    shard de contadores e os shards só são somados na leitura.
+    """
+    
+    def __init__(self, candidate_ids, stripes=64, bloom_bits=0, keys=None):
+        """
+        Args:
+            candidate_ids: IDs dos candidatos aceites
+            stripes: Número de faixas de locks para as credenciais
+            bloom_bits: Bits por credencial do filtro de Bloom de cada faixa
+            keys: Esquema de chaves (default: DigestKeys)
+        """
+        self.candidate_ids = tuple(candidate_ids)
+        self._candidates = frozenset(self.candidate_ids)
+        self._keys = keys if keys is not None else DigestKeys(bloom_bits)
+        self.key = self._keys.key
+        self._locks = [threading.Lock() for _ in range(stripes)]
+        self._used = [self._keys.new_store(stripes) for _ in range(stripes)]
+        self._shards = []
+        self._shards_lock = threading.Lock()
+        self._local = threading.local()
+    
+    def _stripe(self, digest):
+        """Índice da faixa responsável pelo digest da credencial"""
+        return int.from_bytes(digest[:4], "little") % len(self._locks)
+    
+    def _shard(self):
+        """Shard de contadores da thread atual (criado no primeiro uso)"""
+        shard = getattr(self._local, "shard", None)
+        if shard is None:
+            shard = _Shard(self.candidate_ids)
+            with self._shards_lock:
+                self._shards.append(shard)
+            self._local.shard = shard
+        return shard
+    
+    def has_candidate(self, candidate_id):
+        """Indica se o candidato existe"""
+        return candidate_id in self._candidates
+    
+    def is_used(self, credential):
+        """Indica se a credencial já foi usada"""
+        digest = self.key(credential)
+        index = self._stripe(digest)
+        # A tabela pode ser redimensionada por um voto concorrente
+        with self._locks[index]:
+            return digest in self._used[index]
+    
+    def cast(self, credential, candidate_id):
+        """
+        Regista um voto, usando a credencial no máximo uma vez
+        
+        Args:
+            credential: Credencial de voto (já validada)
+            candidate_id: ID do candidato
+        
+        Returns:
+            CastResult: Resultado do registo
+        """
+        digest = self.key(credential)
+        index = self._stripe(digest)
+        used = self._used[index]
+        
+        with self._locks[index]:
+            if digest in used:
+                return CastResult.ALREADY_USED
+            if candidate_id not in self._candidates:
+                return CastResult.UNKNOWN_CANDIDATE
+            
+            used.add(digest)
+            shard = self._shard()
+            shard.counts[candidate_id] += 1
+            shard.applied += 1
+        
+        return CastResult.ACCEPTED
+    
+    def cast_many(self, ballots):
+        """
+        Regista um lote de votos numa única secção crítica
+        
+        Os locks das faixas envolvidas são adquiridos por ordem crescente
+        (sem deadlocks entre lotes concorrentes) e libertados no fim.
+        
+        Args:
+            ballots: Lista de tuplos (credential, candidate_id)
+        
+        Returns:
+            list: CastResult de cada voto, pela mesma ordem
+        """
+        digests = [self.key(credential) for credential, _ in ballots]
+        indexes = [self._stripe(digest) for digest in digests]
+        locks = [self._locks[i] for i in sorted(set(indexes))]
+        results = []
+        
+        for lock in locks:
+            lock.acquire()
+        try:
+            shard = self._shard()
+            for (_, candidate_id), digest, index in zip(ballots, digests, indexes):
+                used = self._used[index]
+                if digest in used:
+                    results.append(CastResult.ALREADY_USED)
+                elif candidate_id not in self._candidates:
+                    results.append(CastResult.UNKNOWN_CANDIDATE)
+                else:
+                    used.add(digest)
+                    shard.counts[candidate_id] += 1
+                    shard.applied += 1
+                    results.append(CastResult.ACCEPTED)
+        finally:
+            for lock in reversed(locks):
+                lock.release()
+        
+        return results
+    
+    def restore(self, counts, digests):
+        """
+        Carrega um estado guardado (snapshot) antes de aceitar votos
+        
+        Args:
+            counts: {candidate_id: votos}
+            digests: Iterável de chaves de credenciais usadas
+        """
+        shard = self._shard()
+        for cid, count in counts.items():
+            if cid in self._candidates:
+                shard.counts[cid] += count
+                shard.applied += count
+        
+        for digest in digests:
+            index = self._stripe(digest)
+            with self._locks[index]:
+                self._used[index].add(digest)
+    
+    def results(self):
+        """
+        Agrega os shards de todas as threads
+        
+        Returns:
+            dict: {candidate_id: votos}
+        """
+        totals = dict.fromkeys(self.candidate_ids, 0)
+        with self._shards_lock:
+            shards = list(self._shards)
+        
+        for shard in shards:
+            for cid, count in shard.counts.items():
+                totals[cid] += count
+        
+        return totals
+    
+    def version(self):
+        """
+        Versão da contagem: cresce sempre que um voto é aceite
+        
+        Serve de chave para caches de resultados.
+        """
+        return self.total()
+    
+    def total(self):
+        """Número total de votos aceites"""
+        with self._shards_lock:
+            shards = list(self._shards)
+        return sum(shard.applied for shard in shards)
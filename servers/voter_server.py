@@ -4,76 +4,289 @@ Simula emissão de credenciais de voto
 """
 
 from concurrent import futures
+import argparse
+import asyncio
 import grpc
 import sys
 import os
+import queue
 import random
+import threading
 
 # Adiciona path
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
 
 from generated import voter_pb2
 from generated import voter_pb2_grpc
+from servers import request_log
+from servers.credential_pool import CredentialPool
+from servers.citizen_registry import CitizenRegistry
+from servers.issuance_map import IssuanceMap
+from servers.keepalive import SERVER_OPTIONS
+from servers import metrics
+from servers.signed_credentials import CredentialSigner, DEFAULT_ELECTION, load_key
+
+
+# Marca o fim do stream de pedidos na fila do IssueVotingCredentials
+_END_OF_STREAM = object()
 
 
 class VoterRegistrationService(voter_pb2_grpc.VoterRegistrationServiceServicer):
     """Implementação do serviço de registo"""
     
-    def __init__(self):
-        # Credenciais válidas (70% de probabilidade)
-        self.valid_credentials = [
-            "CRED-ABC-123",
-            "CRED-DEF-456", 
-            "CRED-GHI-789"
-        ]
-        self.used_credentials = set()
+    def __init__(self, log=None, pool=None, bulk_batch=256, registry=None, issued=None):
+        # Credenciais pré-geradas, cada uma emitida uma única vez
+        self.pool = pool if pool is not None else CredentialPool()
+        
+        # Máximo de pedidos de um stream servidos com uma alocação do pool
+        self.bulk_batch = bulk_batch
+        
+        # Caderno eleitoral (None = elegibilidade aleatória)
+        self.registry = registry
+        
+        # Credencial já emitida a cada cartão (pedidos repetidos são idempotentes)
+        self.issued = issued if issued is not None else IssuanceMap()
+        
+        # Registo de pedidos (escrito por uma thread própria)
+        self.log = log or request_log.get_default()
+    
+    def _is_eligible(self, cc_number):
+        """Elegibilidade do cidadão: consta do caderno eleitoral"""
+        if self.registry is not None:
+            return cc_number in self.registry
+        # Sem caderno configurado: 70% de probabilidade
+        return random.random() < 0.7
+    
+    def _invalid_credential(self):
+        """Credencial entregue a cidadãos não elegíveis"""
+        return f"INVALID-{random.randint(1000,9999):04X}"
     
     def IssueVotingCredential(self, request, context):
         """Emite credencial de voto"""
         
         cc_number = request.citizen_card_number
-        print(f"📋 Pedido de credencial para CC: {cc_number}")
         
-        # 70% chance de credencial válida
-        if random.random() < 0.7:
-            # Escolhe credencial válida não usada
-            available = [c for c in self.valid_credentials if c not in self.used_credentials]
-            
-            if available:
-                credential = random.choice(available)
-                self.used_credentials.add(credential)
-                is_eligible = True
-                print(f"   ✅ Credencial válida emitida: {credential}")
-            else:
-                # Todas já foram usadas, gera nova
-                credential = f"CRED-{random.randint(100,999)}-{random.randint(100,999)}"
-                is_eligible = True
-                print(f"   ✅ Nova credencial gerada: {credential}")
+        # Repetição (ex.: retry após timeout): devolve a mesma credencial
+        credential = self.issued.get(cc_number)
+        if credential is not None:
+            is_eligible = True
+            kind = "repeat"
+        elif self._is_eligible(cc_number):
+            # Próxima credencial livre do pool (O(1)), registada para o cartão
+            [(credential, new)] = self.issued.get_or_assign([cc_number], self.pool.issue_many)
+            is_eligible = True
+            kind = "valid" if new else "repeat"
         else:
             # Credencial inválida
-            credential = f"INVALID-{random.randint(1000,9999):04X}"
+            credential = self._invalid_credential()
             is_eligible = False
-            print(f"   ⚠️  Credencial inválida: {credential}")
+            kind = "invalid"
+        
+        self.log.info("credential.issue", cc=cc_number, credential=credential, kind=kind)
         
         return voter_pb2.VoterResponse(
             is_eligible=is_eligible,
             voting_credential=credential
         )
+    
+    def _issue_batch(self, requests):
+        """
+        Emite credenciais para um lote de pedidos
+        
+        As credenciais dos elegíveis sem credencial são retiradas do pool de
+        uma só vez; cartões que já têm credencial recebem a mesma.
+        
+        Returns:
+            list: BulkVoterResponse de cada pedido, pela mesma ordem
+        """
+        cards = [r.citizen_card_number for r in requests]
+        eligible = [
+            self.issued.get(cc) is not None or self._is_eligible(cc)
+            for cc in cards
+        ]
+        assigned = self.issued.get_or_assign(
+            [cc for cc, ok in zip(cards, eligible) if ok],
+            self.pool.issue_many
+        )
+        credentials = iter(credential for credential, _ in assigned)
+        
+        responses = [
+            voter_pb2.BulkVoterResponse(
+                citizen_card_number=cc,
+                is_eligible=ok,
+                voting_credential=next(credentials) if ok else self._invalid_credential()
+            )
+            for cc, ok in zip(cards, eligible)
+        ]
+        
+        self.log.info("credential.issue_bulk", size=len(responses), eligible=sum(eligible))
+        return responses
+    
+    def IssueVotingCredentials(self, request_iterator, context):
+        """
+        Emissão em lote: responde a um stream de cartões de cidadão
+        
+        Uma thread lê os pedidos à medida que chegam; cada lote junta os
+        pedidos já recebidos (até `bulk_batch`), sem esperar por mais, por
+        isso o cliente pode limitar quantos pedidos tem em curso.
+        """
+        pending = queue.Queue()
+        
+        def reader():
+            try:
+                for request in request_iterator:
+                    pending.put(request)
+            except grpc.RpcError:
+                pass
+            finally:
+                pending.put(_END_OF_STREAM)
+        
+        threading.Thread(target=reader, daemon=True).start()
+        
+        while True:
+            batch = [pending.get()]
+            while len(batch) < self.bulk_batch:
+                try:
+                    batch.append(pending.get_nowait())
+                except queue.Empty:
+                    break
+            
+            done = batch[-1] is _END_OF_STREAM
+            if done:
+                batch.pop()
+            if batch:
+                yield from self._issue_batch(batch)
+            if done:
+                return
 
 
-def serve():
+class AsyncVoterRegistrationService(voter_pb2_grpc.VoterRegistrationServiceServicer):
+    """
+    Adaptador grpc.aio do VoterRegistrationService
+    
+    O serviço síncrono pode bloquear (pool de credenciais à espera de um
+    bloco novo, escrita e fsync das atribuições), por isso é chamado numa
+    thread (asyncio.to_thread) e o event loop continua a servir os outros
+    pedidos; o serviço já é seguro entre threads (é o mesmo do servidor
+    síncrono).
+    """
+    
+    def __init__(self, service):
+        self.service = service
+    
+    async def IssueVotingCredential(self, request, context):
+        return await asyncio.to_thread(self.service.IssueVotingCredential, request, context)
+    
+    async def IssueVotingCredentials(self, request_iterator, context):
+        pending = asyncio.Queue()
+        
+        async def reader():
+            try:
+                async for request in request_iterator:
+                    pending.put_nowait(request)
+            finally:
+                pending.put_nowait(_END_OF_STREAM)
+        
+        task = asyncio.ensure_future(reader())
+        try:
+            while True:
+                batch = [await pending.get()]
+                while len(batch) < self.service.bulk_batch and not pending.empty():
+                    batch.append(pending.get_nowait())
+                
+                done = batch[-1] is _END_OF_STREAM
+                if done:
+                    batch.pop()
+                responses = await asyncio.to_thread(self.service._issue_batch, batch) if batch else ()
+                for response in responses:
+                    yield response
+                if done:
+                    return
+        finally:
+            task.cancel()
+
+
+async def _serve_aio(service, port, interceptors=()):
+    """Servidor grpc.aio: um event loop, sem limite de threads por RPC"""
+    server = grpc.aio.server(options=SERVER_OPTIONS, interceptors=interceptors)
+    voter_pb2_grpc.add_VoterRegistrationServiceServicer_to_server(
+        AsyncVoterRegistrationService(service), server
+    )
+    server.add_insecure_port(f'[::]:{port}')
+    await server.start()
+    
+    print("🚀 Servidor AR (Autoridade de Registo) iniciado [asyncio]")
+    print(f"   Porta: {port}")
+    print("   Pressione Ctrl+C para parar\n")
+    
+    try:
+        await server.wait_for_termination()
+    finally:
+        await server.stop(0)
+
+
+def serve(max_workers=10, port=9093, use_aio=False, log_options=None,
+          pool_path=None, pool_block=10_000, registry_path=None, issuance_path=None,
+          credential_key_file=None, election_id=DEFAULT_ELECTION, metrics_options=None):
     """Inicia o servidor"""
-    server = grpc.server(futures.ThreadPoolExecutor(max_workers=10))
+    log = request_log.configure(**(log_options or {}))
+    key, key_source = load_key(credential_key_file)
+    signer = CredentialSigner(key, election_id)
+    pool = CredentialPool(pool_path, block_size=pool_block, signer=signer)
+    registry = CitizenRegistry(registry_path) if registry_path else None
+    # Uma credencial só é devolvida depois de a atribuição estar em disco
+    issued = IssuanceMap(issuance_path, fsync=True)
+    service = VoterRegistrationService(log=log, pool=pool, registry=registry, issued=issued)
+    
+    if registry is not None:
+        print(f"📇 Caderno eleitoral: {registry_path} ({len(registry)} cidadãos)")
+    print(f"🔏 Credenciais assinadas (eleição {election_id}, chave: {key_source})")
+    if pool_path:
+        print(f"🎫 Numeração do pool de credenciais: {pool_path}")
+    if issuance_path:
+        print(f"🗂️  Credenciais emitidas: {issuance_path} ({len(issued)} cidadãos)")
+    
+    admin = None
+    if metrics_options:
+        admin = metrics.MetricsAdmin(**metrics_options)
+        admin.install_signals()
+    
+    try:
+        _serve(service, max_workers, port, use_aio, admin)
+    finally:
+        if admin is not None:
+            admin.close()
+        pool.close()
+        issued.close()
+        if registry is not None:
+            registry.close()
+        log.close()
+
+
+def _serve(service, max_workers, port, use_aio, admin=None):
+    """Serve o VoterRegistrationService até Ctrl+C"""
+    interceptors = admin.interceptors(use_aio) if admin is not None else ()
+    if use_aio:
+        try:
+            asyncio.run(_serve_aio(service, port, interceptors))
+        except KeyboardInterrupt:
+            print("\n⏹️  Servidor parado")
+        return
+    
+    server = grpc.server(
+        futures.ThreadPoolExecutor(max_workers=max_workers),
+        options=SERVER_OPTIONS, interceptors=interceptors
+    )
     
     voter_pb2_grpc.add_VoterRegistrationServiceServicer_to_server(
-        VoterRegistrationService(), server
+        service, server
     )
     
-    server.add_insecure_port('[::]:9093')
+    server.add_insecure_port(f'[::]:{port}')
     server.start()
     
     print("🚀 Servidor AR (Autoridade de Registo) iniciado")
-    print("   Porta: 9093")
+    print(f"   Porta: {port}")
     print("   Pressione Ctrl+C para parar\n")
     
     try:
@@ -83,5 +296,45 @@ def serve():
         server.stop(0)
 
 
+def parse_args():
+    """Argumentos da linha de comandos"""
+    parser = argparse.ArgumentParser(description="Servidor mock da AR")
+    parser.add_argument("--port", type=int, default=9093,
+                        help="Porta do servidor")
+    parser.add_argument("--aio", action="store_true",
+                        help="Servidor grpc.aio (asyncio) em vez do pool de threads")
+    parser.add_argument("--workers", type=int, default=10,
+                        help="Número de threads do servidor (modo não-asyncio)")
+    parser.add_argument("--credential-pool",
+                        help="Ficheiro da numeração do pool (sobrevive a reinícios)")
+    parser.add_argument("--credential-key-file",
+                        help="Chave partilhada com a AV para assinar credenciais "
+                             "(default: VOTING_CREDENTIAL_KEY ou chave de desenvolvimento)")
+    parser.add_argument("--election-id", default=DEFAULT_ELECTION,
+                        help="Identificador da eleição incluído no MAC das credenciais")
+    parser.add_argument("--registry",
+                        help="Índice do caderno eleitoral (servers/citizen_registry.py)")
+    parser.add_argument("--issuance-log",
+                        help="Ficheiro das credenciais emitidas por cartão (sobrevive a reinícios)")
+    parser.add_argument("--pool-block", type=int, default=10_000,
+                        help="Credenciais geradas por reabastecimento do pool")
+    request_log.add_arguments(parser)
+    metrics.add_arguments(parser)
+    return parser.parse_args()
+
+
 if __name__ == '__main__':
-    serve()
\ No newline at end of file
+    args = parse_args()
+    serve(
+        max_workers=args.workers,
+        port=args.port,
+        use_aio=args.aio,
+        log_options=request_log.options_from_args(args),
+        pool_path=args.credential_pool,
+        pool_block=args.pool_block,
+        registry_path=args.registry,
+        issuance_path=args.issuance_log,
+        credential_key_file=args.credential_key_file,
+        election_id=args.election_id,
+        metrics_options=metrics.options_from_args(args)
+    )
\ No newline at end of file
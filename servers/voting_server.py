@@ -4,138 +4,785 @@ Simula votação e contagem de votos
 """
 
 from concurrent import futures
+from multiprocessing.connection import wait as wait_processes
+import argparse
+import asyncio
+import multiprocessing
 import grpc
 import sys
 import os
+import threading
 
 # Adiciona path
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
 
 from generated import voting_pb2
 from generated import voting_pb2_grpc
+from servers.tally import TallyEngine, CastResult, credential_digest
+from servers.results_feed import ResultsFeed
+from servers.journal import VoteJournal
+from servers.snapshot import Compactor, recover_tree
+from servers.shared_tally import SharedTally
+from servers.candidates import CandidateRegistry, DEFAULT_PATH as DEFAULT_CANDIDATES
+from servers import request_log
+from servers.keepalive import SERVER_OPTIONS
+from servers import metrics
+from servers.signed_credentials import (
+    CredentialSigner, SerialKeys, DEFAULT_ELECTION, load_key
+)
+
+
+# Estado e mensagem de um voto que o diário não confirmou
+JOURNAL_UNAVAILABLE = (grpc.StatusCode.UNAVAILABLE, "Voto não registado: diário de votos indisponível")
+WATCHERS_EXHAUSTED = (grpc.StatusCode.RESOURCE_EXHAUSTED, "Demasiados observadores de resultados; tente mais tarde")
+
+
+def _serialize_response(response):
+    """Serializa a resposta; respostas em cache já vêm serializadas"""
+    if isinstance(response, bytes):
+        return response
+    return response.SerializeToString()
+
+
+def add_voting_service_to_server(service, server):
+    """
+    Regista o VotingService no servidor
+    
+    Equivalente a voting_pb2_grpc.add_VotingServiceServicer_to_server, mas
+    com um serializador que deixa passar respostas já em bytes (cache).
+    Os handlers são gerados a partir do descritor do serviço no .proto.
+    """
+    factories = {
+        (False, False): grpc.unary_unary_rpc_method_handler,
+        (True, False): grpc.stream_unary_rpc_method_handler,
+        (False, True): grpc.unary_stream_rpc_method_handler,
+        (True, True): grpc.stream_stream_rpc_method_handler,
+    }
+    descriptor = voting_pb2.DESCRIPTOR.services_by_name['VotingService']
+    
+    handlers = {}
+    for method in descriptor.methods:
+        factory = factories[(method.client_streaming, method.server_streaming)]
+        request_type = getattr(voting_pb2, method.input_type.name)
+        handlers[method.name] = factory(
+            getattr(service, method.name),
+            request_deserializer=request_type.FromString,
+            response_serializer=_serialize_response,
+        )
+    
+    server.add_generic_rpc_handlers((
+        grpc.method_handlers_generic_handler(descriptor.full_name, handlers),
+    ))
 
 
 class VotingService(voting_pb2_grpc.VotingServiceServicer):
     """Implementação do serviço de votação"""
     
-    def __init__(self):
-        # Candidatos
-        self.candidates = [
-            (1, "Maria Silva"),
-            (2, "João Santos"),
-            (3, "Ana Costa"),
-            (4, "Pedro Oliveira")
-        ]
+    def __init__(self, watch_interval=0.5, journal=None, cache_responses=True,
+                 candidates=None, tally=None, log=None, bloom_bits=0, verifier=None,
+                 insecure_dev_credentials=False):
+        # Candidatos (indexados por ID, eleição e círculo)
+        if candidates is None:
+            candidates = CandidateRegistry.load()
+        self.candidates = candidates
         
-        # Credenciais válidas aceites
-        self.valid_credentials = {
-            "CRED-ABC-123",
-            "CRED-DEF-456",
-            "CRED-GHI-789"
-        }
+        # Verificação do MAC das credenciais assinadas pela AR (default: a
+        # mesma chave e eleição que a AR usa sem configuração). Só com
+        # insecure_dev_credentials, para desenvolvimento, qualquer CRED-
+        # é aceite sem verificação.
+        if verifier is None and not insecure_dev_credentials:
+            verifier = CredentialSigner(load_key()[0], DEFAULT_ELECTION)
+        self.verifier = verifier
         
-        # Credenciais já usadas
-        self.used_credentials = set()
+        # Diário de votos; uma falha de escrita é fatal (ver _journal_append)
+        self.journal = journal
+        self.journal_error = None
+        self._journal_failed = None
+        self._fatal_lock = threading.Lock()
+        # Chamado (uma vez) quando o diário falha, ex.: para parar o servidor
+        self.on_fatal = None
+        # Lugares para WatchResults em simultâneo (None = sem limite)
+        self._watch_slots = None
         
-        # Contagem de votos
-        self.votes = {cid: 0 for cid, _ in self.candidates}
-    
-    def GetCandidates(self, request, context):
-        """Retorna lista de candidatos"""
-        print("📋 Pedido de lista de candidatos")
+        # Registo de pedidos (escrito por uma thread própria)
+        self.log = log or request_log.get_default()
         
+        # Credenciais já usadas e contagem de votos; uma contagem externa
+        # (ex.: partilhada entre processos) já vem reconstruída
+        if tally is not None:
+            self.tally = tally
+        else:
+            # Credenciais assinadas: séries usadas num bitmap por faixa
+            keys = SerialKeys() if verifier is not None else None
+            self.tally = TallyEngine(self.candidates.ids(), bloom_bits=bloom_bits, keys=keys)
+            
+            # Reconstrói a contagem após um reinício
+            # (snapshot mais recente + votos posteriores ao snapshot)
+            if journal is not None:
+                for snapshot, tail in recover_tree(journal.directory):
+                    self.tally.restore(snapshot.counts, snapshot.iter_digests())
+                    self.tally.cast_many(tail)
+        
+        # Difusão de alterações para WatchResults
+        self.results_feed = ResultsFeed(self.tally, self.candidates.names(), watch_interval)
+        
+        # Respostas pré-serializadas: candidatos durante toda a eleição,
+        # resultados por versão da contagem (muda a cada voto aceite)
+        self.cache_responses = cache_responses
+        self._candidates_cache = {}
+        self._not_modified = voting_pb2.GetCandidatesResponse(
+            version=self.candidates.version,
+            not_modified=True
+        ).SerializeToString()
+        self._results_cache = (None, None)
+    
+    def _build_candidates(self, race="", district=""):
+        """Constrói a resposta do GetCandidates (filtrada)"""
         candidates = [
-            voting_pb2.Candidate(id=cid, name=name)
-            for cid, name in self.candidates
+            voting_pb2.Candidate(id=c.id, name=c.name, race=c.race, district=c.district)
+            for c in self.candidates.filter(race, district)
+        ]
+        return voting_pb2.GetCandidatesResponse(
+            candidates=candidates,
+            version=self.candidates.version
+        )
+    
+    def _build_results(self):
+        """Constrói a resposta do GetResults"""
+        votes = self.tally.results()
+        results = [
+            voting_pb2.CandidateResult(id=c.id, name=c.name, votes=votes[c.id])
+            for c in self.candidates.candidates
         ]
+        return voting_pb2.GetResultsResponse(results=results)
+    
+    def GetCandidates(self, request, context):
+        """Retorna lista de candidatos"""
+        race, district = request.race, request.district
+        self.log.debug("candidates.get", race=race or "*", district=district or "*")
         
-        print(f"   ✅ Enviando {len(candidates)} candidatos")
+        # O cliente já tem esta versão do boletim: resposta de poucos bytes
+        if request.if_none_match == self.candidates.version:
+            return self._not_modified
         
-        return voting_pb2.GetCandidatesResponse(candidates=candidates)
-    
-    def Vote(self, request, context):
-        """Processa um voto"""
-        credential = request.voting_credential
-        candidate_id = request.candidate_id
+        # Filtros desconhecidos não ocupam entradas na cache
+        if not self.cache_responses or not self.candidates.is_filter(race, district):
+            return self._build_candidates(race, district)
         
-        print(f"🗳️  Pedido de voto:")
-        print(f"   Credencial: {credential}")
-        print(f"   Candidato: {candidate_id}")
+        cached = self._candidates_cache.get((race, district))
+        if cached is None:
+            cached = self._build_candidates(race, district).SerializeToString()
+            self._candidates_cache[(race, district)] = cached
         
-        # Valida credencial
-        if credential not in self.valid_credentials:
-            # Aceita também credenciais que começam com CRED-
-            if not credential.startswith("CRED-"):
-                print(f"   ❌ Credencial inválida")
-                return voting_pb2.VoteResponse(
-                    success=False,
-                    message="Credencial de voto inválida"
-                )
-        
-        # Verifica se já foi usada
-        if credential in self.used_credentials:
-            print(f"   ❌ Credencial já utilizada")
+        return cached
+    
+    def _is_valid_credential(self, credential):
+        """Valida o formato/origem da credencial"""
+        if self.verifier is not None:
+            # Só CPU: formato + MAC, sem consultar a AR
+            return self.verifier.verify(credential) is not None
+        # --insecure-dev-credentials: só o prefixo
+        return credential.startswith("CRED-")
+    
+    def _vote_response(self, result, candidate_id):
+        """Converte o resultado do motor de contagem na resposta gRPC"""
+        if result is CastResult.ALREADY_USED:
             return voting_pb2.VoteResponse(
                 success=False,
                 message="Esta credencial já foi utilizada"
             )
         
-        # Valida candidato
-        if candidate_id not in self.votes:
-            print(f"   ❌ Candidato inválido")
+        if result is CastResult.UNKNOWN_CANDIDATE:
             return voting_pb2.VoteResponse(
                 success=False,
                 message="Candidato inexistente"
             )
         
-        # Regista voto
-        self.used_credentials.add(credential)
-        self.votes[candidate_id] += 1
-        
-        candidate_name = next(name for cid, name in self.candidates if cid == candidate_id)
-        print(f"   ✅ Voto registado para {candidate_name}")
-        
+        candidate_name = self.candidates.name(candidate_id)
         return voting_pb2.VoteResponse(
             success=True,
             message=f"Voto registado com sucesso em {candidate_name}"
         )
     
+    def _journal_append(self, ballots):
+        """
+        Acrescenta votos aceites ao diário
+        
+        Os votos já estão na contagem em memória quando chegam aqui. Se o
+        diário falhar não há forma segura de os retirar (podem até já estar
+        em parte no disco), por isso a falha é fatal: a AV deixa de aceitar
+        votos, `on_fatal` para o servidor e o reinício reconstrói a contagem
+        a partir do que está de facto no diário.
+        
+        Returns:
+            Future: Concluído quando os votos estiverem em disco
+        """
+        try:
+            durable = self.journal.append_many(ballots)
+        except (OSError, RuntimeError) as e:
+            durable = futures.Future()
+            durable.set_exception(e)
+        durable.add_done_callback(self._check_durable)
+        return durable
+    
+    def _check_durable(self, durable):
+        """
+        Regista a primeira falha do diário
+        
+        Corre como callback do Future (thread de escrita do diário) e também
+        nos handlers antes de abortarem: o Future acorda quem espera antes
+        de correr os callbacks, por isso o cliente podia receber UNAVAILABLE
+        antes de a falha estar registada.
+        """
+        error = durable.exception()
+        if error is None:
+            return
+        # on_fatal corre dentro do lock: quem chega depois só segue (e aborta)
+        # quando a falha já foi tratada
+        with self._fatal_lock:
+            if self.journal_error is not None:
+                return
+            self.journal_error = error
+            self._journal_failed = durable
+            self.log.error("journal.failed", error=str(error))
+            print(f"❌ Falha no diário de votos: {error} (a AV deixa de aceitar votos)")
+            if self.on_fatal is not None:
+                self.on_fatal()
+    
+    def _cast_vote(self, request):
+        """
+        Valida e regista um voto
+        
+        Returns:
+            tuple: (VoteResponse, Future do diário ou None)
+        """
+        credential = request.voting_credential
+        candidate_id = request.candidate_id
+        
+        # Diário em falha: nenhum voto novo entra na contagem
+        if self._journal_failed is not None:
+            return None, self._journal_failed
+        
+        # Valida credencial
+        if not self._is_valid_credential(credential):
+            self.log.info("vote", credential=credential, candidate_id=candidate_id,
+                          result="invalid_credential")
+            return voting_pb2.VoteResponse(
+                success=False,
+                message="Credencial de voto inválida"
+            ), None
+        
+        # Regista voto (credencial usada no máximo uma vez)
+        result = self.tally.cast(credential, candidate_id)
+        
+        durable = None
+        if result is CastResult.ACCEPTED and self.journal is not None:
+            durable = self._journal_append([(credential, candidate_id)])
+        
+        self.log.info("vote", credential=credential, candidate_id=candidate_id,
+                      result=result.value)
+        
+        return self._vote_response(result, candidate_id), durable
+    
+    def Vote(self, request, context):
+        """Processa um voto"""
+        response, durable = self._cast_vote(request)
+        
+        # Só confirma ao cliente depois de o voto estar em disco
+        if durable is not None and durable.exception() is not None:
+            self._check_durable(durable)
+            context.abort(*JOURNAL_UNAVAILABLE)
+        
+        return response
+    
+    def _submit_ballots(self, requests):
+        """
+        Valida e regista um lote de votos numa única secção crítica
+        
+        Returns:
+            tuple: (SubmitBallotsResponse, Future do diário ou None)
+        """
+        if self._journal_failed is not None:
+            return None, self._journal_failed
+        
+        # Credenciais inválidas não chegam ao motor de contagem
+        invalid = voting_pb2.VoteResponse(
+            success=False,
+            message="Credencial de voto inválida"
+        )
+        valid = [self._is_valid_credential(r.voting_credential) for r in requests]
+        ballots = [
+            (r.voting_credential, r.candidate_id)
+            for r, ok in zip(requests, valid)
+            if ok
+        ]
+        outcomes = self.tally.cast_many(ballots)
+        
+        durable = None
+        if self.journal is not None:
+            accepted = [
+                ballot for ballot, outcome in zip(ballots, outcomes)
+                if outcome is CastResult.ACCEPTED
+            ]
+            durable = self._journal_append(accepted)
+        
+        outcomes = iter(outcomes)
+        
+        results = []
+        for r, ok in zip(requests, valid):
+            if ok:
+                results.append(self._vote_response(next(outcomes), r.candidate_id))
+            else:
+                results.append(invalid)
+        
+        accepted = sum(1 for r in results if r.success)
+        self.log.info("ballots", size=len(requests), accepted=accepted)
+        
+        return voting_pb2.SubmitBallotsResponse(results=results), durable
+    
+    def SubmitBallots(self, request_iterator, context):
+        """Processa um lote de votos enviado em stream"""
+        response, durable = self._submit_ballots(list(request_iterator))
+        
+        if durable is not None and durable.exception() is not None:
+            self._check_durable(durable)
+            context.abort(*JOURNAL_UNAVAILABLE)
+        
+        return response
+    
     def GetResults(self, request, context):
         """Retorna resultados da votação"""
-        print("📊 Pedido de resultados")
+        self.log.debug("results.get", total=self.tally.total())
         
-        results = [
-            voting_pb2.CandidateResult(id=cid, name=name, votes=self.votes[cid])
-            for cid, name in self.candidates
-        ]
+        if not self.cache_responses:
+            return self._build_results()
         
-        total = sum(self.votes.values())
-        print(f"   ✅ Total de votos: {total}")
+        # A versão é lida antes de construir: a resposta guardada tem pelo
+        # menos os votos dessa versão, nunca menos
+        version = self.tally.version()
+        cached_version, cached = self._results_cache
+        if cached_version != version:
+            cached = self._build_results().SerializeToString()
+            self._results_cache = (version, cached)
         
-        return voting_pb2.GetResultsResponse(results=results)
+        return cached
+    
+    def limit_watchers(self, count):
+        """
+        Limita os WatchResults em simultâneo (servidor com pool de threads)
+        
+        Cada observador ocupa uma thread do pool enquanto está ligado; sem
+        limite, observadores suficientes deixariam os votos sem threads.
+        Os que excedem o limite recebem RESOURCE_EXHAUSTED.
+        """
+        self._watch_slots = threading.BoundedSemaphore(count)
+    
+    def WatchResults(self, request, context):
+        """Envia um snapshot dos resultados e depois só as alterações"""
+        slots = self._watch_slots
+        if slots is not None and not slots.acquire(blocking=False):
+            self.log.info("results.watch", result="exhausted")
+            context.abort(*WATCHERS_EXHAUSTED)
+        self.log.info("results.watch")
+        
+        try:
+            seq, update = self.results_feed.subscribe()
+            yield update
+            
+            while context.is_active():
+                # Timeout curto para detetar observadores que desligaram
+                next_update = self.results_feed.wait(seq, timeout=1.0)
+                if next_update is not None:
+                    seq, update = next_update
+                    yield update
+        finally:
+            if slots is not None:
+                slots.release()
 
 
-def serve():
-    """Inicia o servidor"""
-    server = grpc.server(futures.ThreadPoolExecutor(max_workers=10))
+class AsyncVotingService(voting_pb2_grpc.VotingServiceServicer):
+    """
+    Adaptador grpc.aio do VotingService
     
-    voting_pb2_grpc.add_VotingServiceServicer_to_server(
-        VotingService(), server
-    )
+    Partilha o estado e a lógica do serviço síncrono; só as esperas (diário
+    em disco, novas atualizações de resultados) passam a ser awaitables, para
+    não bloquear o event loop.
+    """
+    
+    def __init__(self, service):
+        self.service = service
+    
+    async def GetCandidates(self, request, context):
+        return self.service.GetCandidates(request, context)
+    
+    async def GetResults(self, request, context):
+        return self.service.GetResults(request, context)
+    
+    async def Vote(self, request, context):
+        response, durable = self.service._cast_vote(request)
+        if durable is not None:
+            try:
+                await asyncio.wrap_future(durable)
+            except (OSError, RuntimeError):
+                self.service._check_durable(durable)
+                await context.abort(*JOURNAL_UNAVAILABLE)
+        return response
+    
+    async def SubmitBallots(self, request_iterator, context):
+        requests = [r async for r in request_iterator]
+        response, durable = self.service._submit_ballots(requests)
+        if durable is not None:
+            try:
+                await asyncio.wrap_future(durable)
+            except (OSError, RuntimeError):
+                self.service._check_durable(durable)
+                await context.abort(*JOURNAL_UNAVAILABLE)
+        return response
+    
+    async def WatchResults(self, request, context):
+        self.service.log.info("results.watch")
+        feed = self.service.results_feed
+        
+        seq, update = feed.subscribe()
+        yield update
+        
+        # Termina com CancelledError quando o cliente desliga
+        while True:
+            seq, update = await feed.wait_async(seq)
+            yield update
+
+
+async def _serve_aio(service, port, options, interceptors=()):
+    """Servidor grpc.aio: um event loop, sem limite de threads por RPC"""
+    server = grpc.aio.server(options=options, interceptors=interceptors)
+    add_voting_service_to_server(AsyncVotingService(service), server)
+    server.add_insecure_port(f'[::]:{port}')
+    await server.start()
     
-    server.add_insecure_port('[::]:9091')
-    server.start()
+    # Falha do diário (thread de escrita): termina o servidor
+    loop = asyncio.get_running_loop()
+    service.on_fatal = lambda: loop.call_soon_threadsafe(
+        lambda: asyncio.ensure_future(server.stop(1.0))
+    )
     
-    print("🚀 Servidor AV (Autoridade de Votação) iniciado")
-    print("   Porta: 9091")
+    print(f"🚀 Servidor AV (Autoridade de Votação) iniciado [asyncio, pid {os.getpid()}]")
+    print(f"   Porta: {port}")
     print("   Pressione Ctrl+C para parar\n")
     
     try:
-        server.wait_for_termination()
+        await server.wait_for_termination()
+    finally:
+        await server.stop(0)
+
+
+def _run_server(service, port, max_workers, use_aio, options=(), admin=None, max_watchers=None):
+    """Serve o VotingService até Ctrl+C (pool de threads ou asyncio)"""
+    options = SERVER_OPTIONS + list(options)
+    interceptors = admin.interceptors(use_aio) if admin is not None else ()
+    
+    try:
+        if use_aio:
+            asyncio.run(_serve_aio(service, port, options, interceptors))
+            return
+        
+        # Observadores sem limite só com asyncio: aqui cada um ocupa uma thread
+        if max_watchers is None:
+            max_watchers = max(1, max_workers // 2)
+        service.limit_watchers(max_watchers)
+        
+        server = grpc.server(
+            futures.ThreadPoolExecutor(max_workers=max_workers),
+            options=options, interceptors=interceptors
+        )
+        add_voting_service_to_server(service, server)
+        server.add_insecure_port(f'[::]:{port}')
+        server.start()
+        # Falha do diário: termina o servidor (as chamadas em curso abortam)
+        service.on_fatal = lambda: server.stop(1.0)
+        
+        print(f"🚀 Servidor AV (Autoridade de Votação) iniciado [pid {os.getpid()}]")
+        print(f"   Porta: {port}")
+        print("   Pressione Ctrl+C para parar\n")
+        
+        try:
+            server.wait_for_termination()
+        finally:
+            server.stop(0)
     except KeyboardInterrupt:
         print("\n⏹️  Servidor parado")
-        server.stop(0)
+    
+    if service.journal_error is not None:
+        # A contagem em memória pode ter votos que não estão no diário
+        sys.exit(f"❌ Servidor parado por falha no diário de votos: {service.journal_error}")
+
+
+def _open_journal(journal_path, flush_window, snapshot_interval, key=credential_digest):
+    """Abre o diário de votos e a thread de snapshots"""
+    journal = VoteJournal(journal_path, flush_window=flush_window)
+    compactor = Compactor(journal, interval=snapshot_interval, key=key)
+    compactor.start()
+    return journal, compactor
+
+
+def _load_verifier(insecure, key_file, election_id):
+    """Verificador das credenciais assinadas pela AR (None = sem verificação)"""
+    if insecure:
+        print("⚠️  --insecure-dev-credentials: aceita qualquer credencial CRED- sem verificar o MAC")
+        return None
+    key, source = load_key(key_file)
+    print(f"🔏 Credenciais assinadas (eleição {election_id}, chave: {source})")
+    return CredentialSigner(key, election_id)
+
+
+def _open_metrics(metrics_options, index=0):
+    """Métricas e profiler do processo (None se não foram pedidos)"""
+    if not metrics_options:
+        return None
+    metrics_options = dict(metrics_options)
+    if metrics_options.get("port"):
+        # Em modo multi-processo cada worker tem o seu endpoint
+        metrics_options["port"] += index
+    admin = metrics.MetricsAdmin(**metrics_options)
+    admin.install_signals()
+    return admin
+
+
+def _serve_worker(index, tally, options):
+    """Processo worker: serviço próprio sobre a contagem partilhada"""
+    log = request_log.configure(**options["log_options"])
+    admin = _open_metrics(options.get("metrics_options"), index)
+    journal = compactor = None
+    if options["journal_path"]:
+        # Cada worker escreve no seu subdiretório do diário
+        journal, compactor = _open_journal(
+            os.path.join(options["journal_path"], f"worker-{index}"),
+            options["flush_window"],
+            options["snapshot_interval"]
+        )
+    
+    service = VotingService(
+        watch_interval=options["watch_interval"],
+        journal=journal,
+        cache_responses=options["cache_responses"],
+        candidates=options["candidates"],
+        tally=tally,
+        log=log,
+        verifier=_load_verifier(
+            options["insecure_dev_credentials"], options["credential_key_file"], options["election_id"]
+        ),
+        insecure_dev_credentials=options["insecure_dev_credentials"]
+    )
+    
+    try:
+        _run_server(
+            service, options["port"], options["max_workers"], options["use_aio"],
+            options=[("grpc.so_reuseport", 1)], admin=admin, max_watchers=options["max_watchers"]
+        )
+    finally:
+        if journal is not None:
+            compactor.stop()
+            journal.close()
+        if admin is not None:
+            admin.close()
+        log.close()
+
+
+def serve_processes(processes, capacity=1_000_000, **options):
+    """
+    Inicia `processes` workers na mesma porta (SO_REUSEPORT)
+    
+    A contagem vive em memória partilhada (SharedTally): qualquer worker
+    aceita votos e responde ao GetResults com o total exato de todos.
+    """
+    candidates = CandidateRegistry.load(options["candidates_path"])
+    options["candidates"] = candidates
+    # Credenciais usadas guardadas pelo digest (também as assinadas: o
+    # bitmap de séries do TallyEngine não existe em memória partilhada)
+    tally = SharedTally(candidates.ids(), capacity=capacity)
+    
+    # Reconstrução feita uma vez, antes de criar os workers
+    if options["journal_path"]:
+        for snapshot, tail in recover_tree(options["journal_path"]):
+            tally.restore(snapshot.counts, snapshot.iter_digests())
+            tally.cast_many(tail)
+        print(f"📒 Diário de votos: {options['journal_path']} ({tally.total()} votos recuperados)")
+    
+    print(f"📋 {len(candidates)} candidatos carregados de {options['candidates_path']}")
+    print(f"🧩 {processes} processos na porta {options['port']} (SO_REUSEPORT)")
+    
+    context = multiprocessing.get_context("fork")
+    workers = [
+        context.Process(target=_serve_worker, args=(i, tally, options))
+        for i in range(processes)
+    ]
+    for worker in workers:
+        worker.start()
+    
+    try:
+        failed = _wait_workers(workers)
+    except KeyboardInterrupt:
+        # Os workers recebem o mesmo Ctrl+C e terminam sozinhos
+        for worker in workers:
+            worker.join()
+        failed = False
+    finally:
+        tally.close()
+    
+    if failed:
+        sys.exit("❌ Servidor parado por falha de um worker")
+
+
+def _wait_workers(workers):
+    """
+    Espera pelos workers; se um falhar (ex.: diário de votos), para os outros
+    
+    A contagem partilhada pode ter votos do worker que falhou que não estão
+    no diário: os restantes não podem continuar a servir sobre ela.
+    
+    Returns:
+        bool: True se algum worker terminou com erro
+    """
+    running = list(workers)
+    failed = False
+    while running:
+        ready = wait_processes([worker.sentinel for worker in running])
+        for worker in [w for w in running if w.sentinel in ready]:
+            running.remove(worker)
+            worker.join()
+            if worker.exitcode and not failed:
+                failed = True
+                print(f"❌ Worker {worker.pid} terminou com erro; a parar os restantes")
+                for other in running:
+                    other.terminate()
+    return failed
+
+
+def serve(max_workers=10, watch_interval=0.5, journal_path=None, flush_window=0.002,
+          snapshot_interval=60.0, cache_responses=True, candidates_path=DEFAULT_CANDIDATES,
+          port=9091, use_aio=False, processes=1, capacity=1_000_000, log_options=None,
+          bloom_bits=0, insecure_dev_credentials=False, credential_key_file=None,
+          election_id=DEFAULT_ELECTION, metrics_options=None, max_watchers=None):
+    """Inicia o servidor"""
+    log_options = log_options or {}
+    
+    if processes > 1:
+        serve_processes(
+            processes,
+            capacity=capacity,
+            max_workers=max_workers,
+            watch_interval=watch_interval,
+            journal_path=journal_path,
+            flush_window=flush_window,
+            snapshot_interval=snapshot_interval,
+            cache_responses=cache_responses,
+            candidates_path=candidates_path,
+            port=port,
+            use_aio=use_aio,
+            log_options=log_options,
+            insecure_dev_credentials=insecure_dev_credentials,
+            credential_key_file=credential_key_file,
+            election_id=election_id,
+            metrics_options=metrics_options,
+            max_watchers=max_watchers
+        )
+        return
+    
+    log = request_log.configure(**log_options)
+    verifier = _load_verifier(insecure_dev_credentials, credential_key_file, election_id)
+    journal = compactor = None
+    if journal_path:
+        # Os snapshots guardam as mesmas chaves que a contagem
+        key = SerialKeys().key if verifier is not None else credential_digest
+        journal, compactor = _open_journal(journal_path, flush_window, snapshot_interval, key)
+    
+    service = VotingService(
+        watch_interval=watch_interval,
+        journal=journal,
+        cache_responses=cache_responses,
+        candidates=CandidateRegistry.load(candidates_path),
+        log=log,
+        bloom_bits=bloom_bits,
+        verifier=verifier,
+        insecure_dev_credentials=insecure_dev_credentials
+    )
+    
+    print(f"📋 {len(service.candidates)} candidatos carregados de {candidates_path}")
+    if journal is not None:
+        print(f"📒 Diário de votos: {journal_path} ({service.tally.total()} votos recuperados)")
+    
+    admin = _open_metrics(metrics_options)
+    try:
+        _run_server(service, port, max_workers, use_aio, admin=admin, max_watchers=max_watchers)
+    finally:
+        if journal is not None:
+            compactor.stop()
+            journal.close()
+        if admin is not None:
+            admin.close()
+        log.close()
+
+
+def parse_args():
+    """Argumentos da linha de comandos"""
+    parser = argparse.ArgumentParser(description="Servidor mock da AV")
+    parser.add_argument("--port", type=int, default=9091,
+                        help="Porta do servidor")
+    parser.add_argument("--aio", action="store_true",
+                        help="Servidor grpc.aio (asyncio) em vez do pool de threads")
+    parser.add_argument("--workers", type=int, default=10,
+                        help="Número de threads do servidor (modo não-asyncio)")
+    parser.add_argument("--max-watchers", type=int,
+                        help="WatchResults em simultâneo no modo de threads, cada um ocupa uma "
+                             "thread (default: metade de --workers); com --aio não há limite")
+    parser.add_argument("--processes", type=int, default=1,
+                        help="Processos a servir a mesma porta (SO_REUSEPORT)")
+    parser.add_argument("--capacity", type=int, default=1_000_000,
+                        help="Credenciais usadas suportadas com --processes")
+    parser.add_argument("--credential-key-file",
+                        help="Chave partilhada com a AR para verificar as credenciais "
+                             "(default: VOTING_CREDENTIAL_KEY ou chave de desenvolvimento)")
+    parser.add_argument("--insecure-dev-credentials", action="store_true",
+                        help="Só para desenvolvimento: aceita qualquer credencial CRED- sem verificar o MAC")
+    parser.add_argument("--election-id", default=DEFAULT_ELECTION,
+                        help="Identificador da eleição incluído no MAC das credenciais")
+    parser.add_argument("--bloom-bits", type=int, default=0,
+                        help="Bits por credencial do filtro de Bloom das credenciais usadas (0 = sem filtro)")
+    parser.add_argument("--watch-interval", type=float, default=0.5,
+                        help="Intervalo de agregação do WatchResults (s)")
+    parser.add_argument("--candidates", default=DEFAULT_CANDIDATES,
+                        help="Ficheiro CSV de candidatos (id,name,race,district)")
+    parser.add_argument("--journal",
+                        help="Diretório do diário de votos (sem diário por defeito)")
+    parser.add_argument("--group-commit-ms", type=float, default=2.0,
+                        help="Janela de group commit do diário (ms)")
+    parser.add_argument("--snapshot-interval", type=float, default=60.0,
+                        help="Intervalo entre snapshots do diário (s)")
+    parser.add_argument("--no-response-cache", action="store_true",
+                        help="Desativa a cache de GetCandidates/GetResults")
+    request_log.add_arguments(parser)
+    metrics.add_arguments(parser)
+    return parser.parse_args()
 
 
 if __name__ == '__main__':
-    serve()
\ No newline at end of file
+    args = parse_args()
+    serve(
+        max_workers=args.workers,
+        watch_interval=args.watch_interval,
+        journal_path=args.journal,
+        flush_window=args.group_commit_ms / 1000,
+        snapshot_interval=args.snapshot_interval,
+        cache_responses=not args.no_response_cache,
+        candidates_path=args.candidates,
+        port=args.port,
+        use_aio=args.aio,
+        processes=args.processes,
+        capacity=args.capacity,
+        bloom_bits=args.bloom_bits,
+        insecure_dev_credentials=args.insecure_dev_credentials,
+        credential_key_file=args.credential_key_file,
+        election_id=args.election_id,
+        log_options=request_log.options_from_args(args),
+        metrics_options=metrics.options_from_args(args),
+        max_watchers=args.max_watchers
+    )
\ No newline at end of file
@@ -0,0 +1,79 @@
+"""
+Cache local da lista de candidatos (memória + ficheiro)
+Revalidada no servidor com a versão do boletim (GetCandidates com if_none_match)
+"""
+
+import json
+import os
+import threading
+
+
+def default_path(address):
+    """Ficheiro de cache por servidor, em ~/.cache/voting-system-grpc"""
+    name = address.replace(":", "_").replace("/", "_")
+    return os.path.join(os.path.expanduser("~"), ".cache", "voting-system-grpc", f"candidates-{name}.json")
+
+
+class CandidateCache:
+    """
+    Listas de candidatos por filtro (eleição, círculo) com a respetiva versão
+    
+    O ficheiro é lido uma vez na criação e reescrito por inteiro (ficheiro
+    temporário + os.replace) quando chega uma versão nova, por isso um
+    quiosque reiniciado só precisa de uma resposta "não alterado".
+    """
+    
+    def __init__(self, path=None):
+        """
+        Args:
+            path: Ficheiro da cache (None = só memória)
+        """
+        self.path = path
+        self._entries = {}
+        self._lock = threading.Lock()
+        if path is not None:
+            self._load()
+    
+    def _load(self):
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                data = json.load(f)
+            for entry in data["entries"]:
+                key = (entry["race"], entry["district"])
+                candidates = [(int(cid), name) for cid, name in entry["candidates"]]
+                self._entries[key] = (entry["version"], candidates)
+        except (OSError, ValueError, KeyError, TypeError):
+            # Cache ausente ou corrompida: recomeça vazia
+            self._entries = {}
+    
+    def get(self, race="", district=""):
+        """
+        Returns:
+            tuple: (versão, lista de (id, name)) ou None se não houver cache
+        """
+        with self._lock:
+            return self._entries.get((race, district))
+    
+    def put(self, race, district, version, candidates):
+        """Guarda uma versão nova da lista (e reescreve o ficheiro)"""
+        candidates = list(candidates)
+        with self._lock:
+            self._entries[(race, district)] = (version, candidates)
+            if self.path is not None:
+                self._save()
+    
+    def _save(self):
+        """Escrita atómica do ficheiro (chamar com o lock)"""
+        data = {"entries": [
+            {"race": race, "district": district, "version": version, "candidates": candidates}
+            for (race, district), (version, candidates) in self._entries.items()
+        ]}
+        tmp_path = self.path + ".tmp"
+        try:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(data, f, ensure_ascii=False)
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            # A cache em memória continua válida
+            print(f"⚠️  Não foi possível gravar a cache de candidatos: {e}")
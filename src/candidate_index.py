@@ -0,0 +1,80 @@
+"""
+Índice de prefixos sobre os nomes dos candidatos
+Pesquisa "enquanto se escreve" no boletim, sem percorrer todos os candidatos
+"""
+
+from bisect import bisect_left
+import unicodedata
+
+
+def normalize(text):
+    """Minúsculas e sem acentos ("João" → "joao")"""
+    decomposed = unicodedata.normalize("NFKD", text.casefold())
+    return "".join(c for c in decomposed if not unicodedata.combining(c))
+
+
+class CandidateIndex:
+    """
+    Candidatos pesquisáveis por prefixo de qualquer palavra do nome ou do id
+    
+    As palavras normalizadas dos nomes (e os ids) ficam numa lista
+    ordenada, cada uma com as posições dos candidatos onde aparece; um
+    prefixo corresponde a um intervalo contíguo dessa lista, encontrado
+    com bisect. Com várias palavras na pesquisa, um candidato tem de
+    corresponder a todas.
+    """
+    
+    def __init__(self, candidates):
+        """
+        Args:
+            candidates: Lista de (id, name), pela ordem do boletim
+        """
+        self.candidates = list(candidates)
+        # Palavra normalizada → posições (os nomes repetem muitas palavras)
+        postings = {}
+        normalized = {}
+        for position, (cid, name) in enumerate(self.candidates):
+            postings.setdefault(str(cid), []).append(position)
+            for word in name.split():
+                key = normalized.get(word)
+                if key is None:
+                    key = normalized[word] = normalize(word)
+                postings.setdefault(key, []).append(position)
+        self._words = sorted(postings)
+        self._postings = [postings[word] for word in self._words]
+    
+    def __len__(self):
+        return len(self.candidates)
+    
+    def _prefix(self, prefix):
+        """Posições dos candidatos com uma palavra começada por `prefix`"""
+        start = bisect_left(self._words, prefix)
+        # Fim do intervalo: primeira palavra maior do que todas as começadas por prefix
+        end = bisect_left(self._words, prefix + "\U0010ffff", start)
+        matches = set()
+        for positions in self._postings[start:end]:
+            matches.update(positions)
+        return matches
+    
+    def search(self, query):
+        """
+        Candidatos que correspondem a `query`
+        
+        Args:
+            query: Texto da pesquisa (vazio = todos)
+        
+        Returns:
+            list: (id, name) pela ordem do boletim
+        """
+        words = normalize(query).split()
+        if not words:
+            return list(self.candidates)
+        
+        # Começa pela palavra mais longa (normalmente o intervalo mais curto)
+        words.sort(key=len, reverse=True)
+        matches = self._prefix(words[0])
+        for word in words[1:]:
+            if not matches:
+                break
+            matches &= self._prefix(word)
+        return [self.candidates[position] for position in sorted(matches)]
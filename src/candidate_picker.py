@@ -0,0 +1,188 @@
+"""
+Seletor de candidatos da GUI para boletins grandes
+Lista virtualizada (só as linhas visíveis existem) com pesquisa por prefixo
+"""
+
+import tkinter as tk
+from tkinter import ttk
+
+from src.candidate_index import CandidateIndex
+
+
+class VirtualList(ttk.Frame):
+    """
+    Lista de uma coluna desenhada num Canvas
+    
+    Só existem itens de texto para as linhas visíveis; ao fazer scroll os
+    mesmos itens mudam de texto. O custo de mostrar 10 ou 100 000 linhas é
+    o mesmo e a lista não guarda widgets por linha.
+    """
+    
+    def __init__(self, master, row_height=26, on_select=None, font=("Arial", 10), formatter=str):
+        """
+        Args:
+            master: Widget pai
+            row_height: Altura de cada linha, em píxeis
+            on_select: Callback(índice) quando o utilizador escolhe uma linha
+            font: Tipo de letra das linhas
+            formatter: Texto de um elemento (só chamado para as linhas visíveis)
+        """
+        super().__init__(master)
+        self.row_height = row_height
+        self.on_select = on_select
+        self.font = font
+        self.formatter = formatter
+        self.items = []
+        self.top = 0
+        self.selected = None
+        
+        self.canvas = tk.Canvas(self, highlightthickness=0, bg="white", takefocus=1)
+        self.scrollbar = ttk.Scrollbar(self, orient=tk.VERTICAL, command=self.yview)
+        self.scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+        self.canvas.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+        
+        self._highlight = self.canvas.create_rectangle(0, 0, 0, 0, fill="#d6eaf8", outline="", state=tk.HIDDEN)
+        self._rows = []
+        
+        self.canvas.bind("<Configure>", self._resize)
+        self.canvas.bind("<Button-1>", self._click)
+        self.canvas.bind("<MouseWheel>", lambda e: self.yview("scroll", -1 if e.delta > 0 else 1, "units"))
+        self.canvas.bind("<Button-4>", lambda e: self.yview("scroll", -1, "units"))
+        self.canvas.bind("<Button-5>", lambda e: self.yview("scroll", 1, "units"))
+        self.canvas.bind("<Up>", lambda e: self.select(max((self.selected or 0) - 1, 0)))
+        self.canvas.bind("<Down>", lambda e: self.select(min((self.selected or 0) + 1, len(self.items) - 1)))
+    
+    @property
+    def visible(self):
+        """Linhas que cabem no Canvas"""
+        return max(len(self._rows) - 1, 1)
+    
+    def set_items(self, items, selected=None):
+        """
+        Substitui o conteúdo
+        
+        Args:
+            items: Sequência de elementos (formatados com `formatter`)
+            selected: Índice a selecionar (None = nenhum)
+        """
+        self.items = items
+        self.top = 0
+        self.selected = None
+        if selected is not None:
+            self.select(selected, notify=False)
+        self._redraw()
+    
+    def select(self, index, notify=True):
+        """Seleciona `index` e faz scroll até ele"""
+        if not 0 <= index < len(self.items):
+            return
+        self.selected = index
+        if index < self.top:
+            self.top = index
+        elif index >= self.top + self.visible:
+            self.top = index - self.visible + 1
+        self._redraw()
+        if notify and self.on_select is not None:
+            self.on_select(index)
+    
+    def yview(self, *args):
+        """Protocolo de scroll do Tk (comando da Scrollbar)"""
+        last = max(len(self.items) - self.visible, 0)
+        if args[0] == "moveto":
+            self.top = int(float(args[1]) * len(self.items))
+        elif args[0] == "scroll":
+            step = self.visible if args[2] == "pages" else 1
+            self.top += int(args[1]) * step
+        self.top = min(max(self.top, 0), last)
+        self._redraw()
+    
+    def _resize(self, event):
+        """Ajusta o número de itens de texto à altura do Canvas"""
+        needed = event.height // self.row_height + 2
+        while len(self._rows) < needed:
+            self._rows.append(self.canvas.create_text(
+                8, len(self._rows) * self.row_height + self.row_height // 2,
+                anchor=tk.W, font=self.font
+            ))
+        while len(self._rows) > needed:
+            self.canvas.delete(self._rows.pop())
+        self._redraw()
+    
+    def _click(self, event):
+        self.canvas.focus_set()
+        index = self.top + event.y // self.row_height
+        if index < len(self.items):
+            self.select(index)
+    
+    def _redraw(self):
+        canvas = self.canvas
+        for offset, row in enumerate(self._rows):
+            index = self.top + offset
+            canvas.itemconfigure(row, text=self.formatter(self.items[index]) if index < len(self.items) else "")
+        
+        if self.selected is not None and self.top <= self.selected < self.top + len(self._rows):
+            y = (self.selected - self.top) * self.row_height
+            canvas.coords(self._highlight, 0, y, canvas.winfo_width(), y + self.row_height)
+            canvas.itemconfigure(self._highlight, state=tk.NORMAL)
+        else:
+            canvas.itemconfigure(self._highlight, state=tk.HIDDEN)
+        
+        if self.items:
+            first = self.top / len(self.items)
+            self.scrollbar.set(first, min(first + self.visible / len(self.items), 1.0))
+        else:
+            self.scrollbar.set(0.0, 1.0)
+
+
+class CandidatePicker(ttk.Frame):
+    """
+    Pesquisa + lista virtualizada de candidatos
+    
+    A escolha fica em `variable` (id do candidato), como nos Radiobuttons
+    que substitui. A pesquisa usa o CandidateIndex e é refeita a cada
+    tecla; uma seleção que deixe de estar no filtro mantém-se.
+    """
+    
+    def __init__(self, master, variable):
+        """
+        Args:
+            master: Widget pai
+            variable: tk.IntVar com o id do candidato escolhido
+        """
+        super().__init__(master)
+        self.variable = variable
+        self.index = CandidateIndex([])
+        self.shown = []
+        
+        search_frame = ttk.Frame(self)
+        search_frame.pack(fill=tk.X, pady=(0, 5))
+        ttk.Label(search_frame, text="🔎 Pesquisar:").pack(side=tk.LEFT)
+        self.query = tk.StringVar()
+        self.query.trace_add("write", lambda *_: self.refresh())
+        self.search_entry = ttk.Entry(search_frame, textvariable=self.query)
+        self.search_entry.pack(side=tk.LEFT, fill=tk.X, expand=True, padx=5)
+        self.count_label = ttk.Label(search_frame, text="")
+        self.count_label.pack(side=tk.RIGHT)
+        
+        self.list = VirtualList(self, on_select=self._chosen, formatter=lambda c: f"[{c[0]}] {c[1]}")
+        self.list.pack(fill=tk.BOTH, expand=True)
+        
+        # Enter na pesquisa escolhe o primeiro resultado
+        self.search_entry.bind("<Return>", lambda e: self.list.select(0))
+        self.search_entry.bind("<Down>", lambda e: (self.list.canvas.focus_set(), self.list.select(0)))
+    
+    def set_candidates(self, candidates):
+        """Novo boletim: reconstrói o índice e mostra o filtro atual"""
+        self.index = CandidateIndex(candidates)
+        self.refresh()
+    
+    def refresh(self):
+        """Aplica a pesquisa atual"""
+        self.shown = self.index.search(self.query.get())
+        chosen = self.variable.get()
+        selected = next((i for i, (cid, _) in enumerate(self.shown) if cid == chosen), None)
+        self.list.set_items(self.shown, selected)
+        self.count_label.config(text=f"{len(self.shown)} de {len(self.index)}")
+    
+    def _chosen(self, index):
+        self.variable.set(self.shown[index][0])
@@ -0,0 +1,145 @@
+"""
+Configuração dos canais gRPC dos clientes
+Retries (service config), keepalive e pool de canais grpc.aio
+"""
+
+import asyncio
+import itertools
+import json
+
+import grpc
+
+
+VOTING_SERVICE = "voting.VotingService"
+VOTER_SERVICE = "voting.VoterRegistrationService"
+
+# Chamadas unárias com efeitos: repetidas só com UNAVAILABLE
+_WRITE_METHODS = {
+    VOTING_SERVICE: ["Vote"],
+    VOTER_SERVICE: ["IssueVotingCredential"],
+}
+
+# Chamadas sem efeitos: repetidas também quando o prazo esgota
+_READ_METHODS = {
+    VOTING_SERVICE: ["GetCandidates", "GetResults"],
+    VOTER_SERVICE: [],
+}
+
+DEFAULT_TIMEOUT = 5.0
+DEFAULT_ATTEMPTS = 4
+
+
+def service_config(service, attempts=DEFAULT_ATTEMPTS, timeout=DEFAULT_TIMEOUT):
+    """
+    Service config com a política de retries do serviço
+    
+    As chamadas unárias são repetidas com UNAVAILABLE (servidor em baixo
+    ou ligação perdida antes de o pedido ser processado). As leituras são
+    repetidas também com DEADLINE_EXCEEDED; o Vote e a emissão de
+    credenciais não, porque o servidor pode já ter processado o pedido.
+    
+    O prazo e os retries aplicam-se só aos métodos unários: os streams
+    (WatchResults, IssueVotingCredentials, SubmitBallots) duram o que for
+    preciso e o prazo, se houver, é passado na própria chamada.
+    
+    Args:
+        service: Nome completo do serviço (ex.: VOTING_SERVICE)
+        attempts: Tentativas por chamada (máximo do gRPC: 5)
+        timeout: Prazo por omissão de cada chamada, em segundos
+    
+    Returns:
+        str: Service config em JSON
+    """
+    def retry_policy(codes):
+        return {
+            "maxAttempts": attempts,
+            "initialBackoff": "0.1s",
+            "maxBackoff": "2s",
+            "backoffMultiplier": 2,
+            "retryableStatusCodes": codes,
+        }
+    
+    writes = [{"service": service, "method": m} for m in _WRITE_METHODS.get(service, [])]
+    reads = [{"service": service, "method": m} for m in _READ_METHODS.get(service, [])]
+    configs = []
+    if writes:
+        configs.append({
+            "name": writes,
+            "timeout": f"{timeout}s",
+            "retryPolicy": retry_policy(["UNAVAILABLE"]),
+        })
+    if reads:
+        configs.append({
+            "name": reads,
+            "timeout": f"{timeout}s",
+            "retryPolicy": retry_policy(["UNAVAILABLE", "DEADLINE_EXCEEDED"]),
+        })
+    return json.dumps({"methodConfig": configs})
+
+
+def channel_options(service, attempts=DEFAULT_ATTEMPTS, timeout=DEFAULT_TIMEOUT, keepalive_ms=30_000):
+    """
+    Opções de um canal: retries, keepalive e ligação própria
+    
+    Args:
+        service: Nome completo do serviço
+        attempts: Tentativas por chamada
+        timeout: Prazo por omissão de cada chamada, em segundos
+        keepalive_ms: Intervalo entre pings de keepalive
+    
+    Returns:
+        list: Opções para grpc.insecure_channel / grpc.aio.insecure_channel
+    """
+    return [
+        ("grpc.enable_retries", 1),
+        ("grpc.service_config", service_config(service, attempts, timeout)),
+        ("grpc.keepalive_time_ms", keepalive_ms),
+        ("grpc.keepalive_timeout_ms", 10_000),
+        ("grpc.keepalive_permit_without_calls", 1),
+        ("grpc.http2.max_pings_without_data", 0),
+        # Religa depressa após uma falha (default: 1 s, que os retries não cobrem)
+        ("grpc.initial_reconnect_backoff_ms", 100),
+        ("grpc.max_reconnect_backoff_ms", 5_000),
+        # Cada canal do pool abre a sua ligação em vez de partilhar a global
+        ("grpc.use_local_subchannel_pool", 1),
+    ]
+
+
+class ChannelPool:
+    """
+    Canais grpc.aio para o mesmo servidor, usados à vez
+    
+    Cada canal é uma ligação HTTP/2 própria: as chamadas em curso são
+    repartidas por várias ligações em vez de ficarem limitadas ao máximo
+    de streams concorrentes de uma só.
+    """
+    
+    def __init__(self, address, stub_class, size=4, options=()):
+        """
+        Args:
+            address: Endereço do servidor (host:porta)
+            stub_class: Classe do stub gerado (ex.: VotingServiceStub)
+            size: Número de canais
+            options: Opções de cada canal (ver channel_options)
+        """
+        self.address = address
+        self.channels = [
+            grpc.aio.insecure_channel(address, options=list(options))
+            for _ in range(size)
+        ]
+        self._stubs = [stub_class(channel) for channel in self.channels]
+        self._turn = itertools.count()
+    
+    def stub(self):
+        """Stub do próximo canal (round-robin)"""
+        return self._stubs[next(self._turn) % len(self._stubs)]
+    
+    async def wait_ready(self, timeout=None):
+        """Espera até todos os canais estarem ligados"""
+        await asyncio.wait_for(
+            asyncio.gather(*(c.channel_ready() for c in self.channels)),
+            timeout
+        )
+    
+    async def close(self):
+        await asyncio.gather(*(c.close() for c in self.channels))
@@ -11,8 +11,12 @@ import os
 # Adiciona path para importar os clientes
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
 
-from src.voter_client import VoterRegistrationClient
-from src.voting_client import VotingClient
+from src.voter_client import AsyncVoterRegistrationClient
+from src.voting_client import AsyncVotingClient
+from src.candidate_cache import default_path
+from src.gui_tasks import TaskRunner, describe_error
+from src.results_view import ResultsView
+from src.candidate_picker import CandidatePicker
 
 
 class VotingApp:
@@ -24,13 +28,17 @@ class VotingApp:
         self.root.geometry("700x650")
         self.root.resizable(False, False)
         
-        # Clientes gRPC
-        self.voter_client = VoterRegistrationClient()
-        self.voting_client = VotingClient()
+        # Clientes gRPC (asyncio): as chamadas correm fora da thread do Tk
+        self.voter_client = AsyncVoterRegistrationClient(pool_size=1)
+        # Lista de candidatos em cache no disco: um arranque só revalida
+        self.voting_client = AsyncVotingClient(pool_size=1, cache_path=default_path("localhost:9091"))
+        self.tasks = TaskRunner(root, on_busy=self.on_busy)
         
         # Dados da sessão
         self.voting_credential = None
         self.candidates = []
+        self.candidate_names = {}
+        self.live_watch = None
         
         # Conecta aos serviços
         self.connect_services()
@@ -38,14 +46,21 @@ class VotingApp:
         # Cria interface
         self.create_widgets()
         
+        # Resultados ao vivo (WatchResults)
+        self.start_live_results()
+        
         # Protocolo de fecho
         self.root.protocol("WM_DELETE_WINDOW", self.on_closing)
     
     def connect_services(self):
         """Conecta aos serviços gRPC"""
-        try:
+        async def connect():
+            # Os canais grpc.aio são criados no event loop das chamadas
             self.voter_client.connect()
             self.voting_client.connect()
+        
+        try:
+            self.tasks.run(connect)
         except Exception as e:
             messagebox.showerror("Erro de Conexão", 
                 f"Não foi possível conectar aos serviços:\n{str(e)}")
@@ -83,6 +98,24 @@ class VotingApp:
         self.notebook.add(self.tab_results, text="📊 Resultados")
         self.create_results_tab()
         
+        # Estado das chamadas em curso
+        status_frame = ttk.Frame(self.root, padding=(10, 0))
+        status_frame.pack(fill=tk.X)
+        
+        self.status_label = tk.Label(status_frame, text="Pronto", font=("Arial", 9), anchor=tk.W)
+        self.status_label.pack(side=tk.LEFT, fill=tk.X, expand=True)
+        
+        self.cancel_btn = tk.Button(
+            status_frame,
+            text="Cancelar",
+            command=self.tasks.cancel_all,
+            state=tk.DISABLED
+        )
+        self.cancel_btn.pack(side=tk.RIGHT)
+        
+        self.progress = ttk.Progressbar(status_frame, mode="indeterminate", length=120)
+        self.progress.pack(side=tk.RIGHT, padx=10)
+        
         # Rodapé
         footer = tk.Label(
             self.root,
@@ -118,7 +151,7 @@ class VotingApp:
         self.cc_entry.insert(0, "123456789")  # Valor de teste
         
         # Botão registar
-        register_btn = tk.Button(
+        self.register_btn = tk.Button(
             frame,
             text="Obter Credencial de Voto",
             font=("Arial", 11, "bold"),
@@ -128,7 +161,7 @@ class VotingApp:
             command=self.register_voter,
             pady=10
         )
-        register_btn.pack(pady=20, fill=tk.X)
+        self.register_btn.pack(pady=20, fill=tk.X)
         
         # Área de resultado
         result_frame = ttk.LabelFrame(frame, text="Resultado do Registo", padding=15)
@@ -177,7 +210,7 @@ class VotingApp:
         candidates_frame.pack(fill=tk.BOTH, expand=True, pady=10)
         
         # Botão carregar candidatos
-        load_btn = tk.Button(
+        self.load_btn = tk.Button(
             candidates_frame,
             text="🔄 Carregar Lista de Candidatos",
             command=self.load_candidates,
@@ -185,16 +218,15 @@ class VotingApp:
             fg="white",
             cursor="hand2"
         )
-        load_btn.pack(pady=5)
-        
-        # Lista de candidatos (Radiobuttons)
-        self.candidates_frame = ttk.Frame(candidates_frame)
-        self.candidates_frame.pack(fill=tk.BOTH, expand=True, pady=10)
+        self.load_btn.pack(pady=5)
         
+        # Lista de candidatos (virtualizada, com pesquisa)
         self.selected_candidate = tk.IntVar()
+        self.candidate_picker = CandidatePicker(candidates_frame, self.selected_candidate)
+        self.candidate_picker.pack(fill=tk.BOTH, expand=True, pady=10)
         
         # Botão votar
-        vote_btn = tk.Button(
+        self.vote_btn = tk.Button(
             frame,
             text="🗳️ SUBMETER VOTO",
             font=("Arial", 12, "bold"),
@@ -204,7 +236,7 @@ class VotingApp:
             command=self.submit_vote,
             pady=10
         )
-        vote_btn.pack(pady=10, fill=tk.X)
+        self.vote_btn.pack(pady=10, fill=tk.X)
     
     def create_results_tab(self):
         """Cria aba de resultados"""
@@ -218,10 +250,23 @@ class VotingApp:
             text="Resultados da Votação",
             font=("Arial", 12, "bold")
         )
-        title.pack(pady=(0, 20))
+        title.pack(pady=(0, 10))
+        
+        # Total e estado do acompanhamento ao vivo
+        self.results_status = tk.Label(frame, text="Total de votos contabilizados: 0", font=("Arial", 10))
+        self.results_status.pack()
+        
+        self.live_results = tk.BooleanVar(value=True)
+        live_check = ttk.Checkbutton(
+            frame,
+            text="Atualizar ao vivo",
+            variable=self.live_results,
+            command=self.toggle_live_results
+        )
+        live_check.pack(pady=(5, 0))
         
         # Botão atualizar
-        refresh_btn = tk.Button(
+        self.refresh_btn = tk.Button(
             frame,
             text="🔄 Atualizar Resultados",
             command=self.load_results,
@@ -230,7 +275,7 @@ class VotingApp:
             cursor="hand2",
             pady=8
         )
-        refresh_btn.pack(pady=10, fill=tk.X)
+        self.refresh_btn.pack(pady=10, fill=tk.X)
         
         # Tabela de resultados
         results_frame = ttk.Frame(frame)
@@ -260,6 +305,59 @@ class VotingApp:
         
         self.results_tree.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
         scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+        
+        # Linhas atualizadas no lugar, ordenadas por votos
+        self.results_view = ResultsView(self.results_tree)
+    
+    def on_busy(self, pending):
+        """Barra de progresso e botão Cancelar enquanto há chamadas em curso"""
+        if pending:
+            self.progress.start(15)
+            self.cancel_btn.config(state=tk.NORMAL)
+        else:
+            self.progress.stop()
+            self.cancel_btn.config(state=tk.DISABLED)
+    
+    def run_task(self, name, status, button, coroutine_function, *args,
+                 on_success, on_error=None, on_cancel=None):
+        """
+        Inicia uma chamada gRPC sem bloquear a interface
+        
+        O botão da ação fica desativado até a chamada terminar, por isso
+        um duplo clique não envia o pedido duas vezes.
+        
+        Args:
+            name: Nome da ação (uma chamada de cada vez por ação)
+            status: Texto da barra de estado durante a chamada
+            button: Botão que iniciou a ação
+            coroutine_function: Método assíncrono do cliente
+            on_success: Callback(resultado)
+            on_error: Callback(exceção) (default: caixa de erro)
+            on_cancel: Callback() quando o utilizador cancela
+        """
+        if self.tasks.busy(name):
+            return
+        
+        button.config(state=tk.DISABLED)
+        self.status_label.config(text=status)
+        
+        def finished(callback, status_text):
+            def wrapper(*result):
+                button.config(state=tk.NORMAL)
+                self.status_label.config(text=status_text)
+                if callback is not None:
+                    callback(*result)
+            return wrapper
+        
+        self.tasks.call(
+            name, coroutine_function, *args,
+            on_success=finished(on_success, "Pronto"),
+            on_error=finished(on_error or self.show_error, "Falha na última operação"),
+            on_cancel=finished(on_cancel, "Operação cancelada")
+        )
+    
+    def show_error(self, error):
+        messagebox.showerror("Erro", f"✗ {describe_error(error)}")
     
     def register_voter(self):
         """Processa registo do eleitor"""
@@ -270,7 +368,16 @@ class VotingApp:
             return
         
         # Chama serviço de registo
-        is_eligible, credential = self.voter_client.issue_voting_credential(cc_number)
+        self.run_task(
+            "register", "A pedir credencial à AR…", self.register_btn,
+            self.voter_client.issue_voting_credential, cc_number,
+            on_success=self.show_registration,
+            on_error=lambda e: self.show_registration((False, describe_error(e)))
+        )
+    
+    def show_registration(self, result):
+        """Mostra a resposta da AR"""
+        is_eligible, credential = result
         
         # Atualiza interface
         self.registration_result.config(state=tk.NORMAL)
@@ -316,31 +423,38 @@ suporte técnico.
     
     def load_candidates(self):
         """Carrega lista de candidatos"""
-        candidates = self.voting_client.get_candidates()
-        
+        self.run_task(
+            "candidates", "A carregar candidatos…", self.load_btn,
+            self.voting_client.get_candidates,
+            on_success=self.show_candidates,
+            on_error=self.candidates_failed
+        )
+    
+    def candidates_failed(self, error):
+        """Sem resposta da AV: usa a lista em cache, se existir"""
+        cached = self.voting_client.candidate_cache.get()
+        if cached is None:
+            messagebox.showerror(
+                "Erro", f"Não foi possível obter lista de candidatos:\n\n{describe_error(error)}"
+            )
+            return
+        self.status_label.config(text=f"Lista em cache ({describe_error(error)})")
+        self.show_candidates(list(cached[1]))
+    
+    def show_candidates(self, candidates):
+        """Mostra a lista de candidatos"""
         if not candidates:
             messagebox.showerror("Erro", "Não foi possível obter lista de candidatos")
             return
         
         self.candidates = candidates
+        self.candidate_names = dict(candidates)
         
-        # Limpa frame
-        for widget in self.candidates_frame.winfo_children():
-            widget.destroy()
-        
-        # Cria radiobuttons para cada candidato
-        for cid, name in candidates:
-            rb = ttk.Radiobutton(
-                self.candidates_frame,
-                text=f"[{cid}] {name}",
-                variable=self.selected_candidate,
-                value=cid
-            )
-            rb.pack(anchor=tk.W, pady=5, padx=20)
-        
-        # Seleciona primeiro por defeito
-        if candidates:
+        # Mantém a escolha anterior se o candidato continuar no boletim;
+        # senão seleciona o primeiro por defeito
+        if self.selected_candidate.get() not in self.candidate_names:
             self.selected_candidate.set(candidates[0][0])
+        self.candidate_picker.set_candidates(candidates)
         
         messagebox.showinfo("Sucesso", f"{len(candidates)} candidatos carregados")
     
@@ -364,7 +478,7 @@ suporte técnico.
         candidate_id = self.selected_candidate.get()
         
         # Confirmação
-        candidate_name = next((name for cid, name in self.candidates if cid == candidate_id), "Desconhecido")
+        candidate_name = self.candidate_names.get(candidate_id, "Desconhecido")
         
         confirm = messagebox.askyesno(
             "Confirmar Voto",
@@ -375,7 +489,20 @@ suporte técnico.
             return
         
         # Submete voto
-        success, message = self.voting_client.vote(self.voting_credential, candidate_id)
+        self.run_task(
+            "vote", "A submeter voto…", self.vote_btn,
+            self.voting_client.vote, self.voting_credential, candidate_id,
+            on_success=self.show_vote,
+            on_cancel=lambda: messagebox.showwarning(
+                "Voto cancelado",
+                "O pedido foi cancelado, mas o voto pode já ter chegado à AV.\n\n"
+                "Submeta novamente: um voto repetido com a mesma credencial é recusado."
+            )
+        )
+    
+    def show_vote(self, result):
+        """Mostra a resposta da AV ao voto"""
+        success, message = result
         
         if success:
             messagebox.showinfo("Sucesso", f"✓ Voto registado com sucesso!\n\n{message}")
@@ -387,25 +514,57 @@ suporte técnico.
     
     def load_results(self):
         """Carrega resultados da votação"""
-        results = self.voting_client.get_results()
-        
-        # Limpa tabela
-        for item in self.results_tree.get_children():
-            self.results_tree.delete(item)
-        
-        # Preenche com resultados
-        total_votes = 0
-        for cid, name, votes in results:
-            self.results_tree.insert("", tk.END, values=(cid, name, votes))
-            total_votes += votes
-        
-        messagebox.showinfo("Resultados", f"Total de votos contabilizados: {total_votes}")
+        self.run_task(
+            "results", "A obter resultados…", self.refresh_btn,
+            self.voting_client.get_results,
+            on_success=self.show_results
+        )
+    
+    def show_results(self, results):
+        """Atualiza a tabela com os resultados (todos ou só os alterados)"""
+        self.results_view.apply(results)
+        self.update_results_status()
+    
+    def update_results_status(self, note=None):
+        text = f"Total de votos contabilizados: {self.results_view.total}"
+        if note:
+            text += f" · {note}"
+        elif self.live_watch is not None:
+            text += " · 🔴 ao vivo"
+        self.results_status.config(text=text)
+    
+    def start_live_results(self):
+        """Acompanha os resultados com o stream WatchResults (até 10 atualizações/s)"""
+        if self.live_watch is not None or not self.live_results.get():
+            return
+        self.live_watch = self.tasks.watch(
+            "results", self.voting_client.watch_results,
+            on_update=self.show_results,
+            on_end=self.live_results_ended,
+            interval_ms=100
+        )
+        self.update_results_status()
+    
+    def live_results_ended(self, error):
+        """Stream terminado: volta a ligar daqui a 2 s se continuar ativo"""
+        self.live_watch = None
+        if not self.live_results.get():
+            self.update_results_status()
+            return
+        reason = describe_error(error) if error is not None else "ligação terminada"
+        self.update_results_status(f"{reason}; nova tentativa em 2 s")
+        self.root.after(2000, self.start_live_results)
+    
+    def toggle_live_results(self):
+        if self.live_results.get():
+            self.start_live_results()
+        elif self.live_watch is not None:
+            self.live_watch.cancel()
     
     def on_closing(self):
         """Callback ao fechar aplicação"""
-        # Desconecta clientes
-        self.voter_client.disconnect()
-        self.voting_client.disconnect()
+        # Cancela chamadas em curso e desconecta clientes
+        self.tasks.close(self.voter_client.disconnect, self.voting_client.disconnect)
         # Fecha janela
         self.root.destroy()
 
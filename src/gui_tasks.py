@@ -0,0 +1,258 @@
+"""
+Chamadas gRPC da GUI fora da thread do Tk
+Um event loop asyncio numa thread própria; resultados entregues ao Tk com root.after
+"""
+
+from operator import itemgetter
+import asyncio
+import queue
+import threading
+
+import grpc
+
+
+# Prazo total de uma ação da GUI (inclui os retries do canal)
+DEFAULT_TIMEOUT = 10.0
+
+
+def describe_error(error):
+    """Mensagem para o utilizador a partir da exceção de uma chamada"""
+    if isinstance(error, (asyncio.TimeoutError, TimeoutError)):
+        return "O serviço não respondeu dentro do prazo"
+    if isinstance(error, grpc.RpcError):
+        code = error.code()
+        if code == grpc.StatusCode.UNAVAILABLE:
+            return "Serviço indisponível"
+        if code == grpc.StatusCode.DEADLINE_EXCEEDED:
+            return "O serviço não respondeu dentro do prazo"
+        return error.details() or code.name
+    return str(error) or type(error).__name__
+
+
+class Task:
+    """Chamada em curso; cancelável a partir da thread do Tk"""
+    
+    def __init__(self, name, future, on_success, on_error, on_cancel):
+        self.name = name
+        self.future = future
+        self.on_success = on_success
+        self.on_error = on_error
+        self.on_cancel = on_cancel
+    
+    def cancel(self):
+        """Cancela a chamada (a chamada gRPC em curso também é cancelada)"""
+        self.future.cancel()
+    
+    def done(self):
+        return self.future.done()
+
+
+class Watch:
+    """
+    Stream acompanhado pela GUI, entregue no máximo uma vez por intervalo
+    
+    As linhas recebidas entre duas entregas são juntadas por chave (a
+    última ganha), por isso um intervalo com muitas atualizações custa à
+    thread do Tk apenas as linhas que de facto mudaram.
+    """
+    
+    def __init__(self, name, key):
+        self.name = name
+        self.key = key
+        self.future = None
+        self._rows = {}
+        self._lock = threading.Lock()
+    
+    def push(self, rows):
+        """Junta um lote de linhas (thread do event loop)"""
+        key = self.key
+        with self._lock:
+            for row in rows:
+                self._rows[key(row)] = row
+    
+    def take(self):
+        """Linhas alteradas desde a última entrega (thread do Tk)"""
+        with self._lock:
+            rows, self._rows = self._rows, {}
+        return list(rows.values())
+    
+    def cancel(self):
+        """Termina o stream (o callback on_end recebe None)"""
+        if self.future is not None:
+            self.future.cancel()
+
+
+class TaskRunner:
+    """
+    Executor das chamadas assíncronas de uma aplicação Tk
+    
+    As corrotinas (ex.: métodos do AsyncVotingClient) correm num event loop
+    numa thread própria, por isso a thread do Tk nunca espera pela rede.
+    Quando uma termina, a Task vai para uma fila que a thread do Tk esvazia
+    com root.after a cada `poll_ms` enquanto houver chamadas em curso; os
+    callbacks correm sempre na thread do Tk e podem alterar widgets.
+    """
+    
+    def __init__(self, root, poll_ms=15, on_busy=None):
+        """
+        Args:
+            root: Janela Tk (só é usado root.after/after_cancel)
+            poll_ms: Intervalo de entrega dos resultados, em milissegundos
+            on_busy: Callback(pending) chamado quando o número de chamadas
+                em curso muda
+        """
+        self.root = root
+        self.poll_ms = poll_ms
+        self.on_busy = on_busy
+        self.pending = set()
+        self.watches = set()
+        self._finished = queue.SimpleQueue()
+        self._after_id = None
+        
+        self.loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self.loop.run_forever, name="gui-grpc", daemon=True)
+        self._thread.start()
+    
+    def call(self, name, coroutine_function, *args, on_success=None, on_error=None,
+             on_cancel=None, timeout=DEFAULT_TIMEOUT):
+        """
+        Inicia `coroutine_function(*args)` no event loop
+        
+        Args:
+            name: Nome da ação (ex.: "vote")
+            coroutine_function: Função assíncrona a chamar
+            on_success: Callback(resultado), na thread do Tk
+            on_error: Callback(exceção), na thread do Tk
+            on_cancel: Callback(), na thread do Tk
+            timeout: Prazo total em segundos (None = sem prazo)
+        
+        Returns:
+            Task: Chamada em curso
+        """
+        async def run():
+            return await asyncio.wait_for(coroutine_function(*args), timeout)
+        
+        future = asyncio.run_coroutine_threadsafe(run(), self.loop)
+        task = Task(name, future, on_success, on_error, on_cancel)
+        self.pending.add(task)
+        future.add_done_callback(lambda _: self._finished.put(task))
+        
+        if self._after_id is None:
+            self._after_id = self.root.after(self.poll_ms, self._deliver)
+        self._notify()
+        return task
+    
+    def watch(self, name, generator_function, *args, on_update, on_end=None,
+              key=itemgetter(0), interval_ms=100):
+        """
+        Acompanha um gerador assíncrono (ex.: watch_results) sem prazo
+        
+        Args:
+            name: Nome do stream
+            generator_function: Função geradora assíncrona; cada elemento
+                é uma lista de linhas
+            on_update: Callback(linhas alteradas), na thread do Tk, no
+                máximo uma vez a cada `interval_ms`
+            on_end: Callback(exceção ou None), na thread do Tk, quando o
+                stream termina (None = fim normal ou cancelado)
+            key: Chave de cada linha para juntar atualizações
+            interval_ms: Intervalo mínimo entre entregas (limita os frames)
+        
+        Returns:
+            Watch: Stream em curso (watch.cancel() termina-o)
+        """
+        watch = Watch(name, key)
+        
+        async def consume():
+            async for rows in generator_function(*args):
+                watch.push(rows)
+        
+        watch.future = asyncio.run_coroutine_threadsafe(consume(), self.loop)
+        self.watches.add(watch)
+        
+        def tick():
+            rows = watch.take()
+            if rows:
+                on_update(rows)
+            if not watch.future.done():
+                self.root.after(interval_ms, tick)
+                return
+            
+            self.watches.discard(watch)
+            rows = watch.take()
+            if rows:
+                on_update(rows)
+            if on_end is not None:
+                future = watch.future
+                on_end(None if future.cancelled() else future.exception())
+        
+        self.root.after(interval_ms, tick)
+        return watch
+    
+    def run(self, coroutine_function, *args, timeout=DEFAULT_TIMEOUT):
+        """Executa no event loop e espera pelo resultado (arranque e fecho)"""
+        return asyncio.run_coroutine_threadsafe(coroutine_function(*args), self.loop).result(timeout)
+    
+    def busy(self, name=None):
+        """Há chamadas em curso (com este nome, se indicado)?"""
+        return any(name is None or task.name == name for task in self.pending)
+    
+    def cancel_all(self):
+        """Cancela as chamadas em curso (os streams continuam)"""
+        for task in list(self.pending):
+            task.cancel()
+    
+    def _deliver(self):
+        """Entrega os resultados prontos (thread do Tk)"""
+        self._after_id = None
+        try:
+            while True:
+                try:
+                    task = self._finished.get_nowait()
+                except queue.Empty:
+                    break
+                self.pending.discard(task)
+                self._dispatch(task)
+        finally:
+            if self.pending and self._after_id is None:
+                self._after_id = self.root.after(self.poll_ms, self._deliver)
+            self._notify()
+    
+    def _dispatch(self, task):
+        future = task.future
+        if future.cancelled():
+            if task.on_cancel is not None:
+                task.on_cancel()
+        elif future.exception() is not None:
+            if task.on_error is not None:
+                task.on_error(future.exception())
+        elif task.on_success is not None:
+            task.on_success(future.result())
+    
+    def _notify(self):
+        if self.on_busy is not None:
+            self.on_busy(len(self.pending))
+    
+    def close(self, *cleanup):
+        """
+        Cancela as chamadas em curso e para o event loop
+        
+        Args:
+            cleanup: Funções assíncronas a executar antes de parar (ex.:
+                disconnect dos clientes)
+        """
+        self.cancel_all()
+        for watch in list(self.watches):
+            watch.cancel()
+        if self._after_id is not None:
+            self.root.after_cancel(self._after_id)
+            self._after_id = None
+        for coroutine_function in cleanup:
+            try:
+                self.run(coroutine_function, timeout=2.0)
+            except Exception as e:
+                print(f"⚠️  Erro ao fechar: {e}")
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self._thread.join(timeout=2.0)
+        if not self.loop.is_running():
+            self.loop.close()
@@ -0,0 +1,165 @@
+"""
+Leituras repartidas por réplicas da AV, com pedidos de cobertura (hedging)
+A réplica menos carregada responde; se demorar mais do que o p95, pergunta-se a outra
+"""
+
+from collections import deque
+import queue
+import threading
+import time
+
+
+class LatencyTracker:
+    """Últimas latências de um método, para estimar um percentil"""
+    
+    def __init__(self, size=256):
+        self._samples = deque(maxlen=size)
+        self._lock = threading.Lock()
+    
+    def add(self, seconds):
+        with self._lock:
+            self._samples.append(seconds)
+    
+    def percentile(self, p, minimum_samples=20):
+        """
+        Returns:
+            float: Percentil `p` das amostras ou None se houver poucas
+        """
+        with self._lock:
+            if len(self._samples) < minimum_samples:
+                return None
+            ordered = sorted(self._samples)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * p / 100))]
+
+
+class Replica:
+    """Uma réplica: stub, pedidos em curso e latência média (EWMA)"""
+    
+    def __init__(self, address, stub):
+        self.address = address
+        self.stub = stub
+        self.inflight = 0
+        self.latency = 0.0
+    
+    def record(self, seconds, alpha=0.2):
+        """Atualiza a latência média (chamar com o lock do ReplicaSet)"""
+        self.latency = seconds if not self.latency else (1 - alpha) * self.latency + alpha * seconds
+
+
+class ReplicaSet:
+    """
+    Chamadas de leitura sobre várias réplicas com hedging
+    
+    Cada chamada vai para a réplica com menos pedidos em curso (empate:
+    menor latência média). Se não houver resposta ao fim do atraso de
+    hedging (por defeito o p95 observado do método) o mesmo pedido é
+    enviado à réplica seguinte e a primeira resposta ganha; o outro pedido
+    é cancelado. Uma réplica que falha passa logo o pedido à seguinte. A
+    latência de uma réplica ultrapassada conta como o tempo que já tinha
+    gasto, por isso réplicas lentas deixam de ser escolhidas primeiro.
+    """
+    
+    def __init__(self, replicas, hedge_delay=None, hedge_percentile=95,
+                 initial_delay=0.05, hedges=1):
+        """
+        Args:
+            replicas: Lista de Replica (a primeira é a preferida em empates)
+            hedge_delay: Atraso fixo antes do pedido de cobertura, em
+                segundos (None = percentil observado)
+            hedge_percentile: Percentil usado quando hedge_delay é None
+            initial_delay: Atraso enquanto não há latências suficientes
+            hedges: Pedidos de cobertura no máximo por chamada
+        """
+        self.replicas = list(replicas)
+        self.hedge_delay = hedge_delay
+        self.hedge_percentile = hedge_percentile
+        self.initial_delay = initial_delay
+        self.hedges = hedges
+        self.hedged = 0
+        self._latencies = {}
+        self._lock = threading.Lock()
+    
+    def delay(self, method):
+        """Atraso antes do pedido de cobertura para `method`"""
+        if self.hedge_delay is not None:
+            return self.hedge_delay
+        observed = self._tracker(method).percentile(self.hedge_percentile)
+        return self.initial_delay if observed is None else observed
+    
+    def _tracker(self, method):
+        with self._lock:
+            tracker = self._latencies.get(method)
+            if tracker is None:
+                tracker = self._latencies[method] = LatencyTracker()
+            return tracker
+    
+    def ranked(self):
+        """Réplicas da menos para a mais carregada"""
+        with self._lock:
+            order = {id(r): i for i, r in enumerate(self.replicas)}
+            return sorted(self.replicas, key=lambda r: (r.inflight, r.latency, order[id(r)]))
+    
+    def call(self, method, request, timeout=None):
+        """
+        Chamada unária de leitura com hedging
+        
+        Args:
+            method: Nome do método do stub (ex.: "GetResults")
+            request: Mensagem do pedido
+            timeout: Prazo de cada pedido, em segundos
+        
+        Returns:
+            Resposta da primeira réplica a responder com sucesso
+        
+        Raises:
+            grpc.RpcError: Erro da última réplica se todas falharem
+        """
+        ranked = self.ranked()
+        tracker = self._tracker(method)
+        delay = self.delay(method)
+        finished = queue.Queue()
+        calls = []
+        
+        def start(replica):
+            with self._lock:
+                replica.inflight += 1
+            future = getattr(replica.stub, method).future(request, timeout=timeout)
+            calls.append((replica, future, time.perf_counter()))
+            future.add_done_callback(lambda f: finished.put((replica, f)))
+        
+        start(ranked[0])
+        next_replica, outstanding, hedges, error = 1, 1, 0, None
+        
+        try:
+            while outstanding:
+                can_hedge = hedges < self.hedges and next_replica < len(ranked)
+                try:
+                    replica, future = finished.get(timeout=delay if can_hedge else None)
+                except queue.Empty:
+                    # Sem resposta dentro do atraso: pedido de cobertura
+                    start(ranked[next_replica])
+                    next_replica, outstanding, hedges = next_replica + 1, outstanding + 1, hedges + 1
+                    self.hedged += 1
+                    continue
+                
+                outstanding -= 1
+                if future.exception() is None:
+                    return future.result()
+                
+                # Falhou: passa logo à réplica seguinte
+                error = future.exception()
+                if next_replica < len(ranked):
+                    start(ranked[next_replica])
+                    next_replica, outstanding = next_replica + 1, outstanding + 1
+            raise error
+        finally:
+            now = time.perf_counter()
+            with self._lock:
+                for replica, future, begin in calls:
+                    replica.inflight -= 1
+                    elapsed = now - begin
+                    if future.done() and future.exception() is None:
+                        tracker.add(elapsed)
+                    replica.record(elapsed)
+            for _, future, _ in calls:
+                future.cancel()
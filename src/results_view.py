@@ -0,0 +1,77 @@
+"""
+Tabela de resultados da GUI atualizada no lugar
+Só as linhas cuja contagem mudou são alteradas; a ordem por votos é mantida com bisect
+"""
+
+from bisect import bisect_left, insort
+
+
+class ResultsView:
+    """
+    Resultados num ttk.Treeview, ordenados por votos (desc.) e id
+    
+    Cada candidato é uma linha com iid = id, criada uma vez. Uma
+    atualização altera o valor dos votos da linha e, se a posição mudou,
+    move só essa linha: o custo por atualização é proporcional às linhas
+    alteradas e não ao tamanho do boletim, e a tabela nunca é apagada (sem
+    cintilação nem perda da seleção/scroll).
+    """
+    
+    def __init__(self, tree):
+        """
+        Args:
+            tree: ttk.Treeview com as colunas ("ID", "Candidato", "Votos")
+        """
+        self.tree = tree
+        self.votes = {}
+        self.total = 0
+        # Chaves (-votos, id) pela ordem das linhas na tabela
+        self._order = []
+    
+    def apply(self, rows):
+        """
+        Aplica resultados (lista completa ou só os alterados)
+        
+        Args:
+            rows: Iterável de (id, name, votes)
+        
+        Returns:
+            int: Número de linhas alteradas
+        """
+        tree = self.tree
+        changed = 0
+        for cid, name, votes in rows:
+            old = self.votes.get(cid)
+            if old == votes:
+                continue
+            changed += 1
+            iid = str(cid)
+            
+            if old is None:
+                position = self._insert(votes, cid)
+                tree.insert("", position, iid=iid, values=(cid, name, votes))
+                self.total += votes
+                self.votes[cid] = votes
+                continue
+            
+            self.total += votes - old
+            self.votes[cid] = votes
+            tree.set(iid, "Votos", votes)
+            
+            index = bisect_left(self._order, (-old, cid))
+            del self._order[index]
+            position = self._insert(votes, cid)
+            if position != index:
+                # detach + move: a posição é relativa às restantes linhas
+                tree.detach(iid)
+                tree.move(iid, "", position)
+        return changed
+    
+    def _insert(self, votes, cid):
+        key = (-votes, cid)
+        insort(self._order, key)
+        return bisect_left(self._order, key)
+    
+    def order(self):
+        """Ids dos candidatos pela ordem da tabela"""
+        return [cid for _, cid in self._order]
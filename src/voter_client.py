@@ -3,15 +3,22 @@ Cliente gRPC para Autoridade de Registo (AR)
 Serviço: VoterRegistrationService
 """
 
+import argparse
+import asyncio
+import csv
 import grpc
 import sys
 import os
+import threading
 
 # Adiciona o diretório generated ao path
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
 
 from generated import voter_pb2
 from generated import voter_pb2_grpc
+from src.channels import (
+    ChannelPool, VOTER_SERVICE, DEFAULT_ATTEMPTS, DEFAULT_TIMEOUT, channel_options
+)
 
 
 class VoterRegistrationClient:
@@ -32,7 +39,7 @@ class VoterRegistrationClient:
     def connect(self):
         """Estabelece conexão com o servidor"""
         # Cria canal inseguro (sem TLS) para desenvolvimento
-        self.channel = grpc.insecure_channel(self.address)
+        self.channel = grpc.insecure_channel(self.address, options=channel_options(VOTER_SERVICE))
         self.stub = voter_pb2_grpc.VoterRegistrationServiceStub(self.channel)
         print(f"✓ Conectado ao serviço de registo em {self.address}")
     
@@ -66,16 +73,257 @@ class VoterRegistrationClient:
         except grpc.RpcError as e:
             print(f"✗ Erro gRPC: {e.code()}: {e.details()}")
             return False, None
+    
+    def issue_voting_credentials(self, citizen_card_numbers, window=1000):
+        """
+        Emissão em lote através de um único stream (gerador)
+        
+        No máximo `window` pedidos ficam à espera de resposta: os cartões
+        são lidos do iterável só à medida que as respostas chegam, por isso
+        a memória não depende do tamanho do lote.
+        
+        Args:
+            citizen_card_numbers: Iterável de números de cartão de cidadão
+            window: Pedidos em curso no máximo
+        
+        Yields:
+            tuple: (citizen_card_number, is_eligible, voting_credential)
+        
+        Raises:
+            grpc.RpcError: Se o stream terminar antes de todos os cartões
+                terem resposta
+        """
+        slots = threading.Semaphore(window)
+        stopped = threading.Event()
+        
+        def requests():
+            for cc in citizen_card_numbers:
+                while not slots.acquire(timeout=0.1):
+                    if stopped.is_set():
+                        return
+                yield voter_pb2.VoterRequest(citizen_card_number=cc)
+        
+        stream = self.stub.IssueVotingCredentials(requests())
+        
+        try:
+            for response in stream:
+                slots.release()
+                yield (
+                    response.citizen_card_number,
+                    response.is_eligible,
+                    response.voting_credential
+                )
+        finally:
+            stopped.set()
+            stream.cancel()
+    
+    def issue_from_csv(self, input_path, output_path, column="citizen_card_number", window=1000):
+        """
+        Emite credenciais para todos os cartões de um CSV
+        
+        Os resultados são escritos à medida que chegam, com as colunas
+        citizen_card_number, is_eligible e voting_credential. Linhas sem a
+        coluna `column` (mais curtas que o cabeçalho) são ignoradas e
+        indicadas no fim.
+        
+        Args:
+            input_path: CSV com os números de cartão de cidadão
+            output_path: CSV de saída
+            column: Coluna dos números (sem cabeçalho: primeira coluna)
+            window: Pedidos em curso no máximo
+        
+        Returns:
+            tuple: (total de cartões, elegíveis)
+        
+        Raises:
+            grpc.RpcError: Se a emissão for interrompida; o CSV de saída
+                fica só com os cartões processados até aí
+        """
+        total = eligible = 0
+        skipped = []
+        
+        with open(input_path, newline="", encoding="utf-8") as src, \
+                open(output_path, "w", newline="", encoding="utf-8") as dst:
+            rows = csv.reader(src)
+            first = next(rows, None)
+            
+            if first is not None and column in first:
+                index = first.index(column)
+                cards = _column(rows, index, skipped)
+            else:
+                cards = _chain_first(first, rows)
+            
+            writer = csv.writer(dst)
+            writer.writerow(["citizen_card_number", "is_eligible", "voting_credential"])
+            
+            try:
+                for cc, is_eligible, credential in self.issue_voting_credentials(cards, window):
+                    writer.writerow([cc, int(is_eligible), credential])
+                    total += 1
+                    eligible += is_eligible
+            except grpc.RpcError as e:
+                print(f"✗ Emissão interrompida após {total} cartões ({e.code()}: {e.details()})")
+                raise
+        
+        if skipped:
+            print(f"⚠️  {len(skipped)} linha(s) sem a coluna {column} ignorada(s): {_lines(skipped)}")
+        
+        return total, eligible
+
+
+class AsyncVoterRegistrationClient:
+    """
+    Cliente asyncio para o serviço de registo de eleitores
+    
+    Pool de canais grpc.aio com prazo por chamada, keepalive e retries
+    (ver src/channels.py). Os erros são propagados como grpc.RpcError:
+    uma falha de rede não é confundida com um cidadão não elegível.
+    """
+    
+    def __init__(self, host='localhost', port=9093, pool_size=4,
+                 timeout=DEFAULT_TIMEOUT, attempts=DEFAULT_ATTEMPTS):
+        """
+        Args:
+            host: Endereço do servidor (default: localhost)
+            port: Porta do servidor (default: 9093)
+            pool_size: Número de canais (ligações) do pool
+            timeout: Prazo de cada chamada unária, em segundos
+            attempts: Tentativas por chamada em falhas transitórias
+        """
+        self.address = f'{host}:{port}'
+        self.pool_size = pool_size
+        self.timeout = timeout
+        self.attempts = attempts
+        self.pool = None
+    
+    def connect(self):
+        """Cria o pool de canais (dentro do event loop)"""
+        self.pool = ChannelPool(
+            self.address,
+            voter_pb2_grpc.VoterRegistrationServiceStub,
+            size=self.pool_size,
+            options=channel_options(VOTER_SERVICE, self.attempts, self.timeout)
+        )
+    
+    async def disconnect(self):
+        """Fecha todos os canais"""
+        if self.pool is not None:
+            await self.pool.close()
+            self.pool = None
+    
+    async def __aenter__(self):
+        self.connect()
+        return self
+    
+    async def __aexit__(self, *exc):
+        await self.disconnect()
+    
+    async def issue_voting_credential(self, citizen_card_number):
+        """
+        Solicita credencial de voto (idempotente por cartão na AR)
+        
+        Returns:
+            tuple: (is_eligible, voting_credential)
+        
+        Raises:
+            grpc.RpcError: Se a chamada falhar depois dos retries
+        """
+        request = voter_pb2.VoterRequest(citizen_card_number=citizen_card_number)
+        response = await self.pool.stub().IssueVotingCredential(request, timeout=self.timeout)
+        return response.is_eligible, response.voting_credential
+    
+    async def issue_voting_credentials(self, citizen_card_numbers, window=1000):
+        """
+        Emissão em lote através de um único stream (gerador assíncrono)
+        
+        No máximo `window` pedidos ficam à espera de resposta.
+        
+        Yields:
+            tuple: (citizen_card_number, is_eligible, voting_credential)
+        """
+        slots = asyncio.Semaphore(window)
+        
+        async def requests():
+            for cc in citizen_card_numbers:
+                await slots.acquire()
+                yield voter_pb2.VoterRequest(citizen_card_number=cc)
+        
+        call = self.pool.stub().IssueVotingCredentials(requests())
+        try:
+            async for response in call:
+                slots.release()
+                yield (
+                    response.citizen_card_number,
+                    response.is_eligible,
+                    response.voting_credential
+                )
+        finally:
+            call.cancel()
+
+
+def _column(rows, index, skipped):
+    """
+    Coluna `index` das linhas depois do cabeçalho
+    
+    Linhas vazias são saltadas; as curtas demais são saltadas e o seu número
+    (no ficheiro, a contar do cabeçalho) é acrescentado a `skipped`.
+    """
+    for line, row in enumerate(rows, start=2):
+        if len(row) > index:
+            yield row[index]
+        elif row:
+            skipped.append(line)
+
+
+def _lines(numbers, limit=10):
+    """Números de linha para uma mensagem (no máximo `limit`)"""
+    shown = ", ".join(str(n) for n in numbers[:limit])
+    return shown + ", ..." if len(numbers) > limit else shown
+
+
+def _chain_first(first, rows):
+    """Primeira coluna de todas as linhas, incluindo a primeira já lida"""
+    if first:
+        yield first[0]
+    for row in rows:
+        if row:
+            yield row[0]
+
+
+def parse_args():
+    """Argumentos da linha de comandos"""
+    parser = argparse.ArgumentParser(description="Cliente da AR")
+    parser.add_argument("--port", type=int, default=9093,
+                        help="Porta do servidor")
+    parser.add_argument("--bulk",
+                        help="CSV de cartões de cidadão para emissão em lote")
+    parser.add_argument("--out", default="credenciais.csv",
+                        help="CSV de saída da emissão em lote")
+    parser.add_argument("--window", type=int, default=1000,
+                        help="Pedidos em curso no máximo na emissão em lote")
+    return parser.parse_args()
 
 
 def main():
     """Função de teste do cliente"""
+    args = parse_args()
     print("=== Cliente de Registo de Eleitores ===\n")
     
     # Cria e conecta cliente
-    client = VoterRegistrationClient()
+    client = VoterRegistrationClient(port=args.port)
     client.connect()
     
+    if args.bulk:
+        try:
+            total, eligible = client.issue_from_csv(args.bulk, args.out, window=args.window)
+        except grpc.RpcError:
+            print(f"\n❌ Emissão incompleta: {args.out} não tem todos os cartões")
+            sys.exit(1)
+        finally:
+            client.disconnect()
+        print(f"\n📦 {total} cartões processados, {eligible} elegíveis -> {args.out}")
+        return
+    
     # Testa com alguns números de CC
     test_cards = ["123456789", "987654321", "111222333"]
     
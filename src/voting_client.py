@@ -12,51 +12,108 @@ sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
 
 from generated import voting_pb2
 from generated import voting_pb2_grpc
+from src.channels import (
+    ChannelPool, VOTING_SERVICE, DEFAULT_ATTEMPTS, DEFAULT_TIMEOUT, channel_options
+)
+from src.candidate_cache import CandidateCache
+from src.replicas import Replica, ReplicaSet
 
 
 class VotingClient:
     """Cliente para o serviço de votação"""
     
-    def __init__(self, host='localhost', port=9091):
+    def __init__(self, host='localhost', port=9091, cache_path=None,
+                 replicas=(), hedge_delay=None):
         """
         Inicializa o cliente gRPC
         
         Args:
-            host: Endereço do servidor (default: localhost)
-            port: Porta do servidor (default: 9091)
+            host: Endereço do servidor primário (default: localhost)
+            port: Porta do servidor primário (default: 9091)
+            cache_path: Ficheiro da cache de candidatos (None = só memória;
+                ver candidate_cache.default_path)
+            replicas: Endereços (host:porta) de réplicas para leituras
+            hedge_delay: Atraso antes de repetir uma leitura noutra réplica,
+                em segundos (None = p95 observado)
         """
         self.address = f'{host}:{port}'
+        self.replica_addresses = list(replicas)
+        self.hedge_delay = hedge_delay
         self.channel = None
         self.stub = None
+        self.reads = None
+        self._replica_channels = []
+        self.candidate_cache = CandidateCache(cache_path)
     
     def connect(self):
-        """Estabelece conexão com o servidor"""
-        self.channel = grpc.insecure_channel(self.address)
+        """Estabelece conexão com o servidor (e com as réplicas de leitura)"""
+        options = channel_options(VOTING_SERVICE)
+        self.channel = grpc.insecure_channel(self.address, options=options)
         self.stub = voting_pb2_grpc.VotingServiceStub(self.channel)
+        
+        # Votos vão sempre para o primário; leituras para qualquer réplica
+        self._replica_channels = [
+            grpc.insecure_channel(address, options=options) for address in self.replica_addresses
+        ]
+        self.reads = ReplicaSet(
+            [Replica(self.address, self.stub)] + [
+                Replica(address, voting_pb2_grpc.VotingServiceStub(channel))
+                for address, channel in zip(self.replica_addresses, self._replica_channels)
+            ],
+            hedge_delay=self.hedge_delay
+        )
         print(f"✓ Conectado ao serviço de votação em {self.address}")
+        if self.replica_addresses:
+            print(f"   Réplicas de leitura: {', '.join(self.replica_addresses)}")
     
     def disconnect(self):
         """Fecha a conexão"""
+        for channel in self._replica_channels:
+            channel.close()
+        self._replica_channels = []
         if self.channel:
             self.channel.close()
             print("✓ Desconectado do serviço de votação")
     
-    def get_candidates(self):
+    def get_candidates(self, race="", district=""):
         """
         Obtém lista de candidatos
         
+        A lista em cache é revalidada com a versão do boletim: se não mudou
+        o servidor responde só "não alterado". Sem ligação ao servidor é
+        devolvida a última lista conhecida. Como o GetResults, é uma
+        leitura servida pela réplica menos carregada.
+        
+        Args:
+            race: Filtrar por eleição (default: todas)
+            district: Filtrar por círculo eleitoral (default: todos)
+        
         Returns:
             list: Lista de tuplas (id, name)
         """
+        cached = self.candidate_cache.get(race, district)
+        
         try:
-            request = voting_pb2.GetCandidatesRequest()
-            response = self.stub.GetCandidates(request)
+            request = voting_pb2.GetCandidatesRequest(
+                race=race,
+                district=district,
+                if_none_match=cached[0] if cached else ""
+            )
+            response = self.reads.call("GetCandidates", request)
+            
+            if response.not_modified and cached is not None:
+                return list(cached[1])
             
             candidates = [(c.id, c.name) for c in response.candidates]
+            if response.version:
+                self.candidate_cache.put(race, district, response.version, candidates)
             return candidates
             
         except grpc.RpcError as e:
             print(f"✗ Erro gRPC: {e.code()}: {e.details()}")
+            if cached is not None:
+                print("   A usar a lista de candidatos em cache")
+                return list(cached[1])
             return []
     
     def vote(self, voting_credential, candidate_id):
@@ -83,16 +140,44 @@ class VotingClient:
             print(f"✗ Erro gRPC: {e.code()}: {e.details()}")
             return False, str(e.details())
     
+    def vote_many(self, ballots):
+        """
+        Submete um lote de votos numa única chamada (stream de pedidos)
+        
+        Args:
+            ballots: Iterável de tuplos (voting_credential, candidate_id)
+        
+        Returns:
+            list: Lista de tuplos (success, message), pela ordem dos votos
+        """
+        ballots = list(ballots)
+        
+        try:
+            requests = (
+                voting_pb2.VoteRequest(
+                    voting_credential=credential,
+                    candidate_id=candidate_id
+                )
+                for credential, candidate_id in ballots
+            )
+            
+            response = self.stub.SubmitBallots(requests)
+            return [(r.success, r.message) for r in response.results]
+        
+        except grpc.RpcError as e:
+            print(f"✗ Erro gRPC: {e.code()}: {e.details()}")
+            return [(False, str(e.details()))] * len(ballots)
+    
     def get_results(self):
         """
-        Obtém resultados da votação
+        Obtém resultados da votação (réplica menos carregada, com hedging)
         
         Returns:
             list: Lista de tuplas (id, name, votes)
         """
         try:
             request = voting_pb2.GetResultsRequest()
-            response = self.stub.GetResults(request)
+            response = self.reads.call("GetResults", request)
             
             results = [(r.id, r.name, r.votes) for r in response.results]
             return results
@@ -100,6 +185,179 @@ class VotingClient:
         except grpc.RpcError as e:
             print(f"✗ Erro gRPC: {e.code()}: {e.details()}")
             return []
+    
+    def watch_results(self):
+        """
+        Acompanha os resultados em tempo real (gerador)
+        
+        O primeiro elemento contém todos os candidatos; os seguintes apenas
+        os candidatos cuja contagem mudou. Fechar o gerador cancela o stream.
+        
+        Yields:
+            list: Lista de tuplas (id, name, votes)
+        """
+        stream = self.stub.WatchResults(voting_pb2.WatchResultsRequest())
+        
+        try:
+            for update in stream:
+                yield [(r.id, r.name, r.votes) for r in update.results]
+        
+        except grpc.RpcError as e:
+            if e.code() != grpc.StatusCode.CANCELLED:
+                print(f"✗ Erro gRPC: {e.code()}: {e.details()}")
+        finally:
+            stream.cancel()
+
+
+class AsyncVotingClient:
+    """
+    Cliente asyncio para o serviço de votação
+    
+    Usa um pool de canais grpc.aio, com prazo por chamada, keepalive e
+    retries configurados no canal (ver src/channels.py): muitas chamadas
+    concorrentes num só processo e falhas transitórias repetidas pelo
+    próprio gRPC. Os erros que restam são propagados como grpc.RpcError em
+    vez de se confundirem com uma resposta do servidor.
+    
+    Uso:
+        async with AsyncVotingClient() as client:
+            success, message = await client.vote(credential, 1)
+    """
+    
+    def __init__(self, host='localhost', port=9091, pool_size=4,
+                 timeout=DEFAULT_TIMEOUT, attempts=DEFAULT_ATTEMPTS, cache_path=None):
+        """
+        Args:
+            host: Endereço do servidor (default: localhost)
+            port: Porta do servidor (default: 9091)
+            pool_size: Número de canais (ligações) do pool
+            timeout: Prazo de cada chamada unária, em segundos
+            attempts: Tentativas por chamada em falhas transitórias
+            cache_path: Ficheiro da cache de candidatos (None = só memória)
+        """
+        self.address = f'{host}:{port}'
+        self.pool_size = pool_size
+        self.timeout = timeout
+        self.attempts = attempts
+        self.pool = None
+        self.candidate_cache = CandidateCache(cache_path)
+    
+    def connect(self):
+        """Cria o pool de canais (dentro do event loop)"""
+        self.pool = ChannelPool(
+            self.address,
+            voting_pb2_grpc.VotingServiceStub,
+            size=self.pool_size,
+            options=channel_options(VOTING_SERVICE, self.attempts, self.timeout)
+        )
+    
+    async def disconnect(self):
+        """Fecha todos os canais"""
+        if self.pool is not None:
+            await self.pool.close()
+            self.pool = None
+    
+    async def __aenter__(self):
+        self.connect()
+        return self
+    
+    async def __aexit__(self, *exc):
+        await self.disconnect()
+    
+    async def get_candidates(self, race="", district=""):
+        """
+        Obtém lista de candidatos (cache revalidada com a versão do boletim)
+        
+        Returns:
+            list: Lista de tuplas (id, name)
+        
+        Raises:
+            grpc.RpcError: Se a chamada falhar depois dos retries
+        """
+        cached = self.candidate_cache.get(race, district)
+        request = voting_pb2.GetCandidatesRequest(
+            race=race,
+            district=district,
+            if_none_match=cached[0] if cached else ""
+        )
+        response = await self.pool.stub().GetCandidates(request, timeout=self.timeout)
+        
+        if response.not_modified and cached is not None:
+            return list(cached[1])
+        
+        candidates = [(c.id, c.name) for c in response.candidates]
+        if response.version:
+            self.candidate_cache.put(race, district, response.version, candidates)
+        return candidates
+    
+    async def vote(self, voting_credential, candidate_id):
+        """
+        Submete um voto
+        
+        Returns:
+            tuple: (success, message) da resposta do servidor
+        
+        Raises:
+            grpc.RpcError: Se a chamada falhar depois dos retries
+        """
+        request = voting_pb2.VoteRequest(
+            voting_credential=voting_credential,
+            candidate_id=candidate_id
+        )
+        response = await self.pool.stub().Vote(request, timeout=self.timeout)
+        return response.success, response.message
+    
+    async def vote_many(self, ballots, timeout=None):
+        """
+        Submete um lote de votos numa única chamada (stream de pedidos)
+        
+        Args:
+            ballots: Iterável de tuplos (voting_credential, candidate_id)
+            timeout: Prazo do lote inteiro em segundos (None = sem prazo)
+        
+        Returns:
+            list: Lista de tuplos (success, message), pela ordem dos votos
+        
+        Raises:
+            grpc.RpcError: Se a chamada falhar
+        """
+        requests = [
+            voting_pb2.VoteRequest(voting_credential=credential, candidate_id=candidate_id)
+            for credential, candidate_id in ballots
+        ]
+        # Não usa o prazo das chamadas unárias: um lote grande demora mais
+        # (ver src/channels.py)
+        response = await self.pool.stub().SubmitBallots(iter(requests), timeout=timeout)
+        return [(r.success, r.message) for r in response.results]
+    
+    async def get_results(self):
+        """
+        Obtém resultados da votação
+        
+        Returns:
+            list: Lista de tuplas (id, name, votes)
+        
+        Raises:
+            grpc.RpcError: Se a chamada falhar depois dos retries
+        """
+        response = await self.pool.stub().GetResults(
+            voting_pb2.GetResultsRequest(), timeout=self.timeout
+        )
+        return [(r.id, r.name, r.votes) for r in response.results]
+    
+    async def watch_results(self):
+        """
+        Acompanha os resultados em tempo real (gerador assíncrono, sem prazo)
+        
+        Yields:
+            list: Lista de tuplas (id, name, votes)
+        """
+        call = self.pool.stub().WatchResults(voting_pb2.WatchResultsRequest())
+        try:
+            async for update in call:
+                yield [(r.id, r.name, r.votes) for r in update.results]
+        finally:
+            call.cancel()
 
 
 def main():
@@ -116,10 +374,13 @@ def main():
     for cid, name in candidates:
         print(f"   [{cid}] {name}")
     
-    # 2. Testa votação com credencial válida
+    # 2. Testa votação com credencial válida (emitida pela AR, ver src/voter_client.py)
     print("\n🗳️  Testando voto com credencial válida:")
-    success, msg = client.vote("CRED-ABC-123", 1)
-    print(f"   {'✓' if success else '✗'} {msg}")
+    if len(sys.argv) > 1:
+        success, msg = client.vote(sys.argv[1], 1)
+        print(f"   {'✓' if success else '✗'} {msg}")
+    else:
+        print("   ⚠️  Sem credencial: python src/voting_client.py <credencial emitida pela AR>")
     
     # 3. Testa votação com credencial inválida
     print("\n🗳️  Testando voto com credencial inválida:")
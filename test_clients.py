@@ -0,0 +1,344 @@
+"""
+Testes dos clientes asyncio (pool de canais, retries e prazos)
+Servidores reais em processo, numa porta livre
+"""
+
+import sys
+import os
+import asyncio
+import multiprocessing
+import socket
+import threading
+import time
+from concurrent import futures
+sys.path.insert(0, os.path.dirname(__file__))
+
+import grpc
+
+from servers.candidates import CandidateRegistry
+from servers.credential_pool import CredentialPool
+from servers.keepalive import SERVER_OPTIONS
+from servers.signed_credentials import CredentialSigner, DEFAULT_ELECTION, load_key
+from servers.voting_server import VotingService, add_voting_service_to_server
+from servers.voter_server import VoterRegistrationService
+from src.channels import VOTER_SERVICE, VOTING_SERVICE, channel_options
+from src.voting_client import AsyncVotingClient, VotingClient
+from src.voter_client import AsyncVoterRegistrationClient
+from generated import voter_pb2
+from generated import voter_pb2_grpc
+from generated import voting_pb2
+from generated import voting_pb2_grpc
+
+
+# Mesma chave e eleição que a AR e a AV usam sem configuração
+SIGNER = CredentialSigner(load_key()[0], DEFAULT_ELECTION)
+
+
+def start_server(service, add, port=0):
+    server = grpc.server(futures.ThreadPoolExecutor(max_workers=8), options=SERVER_OPTIONS)
+    add(service, server)
+    port = server.add_insecure_port(f'127.0.0.1:{port}')
+    server.start()
+    return server, port
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def test_async_clients_concurrent_calls():
+    """Muitas chamadas concorrentes repartidas pelo pool de canais"""
+    voter = VoterRegistrationService(pool=CredentialPool(block_size=500, signer=SIGNER), registry=None)
+    voter._is_eligible = lambda cc: True
+    voter_server, voter_port = start_server(
+        voter, voter_pb2_grpc.add_VoterRegistrationServiceServicer_to_server
+    )
+    voting_server, voting_port = start_server(VotingService(), add_voting_service_to_server)
+    
+    async def run():
+        async with AsyncVoterRegistrationClient(port=voter_port, pool_size=3) as ar, \
+                AsyncVotingClient(port=voting_port, pool_size=3) as av:
+            issued = await asyncio.gather(*(
+                ar.issue_voting_credential(f"{n:09d}") for n in range(300)
+            ))
+            bulk = [r async for r in ar.issue_voting_credentials((f"{n:09d}" for n in range(250)), window=50)]
+            
+            votes = await asyncio.gather(*(av.vote(c, 1) for _, c in issued))
+            again = await av.vote(issued[0][1], 2)
+            return issued, bulk, votes, again, await av.get_results(), await av.get_candidates()
+    
+    try:
+        issued, bulk, votes, again, results, candidates = asyncio.run(run())
+    finally:
+        voter_server.stop(0)
+        voting_server.stop(0)
+        voter.pool.close()
+    
+    assert len({c for _, c in issued}) == 300
+    # Pedidos repetidos no lote devolvem as credenciais já emitidas
+    assert [c for _, _, c in bulk] == [c for _, c in issued[:250]]
+    assert all(success for success, _ in votes)
+    assert again == (False, "Esta credencial já foi utilizada")
+    assert sum(votes for _, _, votes in results) == 300
+    assert candidates
+
+
+def test_async_client_retries_until_server_is_up():
+    """Um servidor que arranca pouco depois não chega ao chamador como erro"""
+    port = free_port()
+    servers = []
+    
+    def start_later():
+        time.sleep(0.3)
+        servers.append(start_server(VotingService(), add_voting_service_to_server, port)[0])
+    
+    starter = threading.Thread(target=start_later)
+    
+    async def run():
+        async with AsyncVotingClient(port=port, attempts=5, timeout=10) as av:
+            starter.start()
+            return await av.get_candidates()
+    
+    try:
+        assert asyncio.run(run())
+    finally:
+        starter.join()
+        for server in servers:
+            server.stop(0)
+
+
+def test_async_client_raises_after_deadline():
+    """Sem servidor, o erro é propagado em vez de virar uma resposta falsa"""
+    async def run():
+        async with AsyncVotingClient(port=free_port(), attempts=2, timeout=0.5) as av:
+            await av.vote("CRED-X", 1)
+    
+    try:
+        asyncio.run(run())
+    except grpc.RpcError as e:
+        assert e.code() in (grpc.StatusCode.UNAVAILABLE, grpc.StatusCode.DEADLINE_EXCEEDED)
+    else:
+        assert False, "Vote sem servidor não falhou"
+
+
+def test_streams_outlive_unary_timeout():
+    """O prazo do service config não se aplica aos streams (WatchResults, emissão em lote)"""
+    voting = VotingService(watch_interval=0.05)
+    voting_server, voting_port = start_server(voting, add_voting_service_to_server)
+    voter = VoterRegistrationService(pool=CredentialPool(block_size=100), registry=None)
+    voter._is_eligible = lambda cc: True
+    voter_server, voter_port = start_server(
+        voter, voter_pb2_grpc.add_VoterRegistrationServiceServicer_to_server
+    )
+    stop = threading.Event()
+    
+    def cast():
+        n = 0
+        while not stop.wait(0.1):
+            voting.Vote(voting_pb2.VoteRequest(voting_credential=SIGNER.sign(n), candidate_id=1), None)
+            n += 1
+    
+    def slow_cards():
+        for n in range(8):
+            time.sleep(0.1)
+            yield voter_pb2.VoterRequest(citizen_card_number=f"{n:09d}")
+    
+    caster = threading.Thread(target=cast)
+    caster.start()
+    try:
+        with grpc.insecure_channel(
+            f'127.0.0.1:{voting_port}', options=channel_options(VOTING_SERVICE, timeout=0.3)
+        ) as channel:
+            stream = voting_pb2_grpc.VotingServiceStub(channel).WatchResults(voting_pb2.WatchResultsRequest())
+            started, updates = time.monotonic(), 0
+            for update in stream:
+                updates += 1
+                if time.monotonic() - started > 1.0:
+                    break
+            stream.cancel()
+        
+        with grpc.insecure_channel(
+            f'127.0.0.1:{voter_port}', options=channel_options(VOTER_SERVICE, timeout=0.3)
+        ) as channel:
+            issued = list(voter_pb2_grpc.VoterRegistrationServiceStub(channel).IssueVotingCredentials(slow_cards()))
+    finally:
+        stop.set()
+        caster.join()
+        voting_server.stop(0)
+        voter_server.stop(0)
+        voter.pool.close()
+    
+    assert updates > 1
+    assert len(issued) == 8 and all(r.is_eligible for r in issued)
+
+
+def test_async_vote_many_outlives_unary_timeout():
+    """O lote de votos não herda o prazo das chamadas unárias do cliente"""
+    voting = VotingService()
+    submit = voting._submit_ballots
+    
+    def slow_submit(requests):
+        time.sleep(0.5)
+        return submit(requests)
+    
+    voting._submit_ballots = slow_submit
+    server, port = start_server(voting, add_voting_service_to_server)
+    
+    async def run():
+        async with AsyncVotingClient(port=port, timeout=0.2) as av:
+            return await av.vote_many((SIGNER.sign(n), 1) for n in range(100))
+    
+    try:
+        results = asyncio.run(run())
+    finally:
+        server.stop(0)
+    
+    assert len(results) == 100 and all(success for success, _ in results)
+
+
+def test_watchers_limited_in_threaded_server():
+    """No pool de threads os observadores além do limite recebem RESOURCE_EXHAUSTED"""
+    voting = VotingService(watch_interval=0.05)
+    voting.limit_watchers(1)
+    server, port = start_server(voting, add_voting_service_to_server)
+    
+    def watch(stub):
+        """Código de estado ao abrir um stream (OK se recebeu o snapshot)"""
+        stream = stub.WatchResults(voting_pb2.WatchResultsRequest())
+        try:
+            next(stream)
+        except grpc.RpcError as e:
+            return stream, e.code()
+        return stream, grpc.StatusCode.OK
+    
+    try:
+        with grpc.insecure_channel(f'127.0.0.1:{port}') as channel:
+            stub = voting_pb2_grpc.VotingServiceStub(channel)
+            first, code = watch(stub)
+            assert code == grpc.StatusCode.OK
+            assert watch(stub)[1] == grpc.StatusCode.RESOURCE_EXHAUSTED
+            
+            # Os votos continuam a ter threads
+            response = stub.Vote(voting_pb2.VoteRequest(voting_credential=SIGNER.sign(1), candidate_id=1))
+            assert response.success
+            
+            # O lugar fica livre quando o servidor vê o cancelamento
+            first.cancel()
+            for _ in range(30):
+                stream, code = watch(stub)
+                stream.cancel()
+                if code == grpc.StatusCode.OK:
+                    break
+                time.sleep(0.1)
+            assert code == grpc.StatusCode.OK
+    finally:
+        server.stop(0)
+
+
+def test_candidate_cache_revalidation(tmp_path):
+    """Um cliente com cache em disco só recebe "não alterado" enquanto o boletim não muda"""
+    cache = str(tmp_path / "candidates.json")
+    service = VotingService()
+    replies = []
+    original = service.GetCandidates
+    service.GetCandidates = lambda request, context: replies.append(original(request, context)) or replies[-1]
+    server, port = start_server(service, add_voting_service_to_server)
+    
+    try:
+        first = VotingClient(port=port, cache_path=cache)
+        first.connect()
+        candidates = first.get_candidates()
+        first.disconnect()
+        
+        # Arranque de outro quiosque com o mesmo ficheiro de cache
+        booted = VotingClient(port=port, cache_path=cache)
+        booted.connect()
+        assert booted.get_candidates() == candidates
+        booted.disconnect()
+    finally:
+        server.stop(0)
+    
+    full = voting_pb2.GetCandidatesResponse.FromString(replies[0])
+    not_modified = voting_pb2.GetCandidatesResponse.FromString(replies[1])
+    assert full.version == service.candidates.version and len(full.candidates) == len(candidates)
+    assert not_modified.not_modified and not not_modified.candidates
+    assert len(replies[1]) < 32 < len(replies[0])
+    
+    # Boletim alterado: a versão muda e a lista nova substitui a cache
+    changed = VotingService(candidates=CandidateRegistry([(1, "Único", "", "")]))
+    server, port = start_server(changed, add_voting_service_to_server)
+    client = VotingClient(port=port, cache_path=cache)
+    client.connect()
+    try:
+        assert client.get_candidates() == [(1, "Único")]
+    finally:
+        server.stop(0).wait()
+    
+    # Servidor indisponível: última lista conhecida
+    assert client.get_candidates() == [(1, "Único")]
+    client.disconnect()
+
+
+def _replica_process(ports, read_delay):
+    """Processo com uma AV própria; leituras atrasadas `read_delay` segundos"""
+    service = VotingService()
+    for name in ("GetCandidates", "GetResults"):
+        handler = getattr(service, name)
+        
+        def slow(request, context, handler=handler):
+            time.sleep(read_delay)
+            return handler(request, context)
+        
+        setattr(service, name, slow)
+    server, port = start_server(service, add_voting_service_to_server)
+    ports.put((read_delay, port))
+    server.wait_for_termination()
+
+
+def test_hedged_reads_across_replica_processes():
+    """Leituras limitadas pela réplica mais rápida; votos sempre no primário"""
+    context = multiprocessing.get_context("spawn")
+    ports = context.Queue()
+    processes = [
+        context.Process(target=_replica_process, args=(ports, delay), daemon=True)
+        for delay in (0.5, 0.0)
+    ]
+    for process in processes:
+        process.start()
+    try:
+        # Primário com leituras lentas, réplica rápida
+        found = dict(ports.get(timeout=30) for _ in processes)
+        primary, replica = found[0.5], found[0.0]
+        
+        client = VotingClient(port=primary, replicas=[f"localhost:{replica}"], hedge_delay=0.05)
+        client.connect()
+        
+        timings = []
+        for _ in range(6):
+            start = time.perf_counter()
+            assert client.get_results()
+            timings.append(time.perf_counter() - start)
+        
+        assert client.vote(SIGNER.sign(1), 1)[0]
+        client.disconnect()
+        
+        # O primeiro pedido cobre-se na réplica rápida; depois a réplica
+        # lenta deixa de ser escolhida primeiro
+        assert max(timings) < 0.4
+        assert client.reads.hedged >= 1
+        assert client.reads.ranked()[0].address == f"localhost:{replica}"
+        
+        # O voto só existe na contagem do primário
+        totals = {}
+        for port in (primary, replica):
+            direct = VotingClient(port=port)
+            direct.connect()
+            totals[port] = sum(votes for _, _, votes in direct.get_results())
+            direct.disconnect()
+        assert totals == {primary: 1, replica: 0}
+    finally:
+        for process in processes:
+            process.terminate()
+            process.join()
@@ -0,0 +1,393 @@
+"""
+Testes das credenciais de voto (AR -> AV)
+Verifica o pool pré-gerado e a verificação das credenciais assinadas na AV
+"""
+
+import sys
+import os
+import asyncio
+import csv
+import threading
+import time
+from concurrent import futures
+sys.path.insert(0, os.path.dirname(__file__))
+
+import grpc
+
+from servers.credential_pool import CredentialPool
+from servers.signed_credentials import CredentialSigner, SerialKeys, serial_of
+from servers.journal import VoteJournal
+from servers.snapshot import Compactor
+from servers.citizen_registry import CitizenRegistry, build_index
+from servers import issuance_map
+from servers.issuance_map import IssuanceMap
+from servers.voting_server import VotingService
+from servers.voter_server import AsyncVoterRegistrationService, VoterRegistrationService
+from src.voter_client import VoterRegistrationClient
+from generated import voting_pb2
+from generated import voter_pb2
+from generated import voter_pb2_grpc
+
+
+def test_pool_issues_unique_credentials_concurrently():
+    """Emissões concorrentes nunca repetem credenciais, mesmo com reabastecimentos"""
+    pool = CredentialPool(block_size=100)
+    issued = []
+    lock = threading.Lock()
+    
+    def worker():
+        mine = [pool.issue() for _ in range(500)]
+        with lock:
+            issued.extend(mine)
+    
+    threads = [threading.Thread(target=worker) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    pool.close()
+    
+    assert len(issued) == 4000
+    assert len(set(issued)) == 4000
+    assert pool.issued == 4000
+
+
+def test_av_verifies_signed_credentials(tmp_path):
+    """A AV aceita só credenciais assinadas pela AR, sem consultar nada"""
+    path = str(tmp_path / "pool.dat")
+    signer = CredentialSigner(b"chave-de-teste", "eleicao-1")
+    pool = CredentialPool(path, block_size=10, signer=signer)
+    issued = pool.issue_many(35)
+    pool.close()
+    
+    service = VotingService(verifier=CredentialSigner(b"chave-de-teste", "eleicao-1"))
+    
+    def vote(credential):
+        request = voting_pb2.VoteRequest(voting_credential=credential, candidate_id=1)
+        return service.Vote(request, None)
+    
+    assert all(vote(c).success for c in issued)
+    assert vote(issued[0]).message == "Esta credencial já foi utilizada"
+    
+    # MAC alterado, outra eleição, outra chave e credenciais de demonstração
+    fresh = signer.sign(1000)
+    assert not vote(fresh[:-1] + ("0" if fresh[-1] != "0" else "1")).success
+    assert not vote(CredentialSigner(b"chave-de-teste", "eleicao-2").sign(1000)).success
+    assert not vote(CredentialSigner(b"outra-chave", "eleicao-1").sign(1000)).success
+    assert not vote("CRED-ABC-123").success
+    assert vote(fresh).success
+    
+    # A mesma série com zeros à esquerda não é outra credencial
+    serial, mac = fresh[len("CRED-"):].split("-")
+    for padded in (f"CRED-0{serial}-{mac}", f"CRED-0000{serial}-{mac}"):
+        assert signer.verify(padded) is None
+        assert not vote(padded).success
+    
+    # Reinício da AR: a numeração continua, sem reutilizar números de série
+    restarted = CredentialPool(path, block_size=10, signer=signer)
+    again = restarted.issue()
+    restarted.close()
+    assert serial_of(again) == 40
+    assert vote(again).success
+    assert service.tally.total() == 37
+
+
+def test_signed_credentials_journal_replay(tmp_path):
+    """Com credenciais assinadas o diário e os snapshots guardam números de série"""
+    directory = str(tmp_path)
+    signer = CredentialSigner(b"chave-de-teste")
+    journal = VoteJournal(directory, flush_window=0.001)
+    service = VotingService(journal=journal, verifier=signer)
+    compactor = Compactor(journal, key=SerialKeys().key)
+    
+    def vote(target, serial):
+        request = voting_pb2.VoteRequest(voting_credential=signer.sign(serial), candidate_id=serial % 4 + 1)
+        return target.Vote(request, None).success
+    
+    assert all(vote(service, n) for n in range(0, 600, 3))
+    compactor.run_once()
+    assert all(vote(service, n) for n in range(1, 60, 3))
+    journal.close()
+    
+    restarted = VotingService(journal=VoteJournal(directory), verifier=signer)
+    assert restarted.tally.results() == service.tally.results()
+    assert restarted.tally.total() == 220
+    assert not vote(restarted, 3) and not vote(restarted, 4)
+    assert vote(restarted, 5)
+
+
+def test_bulk_issuance_from_csv(tmp_path):
+    """Emissão em lote: uma resposta por cartão, pela ordem do CSV"""
+    service = VoterRegistrationService(pool=CredentialPool(block_size=500), bulk_batch=64)
+    server = grpc.server(futures.ThreadPoolExecutor(max_workers=4))
+    voter_pb2_grpc.add_VoterRegistrationServiceServicer_to_server(service, server)
+    port = server.add_insecure_port('127.0.0.1:0')
+    server.start()
+    
+    cards = [f"{n:09d}" for n in range(3000)]
+    source, output = tmp_path / "cards.csv", tmp_path / "out.csv"
+    source.write_text("citizen_card_number\n" + "\n".join(cards) + "\n")
+    
+    client = VoterRegistrationClient(host='127.0.0.1', port=port)
+    client.connect()
+    try:
+        total, eligible = client.issue_from_csv(str(source), str(output), window=100)
+    finally:
+        client.disconnect()
+        server.stop(0)
+        service.pool.close()
+    
+    with open(output, newline="") as f:
+        rows = list(csv.DictReader(f))
+    
+    assert total == 3000
+    assert [r["citizen_card_number"] for r in rows] == cards
+    credentials = [r["voting_credential"] for r in rows if r["is_eligible"] == "1"]
+    assert len(credentials) == eligible == service.pool.issued
+    assert len(set(credentials)) == eligible
+
+
+def test_bulk_issuance_skips_short_rows(tmp_path, capsys):
+    """Linhas sem a coluna dos cartões são ignoradas e indicadas, sem parar o lote"""
+    service = VoterRegistrationService(pool=CredentialPool(block_size=50), registry=None)
+    service._is_eligible = lambda cc: True
+    server = grpc.server(futures.ThreadPoolExecutor(max_workers=4))
+    voter_pb2_grpc.add_VoterRegistrationServiceServicer_to_server(service, server)
+    port = server.add_insecure_port('127.0.0.1:0')
+    server.start()
+    
+    source, output = tmp_path / "cards.csv", tmp_path / "out.csv"
+    source.write_text("name,citizen_card_number\nAna,111\nRui\n\nEva,222\n")
+    
+    client = VoterRegistrationClient(host='127.0.0.1', port=port)
+    client.connect()
+    try:
+        total, eligible = client.issue_from_csv(str(source), str(output), window=10)
+    finally:
+        client.disconnect()
+        server.stop(0)
+        service.pool.close()
+    
+    with open(output, newline="") as f:
+        rows = list(csv.DictReader(f))
+    
+    assert (total, eligible) == (2, 2)
+    assert [r["citizen_card_number"] for r in rows] == ["111", "222"]
+    assert "1 linha(s) sem a coluna citizen_card_number ignorada(s): 3" in capsys.readouterr().out
+
+
+def test_bulk_issuance_reports_interrupted_stream(tmp_path):
+    """Um stream interrompido é um erro, não um lote mais curto"""
+    service = VoterRegistrationService(pool=CredentialPool(block_size=500), bulk_batch=16)
+    issue = service.IssueVotingCredentials
+    
+    def interrupted(request_iterator, context):
+        for n, response in enumerate(issue(request_iterator, context)):
+            if n == 40:
+                context.abort(grpc.StatusCode.UNAVAILABLE, "AR a reiniciar")
+            yield response
+    
+    service.IssueVotingCredentials = interrupted
+    server = grpc.server(futures.ThreadPoolExecutor(max_workers=4))
+    voter_pb2_grpc.add_VoterRegistrationServiceServicer_to_server(service, server)
+    port = server.add_insecure_port('127.0.0.1:0')
+    server.start()
+    
+    source, output = tmp_path / "cards.csv", tmp_path / "out.csv"
+    source.write_text("\n".join(f"{n:09d}" for n in range(80)) + "\n")
+    
+    client = VoterRegistrationClient(host='127.0.0.1', port=port)
+    client.connect()
+    try:
+        client.issue_from_csv(str(source), str(output), window=20)
+    except grpc.RpcError as e:
+        assert e.code() == grpc.StatusCode.UNAVAILABLE
+    else:
+        assert False, "Emissão interrompida terminou sem erro"
+    finally:
+        client.disconnect()
+        server.stop(0)
+        service.pool.close()
+    
+    with open(output, newline="") as f:
+        assert len(list(csv.DictReader(f))) == 40
+
+
+def test_citizen_registry_index(tmp_path):
+    """Índice do caderno: ordenação externa, duplicados e pesquisa por bisseção"""
+    source, index = tmp_path / "roll.csv", tmp_path / "roll.idx"
+    cards = [f"{n * 7919 % 100_003:08d}ZZ{n % 10}" for n in range(5000)]
+    source.write_text("nome,citizen_card_number\n" + "".join(f"X,{c}\n" for c in cards + cards[:100]))
+    
+    assert build_index(str(source), str(index), run_size=700) == 5000
+    
+    registry = CitizenRegistry(str(index))
+    try:
+        assert len(registry) == 5000
+        assert all(c in registry for c in cards[::37])
+        assert f"{cards[5][:8]} zz{cards[5][-1]}" in registry
+        assert "99999999ZZ0" not in registry
+        assert "" not in registry and "X" * 40 not in registry
+        
+        service = VoterRegistrationService(pool=CredentialPool(block_size=10), registry=registry)
+        assert service._is_eligible(cards[0]) and not service._is_eligible("123")
+        service.pool.close()
+    finally:
+        registry.close()
+    
+    # Números não ASCII não colidem com outros ("ABÇ1" não é "AB?1")
+    source.write_text("AB?1\nCD2\n")
+    assert build_index(str(source), str(index)) == 2
+    registry = CitizenRegistry(str(index))
+    try:
+        assert "ab?1" in registry
+        assert "ABÇ1" not in registry and "ABЗ1" not in registry
+    finally:
+        registry.close()
+    
+    source.write_text("ABÇ1\n")
+    try:
+        build_index(str(source), str(index))
+    except ValueError as e:
+        assert "ASCII" in str(e)
+    else:
+        assert False, "Índice aceitou um número não ASCII"
+
+
+def test_issuance_is_idempotent_per_card(tmp_path):
+    """Pedidos repetidos devolvem a mesma credencial, também após reinício"""
+    path = str(tmp_path / "issued.dat")
+    pool = CredentialPool(block_size=50)
+    service = VoterRegistrationService(pool=pool, issued=IssuanceMap(path), registry=["111", "222", "333"])
+    
+    def issue(cc):
+        response = service.IssueVotingCredential(voter_pb2.VoterRequest(citizen_card_number=cc), None)
+        return response.is_eligible, response.voting_credential
+    
+    first = issue("111")
+    assert first[0]
+    assert all(issue("111") == first for _ in range(10))
+    assert not issue("999")[0]
+    
+    # Lote com repetições: uma credencial por cartão
+    batch = service._issue_batch([
+        voter_pb2.VoterRequest(citizen_card_number=cc) for cc in ["222", "111", "222", "333"]
+    ])
+    credentials = [r.voting_credential for r in batch]
+    assert credentials[1] == first[1] and credentials[0] == credentials[2]
+    assert len(set(credentials)) == 3
+    assert pool.issued == 3
+    
+    service.issued.close()
+    pool.close()
+    
+    # Reinício (com um registo incompleto no fim do ficheiro)
+    with open(path, "ab") as f:
+        f.write(b"\x01\x02\x03")
+    restarted = IssuanceMap(path)
+    assert len(restarted) == 3
+    assert restarted.get("333") == credentials[3]
+    assert restarted.get(" 111 ") == first[1]
+    restarted.close()
+
+
+def test_async_issuance_does_not_block_the_event_loop(tmp_path):
+    """Com --aio, um pool à espera de um bloco novo não para o event loop"""
+    pool = CredentialPool(block_size=50)
+    service = VoterRegistrationService(pool=pool, issued=IssuanceMap(), registry=["111"])
+    adapter = AsyncVoterRegistrationService(service)
+    release = threading.Event()
+    issue_many = pool.issue_many
+    
+    def slow_issue_many(count):
+        release.wait(5)
+        return issue_many(count)
+    
+    pool.issue_many = slow_issue_many
+    
+    async def main():
+        call = asyncio.ensure_future(
+            adapter.IssueVotingCredential(voter_pb2.VoterRequest(citizen_card_number="111"), None)
+        )
+        # O loop continua a correr enquanto o pedido espera pelo pool
+        await asyncio.sleep(0.05)
+        assert not call.done()
+        release.set()
+        return await asyncio.wait_for(call, 5)
+    
+    response = asyncio.run(main())
+    assert response.is_eligible and response.voting_credential.startswith("CRED-")
+    pool.close()
+
+
+def test_issuance_map_group_commit(tmp_path, monkeypatch):
+    """Cada atribuição só é devolvida em disco; pedidos concorrentes partilham fsyncs"""
+    path = str(tmp_path / "issued.dat")
+    synced = []
+    
+    def slow_fsync(fd):
+        time.sleep(0.005)
+        synced.append(os.fstat(fd).st_size)
+    
+    monkeypatch.setattr(issuance_map.os, "fsync", slow_fsync)
+    issued = IssuanceMap(path, fsync=True)
+    pool = CredentialPool(block_size=50)
+    late = []
+    
+    def assign(worker):
+        for n in range(20):
+            cc = f"{worker}-{n}"
+            issued.get_or_assign([cc], pool.issue_many)
+            # O registo deste cartão já está coberto por um fsync
+            with open(path, "rb") as f:
+                end = f.read().index(issuance_map.card_digest(cc)) + issuance_map._RECORD_SIZE
+            if max(synced, default=0) < end:
+                late.append(cc)
+    
+    threads = [threading.Thread(target=assign, args=(w,)) for w in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    
+    assert not late
+    assert synced[-1] == 160 * issuance_map._RECORD_SIZE
+    assert len(synced) < 160
+    issued.close()
+    pool.close()
+
+
+def test_issuance_map_allocates_outside_the_lock(tmp_path):
+    """Um pool bloqueado não atrasa outros cartões; o mesmo cartão espera pela reserva"""
+    issued = IssuanceMap(str(tmp_path / "issued.dat"))
+    pool = CredentialPool(block_size=50)
+    entered = threading.Event()
+    release = threading.Event()
+    
+    def blocked(count):
+        entered.set()
+        release.wait(5)
+        return pool.issue_many(count)
+    
+    with futures.ThreadPoolExecutor(max_workers=2) as executor:
+        first = executor.submit(issued.get_or_assign, ["111"], blocked)
+        assert entered.wait(5)
+        
+        # Outro cartão é atribuído enquanto o primeiro espera pelo pool
+        [(other, new)] = issued.get_or_assign(["222"], pool.issue_many)
+        assert new and issued.get("222") == other
+        assert issued.get("111") is None
+        
+        # O mesmo cartão não retira outra credencial: fica à espera da reserva
+        same = executor.submit(issued.get_or_assign, ["111"], pool.issue_many)
+        time.sleep(0.05)
+        assert not same.done()
+        
+        release.set()
+        [(credential, new)] = first.result(5)
+        assert new
+        assert same.result(5) == [(credential, False)]
+    
+    assert len(issued) == 2 and issued.get("111") == credential
+    issued.close()
+    pool.close()
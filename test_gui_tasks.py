@@ -0,0 +1,244 @@
+"""
+Testes das partes da GUI que não precisam de ecrã
+Executor de chamadas (a janela Tk é substituída por um objeto com after), tabela de resultados e pesquisa de candidatos
+"""
+
+import sys
+import os
+import asyncio
+import random
+import threading
+import time
+from concurrent import futures
+sys.path.insert(0, os.path.dirname(__file__))
+
+import grpc
+
+from servers.keepalive import SERVER_OPTIONS
+from servers.signed_credentials import CredentialSigner, load_key
+from servers.voting_server import VotingService, add_voting_service_to_server
+from src.gui_tasks import TaskRunner, describe_error
+from src.results_view import ResultsView
+from src.candidate_index import CandidateIndex
+from src.voting_client import AsyncVotingClient
+
+
+class FakeRoot:
+    """root.after sem Tk: os callbacks correm quando o teste chama pump()"""
+    
+    def __init__(self):
+        self.scheduled = {}
+        self.ids = iter(range(1, 1_000_000))
+        self.thread = threading.get_ident()
+    
+    def after(self, ms, callback):
+        assert threading.get_ident() == self.thread
+        after_id = next(self.ids)
+        self.scheduled[after_id] = callback
+        return after_id
+    
+    def after_cancel(self, after_id):
+        self.scheduled.pop(after_id, None)
+    
+    def pump(self, until, timeout=5.0):
+        """Corre os callbacks agendados até `until()` ser verdadeiro"""
+        deadline = time.monotonic() + timeout
+        while not until() and time.monotonic() < deadline:
+            for after_id in list(self.scheduled):
+                self.scheduled.pop(after_id)()
+            time.sleep(0.005)
+        assert until()
+
+
+def test_results_delivered_on_tk_thread():
+    """Resultado, erro, prazo e cancelamento chegam como callbacks da thread do Tk"""
+    root = FakeRoot()
+    busy = []
+    runner = TaskRunner(root, poll_ms=5, on_busy=busy.append)
+    delivered = {}
+    
+    def record(name):
+        def callback(*value):
+            assert threading.get_ident() == root.thread
+            delivered[name] = value
+        return callback
+    
+    async def answer(value):
+        await asyncio.sleep(0.01)
+        return value
+    
+    async def fail():
+        raise ValueError("falhou")
+    
+    async def hang():
+        await asyncio.sleep(60)
+    
+    try:
+        runner.call("ok", answer, 42, on_success=record("ok"))
+        runner.call("error", fail, on_error=record("error"))
+        runner.call("timeout", hang, on_error=record("timeout"), timeout=0.05)
+        cancelled = runner.call("cancel", hang, on_cancel=record("cancel"))
+        assert runner.busy("cancel") and busy[-1] == 4
+        cancelled.cancel()
+        
+        root.pump(lambda: len(delivered) == 4)
+    finally:
+        runner.close()
+    
+    assert delivered["ok"] == (42,)
+    assert str(delivered["error"][0]) == "falhou"
+    assert describe_error(delivered["timeout"][0]) == "O serviço não respondeu dentro do prazo"
+    assert delivered["cancel"] == ()
+    assert busy[-1] == 0 and not runner.busy()
+
+
+def test_grpc_calls_do_not_block_caller():
+    """Chamadas ao AsyncVotingClient a partir da "thread do Tk" devolvem logo"""
+    server = grpc.server(futures.ThreadPoolExecutor(max_workers=4), options=SERVER_OPTIONS)
+    service = VotingService()
+    slow = threading.Event()
+    get_results = service.GetResults
+    
+    def slow_results(request, context):
+        slow.wait(5)
+        return get_results(request, context)
+    
+    service.GetResults = slow_results
+    add_voting_service_to_server(service, server)
+    port = server.add_insecure_port('127.0.0.1:0')
+    server.start()
+    
+    root = FakeRoot()
+    runner = TaskRunner(root, poll_ms=5)
+    client = AsyncVotingClient(port=port, pool_size=1)
+    
+    async def connect():
+        client.connect()
+    
+    results = []
+    try:
+        runner.run(connect)
+        started = time.perf_counter()
+        runner.call("results", client.get_results, on_success=results.append)
+        runner.call("vote", client.vote, CredentialSigner(load_key()[0]).sign(1), 1, on_success=results.append)
+        assert time.perf_counter() - started < 0.016
+        
+        # O voto responde enquanto GetResults ainda espera no servidor
+        root.pump(lambda: len(results) == 1)
+        assert results[0][0] is True
+        slow.set()
+        root.pump(lambda: len(results) == 2)
+    finally:
+        slow.set()
+        runner.close(client.disconnect)
+        server.stop(0)
+    
+    assert sum(votes for _, _, votes in results[1]) == 1
+
+
+class FakeTree:
+    """Operações do ttk.Treeview usadas pelo ResultsView, sobre uma lista"""
+    
+    def __init__(self):
+        self.rows = []
+        self.values = {}
+        self.calls = 0
+    
+    def insert(self, parent, index, iid, values):
+        self.calls += 1
+        self.rows.insert(index, iid)
+        self.values[iid] = list(values)
+    
+    def set(self, iid, column, value):
+        self.calls += 1
+        self.values[iid][2] = value
+    
+    def detach(self, iid):
+        self.calls += 1
+        self.rows.remove(iid)
+    
+    def move(self, iid, parent, index):
+        self.calls += 1
+        assert iid not in self.rows
+        self.rows.insert(index, iid)
+
+
+def test_results_view_updates_in_place():
+    """Só as linhas alteradas mudam e a ordem por votos mantém-se"""
+    tree = FakeTree()
+    view = ResultsView(tree)
+    rng = random.Random(7)
+    votes = {cid: 0 for cid in range(1, 2001)}
+    view.apply([(cid, f"Candidato {cid}", 0) for cid in votes])
+    
+    for _ in range(50):
+        changed = rng.sample(sorted(votes), 10)
+        for cid in changed:
+            votes[cid] += rng.randint(1, 5)
+        before = tree.calls
+        assert view.apply([(cid, f"Candidato {cid}", votes[cid]) for cid in changed]) == 10
+        # set + (detach + move) por linha alterada, nunca o boletim inteiro
+        assert tree.calls - before <= 30
+        
+        expected = sorted(votes, key=lambda cid: (-votes[cid], cid))
+        assert tree.rows == [str(cid) for cid in expected]
+    
+    assert view.apply([(1, "Candidato 1", votes[1])]) == 0
+    assert view.total == sum(votes.values())
+    assert all(tree.values[str(cid)][2] == v for cid, v in votes.items())
+
+
+def test_watch_coalesces_updates_per_frame():
+    """Atualizações entre duas entregas chegam juntas, uma linha por candidato"""
+    root = FakeRoot()
+    runner = TaskRunner(root)
+    
+    async def feed():
+        yield [(1, "A", 0), (2, "B", 0)]
+        for n in range(1, 101):
+            yield [(1 + n % 2, "AB"[n % 2], n)]
+    
+    updates, ended = [], []
+    try:
+        watch = runner.watch("results", feed, on_update=updates.append, on_end=ended.append,
+                             interval_ms=100)
+        watch.future.result(5)
+        root.pump(lambda: ended)
+    finally:
+        runner.close()
+    
+    assert ended == [None]
+    assert len(updates) == 1
+    assert sorted(updates[0]) == [(1, "A", 100), (2, "B", 99)]
+
+
+def test_candidate_index_prefix_search():
+    """Prefixos de qualquer palavra (sem acentos) ou do id, pela ordem do boletim"""
+    index = CandidateIndex([
+        (1, "Maria Silva"), (2, "João Santos"), (3, "Ana Costa"),
+        (4, "Pedro Oliveira"), (12, "Joana Sá"),
+    ])
+    assert [cid for cid, _ in index.search("jo")] == [2, 12]
+    assert [cid for cid, _ in index.search("JOÃO")] == [2]
+    assert [cid for cid, _ in index.search("sa")] == [2, 12]
+    assert [cid for cid, _ in index.search("joa s")] == [2, 12]
+    assert [cid for cid, _ in index.search("santos joão")] == [2]
+    assert [cid for cid, _ in index.search("1")] == [1, 12]
+    assert index.search("xyz") == []
+    assert len(index.search("  ")) == 5
+    
+    # Boletim grande (várias eleições): construção e pesquisa em milissegundos
+    first = ["Ana", "Bruno", "Carla", "Diogo", "Eva", "Filipe", "Gonçalo", "Helena"]
+    last = ["Silva", "Santos", "Ferreira", "Pereira", "Oliveira", "Costa", "Rodrigues", "Martins"]
+    ballot = [
+        (cid, f"{first[cid % 8]} {last[cid // 8 % 8]} {cid // 64}")
+        for cid in range(1, 50_001)
+    ]
+    started = time.perf_counter()
+    big = CandidateIndex(ballot)
+    built = time.perf_counter() - started
+    started = time.perf_counter()
+    found = big.search("pereira gonç")
+    searched = time.perf_counter() - started
+    assert len(found) == 781 and all(name.startswith("Gonçalo Pereira ") for _, name in found)
+    assert built < 0.5 and searched < 0.05
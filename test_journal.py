@@ -0,0 +1,220 @@
+"""
+Testes do diário de votos da AV
+Verifica group commit, reconstrução da contagem, caudas truncadas e snapshots
+"""
+
+import sys
+import os
+import threading
+from concurrent import futures
+sys.path.insert(0, os.path.dirname(__file__))
+
+import grpc
+
+from servers import journal as journal_module
+from servers.journal import VoteJournal, list_segments, segment_path
+from servers import snapshot as snapshot_module
+from servers.snapshot import Compactor, list_snapshots, recover
+from servers.keepalive import SERVER_OPTIONS
+from servers.signed_credentials import CredentialSigner, SerialKeys, load_key
+from servers.voting_server import VotingService, add_voting_service_to_server
+from generated import voting_pb2
+from generated import voting_pb2_grpc
+
+
+# Credenciais como as da AR (a AV verifica o MAC com a mesma chave)
+SIGNER = CredentialSigner(load_key()[0])
+
+
+def cast_votes(service, threads=8, per_thread=50, first=0):
+    """Vota em paralelo através do handler Vote (séries a partir de `first`)"""
+    def worker(index):
+        for n in range(per_thread):
+            request = voting_pb2.VoteRequest(
+                voting_credential=SIGNER.sign(first + index * per_thread + n),
+                candidate_id=n % 4 + 1
+            )
+            service.Vote(request, None)
+    
+    pool = [threading.Thread(target=worker, args=(i,)) for i in range(threads)]
+    for t in pool:
+        t.start()
+    for t in pool:
+        t.join()
+
+
+def test_journal_replay_rebuilds_tally(tmp_path):
+    """Reiniciar o serviço com o mesmo diário recupera os votos"""
+    journal = VoteJournal(str(tmp_path), flush_window=0.001)
+    service = VotingService(journal=journal)
+    cast_votes(service)
+    journal.close()
+    
+    restarted = VotingService(journal=VoteJournal(str(tmp_path)))
+    assert restarted.tally.results() == service.tally.results()
+    assert restarted.tally.total() == 400
+    assert restarted.tally.is_used(SIGNER.sign(3 * 50 + 7))
+
+
+def test_journal_discards_torn_tail(tmp_path):
+    """Um registo incompleto no fim de um segmento é descartado"""
+    journal = VoteJournal(str(tmp_path), flush_window=0)
+    journal.append("CRED-1", 1).result()
+    journal.append("CRED-2", 2).result()
+    journal.close()
+    
+    with open(segment_path(str(tmp_path), 1), "ab") as f:
+        f.write(b"\x10\x00\x00\x00\xff")
+    
+    journal = VoteJournal(str(tmp_path), flush_window=0)
+    journal.append("CRED-3", 3).result()
+    journal.close()
+    
+    _, tail = recover(str(tmp_path))
+    assert tail == [("CRED-1", 1), ("CRED-2", 2), ("CRED-3", 3)]
+
+
+def test_snapshot_compacts_segments(tmp_path):
+    """O snapshot substitui os segmentos fechados e o arranque só lê a cauda"""
+    directory = str(tmp_path)
+    journal = VoteJournal(directory, flush_window=0.001)
+    service = VotingService(journal=journal)
+    compactor = Compactor(journal, key=SerialKeys().key)
+    
+    cast_votes(service)
+    compactor.run_once()
+    cast_votes(service, first=1000)
+    compactor.run_once()
+    # Cauda por compactar
+    cast_votes(service, threads=2, per_thread=10, first=2000)
+    journal.close()
+    
+    assert list_snapshots(directory) == [2]
+    assert list_segments(directory) == [3]
+    
+    snapshot, tail = recover(directory)
+    assert sum(snapshot.counts.values()) == 800
+    assert len(tail) == 20
+    
+    restarted = VotingService(journal=VoteJournal(directory))
+    assert restarted.tally.results() == service.tally.results()
+    assert restarted.tally.is_used(SIGNER.sign(0)) and restarted.tally.is_used(SIGNER.sign(2019))
+    
+    # Uma credencial do snapshot continua a não poder ser reutilizada
+    request = voting_pb2.VoteRequest(voting_credential=SIGNER.sign(1255), candidate_id=1)
+    assert not restarted.Vote(request, None).success
+
+
+def test_compaction_syncs_directory_before_deleting(tmp_path, monkeypatch):
+    """Os segmentos só são apagados depois de o rename do snapshot estar em disco"""
+    directory = str(tmp_path)
+    journal = VoteJournal(directory, flush_window=0.001)
+    service = VotingService(journal=journal)
+    compactor = Compactor(journal, key=SerialKeys().key)
+    events = []
+    
+    fsync_directory = snapshot_module._fsync_directory
+    remove = os.remove
+    
+    def record_fsync(path):
+        events.append(("fsync", path, tuple(list_snapshots(path))))
+        fsync_directory(path)
+    
+    def record_remove(path):
+        events.append(("remove", path))
+        remove(path)
+    
+    monkeypatch.setattr(snapshot_module, "_fsync_directory", record_fsync)
+    monkeypatch.setattr(snapshot_module.os, "remove", record_remove)
+    
+    cast_votes(service, threads=2, per_thread=10)
+    compactor.run_once()
+    journal.close()
+    
+    assert events[0] == ("fsync", directory, (1,))
+    assert [kind for kind, *_ in events[1:]] == ["remove"]
+
+
+class FailingFile:
+    """Ficheiro do segmento cuja próxima escrita falha a meio (disco cheio)"""
+    
+    def __init__(self, file):
+        self.file = file
+        self.fail = True
+    
+    def write(self, data):
+        if self.fail:
+            self.fail = False
+            self.file.write(data[:len(data) // 2])
+            raise OSError(28, "No space left on device")
+        return self.file.write(data)
+    
+    def __getattr__(self, name):
+        return getattr(self.file, name)
+
+
+def test_journal_latches_write_errors(tmp_path):
+    """Depois de uma escrita falhada nenhum voto é confirmado por cima de um registo parcial"""
+    directory = str(tmp_path)
+    journal = VoteJournal(directory, flush_window=0)
+    assert journal.append("CRED-1", 1).result(5) == 1
+    
+    journal._file = FailingFile(journal._file)
+    failed = journal.append("CRED-2", 2)
+    assert isinstance(failed.exception(5), OSError)
+    
+    # O ficheiro voltaria a aceitar escritas, mas o diário continua em falha
+    try:
+        journal.append("CRED-3", 3)
+    except OSError as e:
+        assert e is journal.error
+    else:
+        assert False, "Diário aceitou um voto depois de uma escrita falhada"
+    journal.close()
+    
+    _, tail = recover(directory)
+    assert tail == [("CRED-1", 1)]
+
+
+def test_journal_failure_is_fatal(tmp_path, monkeypatch):
+    """Um voto que o diário não confirma aborta a chamada e a AV deixa de aceitar votos"""
+    journal = VoteJournal(str(tmp_path), flush_window=0)
+    service = VotingService(journal=journal)
+    stopped = []
+    service.on_fatal = lambda: stopped.append(True)
+    
+    server = grpc.server(futures.ThreadPoolExecutor(max_workers=4), options=SERVER_OPTIONS)
+    add_voting_service_to_server(service, server)
+    port = server.add_insecure_port('127.0.0.1:0')
+    server.start()
+    channel = grpc.insecure_channel(f'127.0.0.1:{port}')
+    stub = voting_pb2_grpc.VotingServiceStub(channel)
+    
+    def vote(credential):
+        """Código de estado do Vote (OK se o voto foi aceite)"""
+        try:
+            response = stub.Vote(voting_pb2.VoteRequest(voting_credential=credential, candidate_id=1), timeout=5)
+        except grpc.RpcError as e:
+            return e.code()
+        assert response.success
+        return grpc.StatusCode.OK
+    
+    def failing_fsync(fd):
+        raise OSError(5, "Input/output error")
+    
+    try:
+        assert vote(SIGNER.sign(1)) == grpc.StatusCode.OK
+        
+        monkeypatch.setattr(journal_module.os, "fsync", failing_fsync)
+        assert vote(SIGNER.sign(2)) == grpc.StatusCode.UNAVAILABLE
+        assert stopped == [True] and isinstance(service.journal_error, OSError)
+        
+        # Votos seguintes são recusados antes de chegarem à contagem
+        total = service.tally.total()
+        assert vote(SIGNER.sign(3)) == grpc.StatusCode.UNAVAILABLE
+        assert service.tally.total() == total and not service.tally.is_used(SIGNER.sign(3))
+        assert stopped == [True]
+    finally:
+        channel.close()
+        server.stop(0)
+        journal.close()
@@ -0,0 +1,168 @@
+"""
+Testes das métricas dos servidores
+Buckets dos histogramas, interceptores (pool de threads e asyncio), endpoint e profiler
+"""
+
+import sys
+import os
+import asyncio
+import json
+import threading
+import time
+import urllib.request
+from concurrent import futures
+sys.path.insert(0, os.path.dirname(__file__))
+
+import grpc
+
+from servers import metrics
+from servers.keepalive import SERVER_OPTIONS
+from servers.voting_server import AsyncVotingService, VotingService, add_voting_service_to_server
+from generated import voting_pb2
+from generated import voting_pb2_grpc
+
+
+def test_buckets_bound_relative_error():
+    """Cada latência cai num bucket cujo limite superior erra no máximo 12,5%"""
+    previous = -1
+    for micros in list(range(0, 5000)) + [10 ** k + d for k in range(4, 10) for d in (-1, 0, 1)]:
+        index = metrics.bucket_index(micros)
+        assert index >= previous
+        assert micros < metrics.bucket_upper(index)
+        if micros >= 16:
+            assert metrics.bucket_upper(index) <= micros * 1.125 + 1
+        previous = index
+    assert metrics.bucket_index(10 ** 15) == metrics.BUCKETS - 1
+
+
+def failing_service():
+    """AV em que GetResults falha e GetCandidates aborta com NOT_FOUND"""
+    service = VotingService()
+    
+    def broken(request, context):
+        raise RuntimeError("falha simulada")
+    
+    def not_found(request, context):
+        context.abort(grpc.StatusCode.NOT_FOUND, "sem boletim")
+    
+    service.GetResults = broken
+    service.GetCandidates = not_found
+    return service
+
+
+def test_interceptor_records_latency_and_codes(tmp_path):
+    """Contagens, códigos de erro e percentis por método; endpoint HTTP e dump"""
+    admin = metrics.MetricsAdmin(port=0, directory=str(tmp_path))
+    server = grpc.server(
+        futures.ThreadPoolExecutor(max_workers=8),
+        options=SERVER_OPTIONS, interceptors=admin.interceptors()
+    )
+    add_voting_service_to_server(failing_service(), server)
+    port = server.add_insecure_port('127.0.0.1:0')
+    server.start()
+    
+    try:
+        with grpc.insecure_channel(f'127.0.0.1:{port}') as channel:
+            stub = voting_pb2_grpc.VotingServiceStub(channel)
+            threads = [
+                threading.Thread(target=lambda t=t: [
+                    stub.Vote(voting_pb2.VoteRequest(voting_credential=f"CRED-M-{t}-{n}", candidate_id=1))
+                    for n in range(25)
+                ])
+                for t in range(4)
+            ]
+            for t in threads:
+                t.start()
+            for t in threads:
+                t.join()
+            for request, call in (
+                (voting_pb2.GetResultsRequest(), stub.GetResults),
+                (voting_pb2.GetCandidatesRequest(), stub.GetCandidates),
+            ):
+                try:
+                    call(request)
+                except grpc.RpcError:
+                    pass
+        
+        summary = admin.metrics.summary()["methods"]
+        with urllib.request.urlopen(f"http://127.0.0.1:{admin.port}/metrics") as response:
+            text = response.read().decode()
+    finally:
+        server.stop(0)
+        admin.close()
+    
+    assert summary["Vote"]["count"] == 100
+    assert summary["Vote"]["codes"] == {"OK": 100}
+    assert summary["Vote"]["inflight"] == 0
+    assert 0 < summary["Vote"]["p50_ms"] <= summary["Vote"]["p99_ms"]
+    assert summary["GetResults"]["codes"] == {"UNKNOWN": 1}
+    assert summary["GetCandidates"]["codes"] == {"NOT_FOUND": 1}
+    
+    assert 'grpc_server_handling_seconds_count{method="Vote"} 100' in text
+    assert 'grpc_server_handled_total{method="GetCandidates",code="NOT_FOUND"} 1' in text
+    
+    dumped = json.loads((tmp_path / f"metrics-{os.getpid()}.json").read_text())
+    assert dumped["methods"]["Vote"]["count"] == 100
+
+
+def test_async_interceptor_counts_streams():
+    """Servidor grpc.aio: unários e streams (cancelados pelo cliente)"""
+    collected = metrics.Metrics()
+    
+    async def run():
+        server = grpc.aio.server(interceptors=[metrics.AsyncMetricsInterceptor(collected)])
+        add_voting_service_to_server(AsyncVotingService(VotingService(watch_interval=0.01)), server)
+        port = server.add_insecure_port('127.0.0.1:0')
+        await server.start()
+        try:
+            async with grpc.aio.insecure_channel(f'127.0.0.1:{port}') as channel:
+                stub = voting_pb2_grpc.VotingServiceStub(channel)
+                for n in range(10):
+                    await stub.Vote(voting_pb2.VoteRequest(voting_credential=f"CRED-A-{n}", candidate_id=1))
+                call = stub.WatchResults(voting_pb2.WatchResultsRequest())
+                await call.read()
+                call.cancel()
+                # O fim do stream é registado quando o servidor vê o cancelamento
+                for _ in range(100):
+                    if "WatchResults" in collected.summary()["methods"] and \
+                            collected.summary()["methods"]["WatchResults"]["count"]:
+                        break
+                    await asyncio.sleep(0.02)
+        finally:
+            await server.stop(0)
+    
+    asyncio.run(run())
+    summary = collected.summary()["methods"]
+    assert summary["Vote"]["codes"] == {"OK": 10}
+    assert summary["WatchResults"]["codes"] == {"CANCELLED": 1}
+    assert summary["WatchResults"]["inflight"] == 0
+
+
+def test_profiler_on_demand(tmp_path):
+    """POST /profile amostra as stacks das outras threads durante N segundos"""
+    admin = metrics.MetricsAdmin(port=0, directory=str(tmp_path), profile_interval=0.001)
+    stop = threading.Event()
+    
+    def busy_worker():
+        while not stop.is_set():
+            sum(range(1000))
+    
+    worker = threading.Thread(target=busy_worker)
+    worker.start()
+    try:
+        request = urllib.request.Request(
+            f"http://127.0.0.1:{admin.port}/profile?seconds=0.2", method="POST"
+        )
+        with urllib.request.urlopen(request) as response:
+            path = json.loads(response.read())["path"]
+        deadline = time.monotonic() + 5
+        while admin.sampler.last_path != path and time.monotonic() < deadline:
+            time.sleep(0.05)
+    finally:
+        stop.set()
+        worker.join()
+        admin.close(dump=False)
+    
+    with open(path, encoding="utf-8") as f:
+        stacks = f.read()
+    assert "busy_worker" in stacks
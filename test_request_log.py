@@ -0,0 +1,96 @@
+"""
+Testes do registo de pedidos dos servidores
+Verifica escrita em lote, formato JSON, amostragem e descarte com destino lento
+"""
+
+import sys
+import os
+import io
+import json
+import threading
+import time
+sys.path.insert(0, os.path.dirname(__file__))
+
+from servers import request_log
+from servers.request_log import RequestLog, INFO, ERROR
+from servers.signed_credentials import CredentialSigner, load_key
+from servers.voting_server import VotingService
+from generated import voting_pb2
+
+
+class SlowStream(io.StringIO):
+    """Destino que demora a escrever (ex.: pipe cheio)"""
+    
+    def __init__(self, delay):
+        super().__init__()
+        self.delay = delay
+        self.writes = 0
+    
+    def write(self, text):
+        self.writes += 1
+        time.sleep(self.delay)
+        return super().write(text)
+
+
+def test_handler_records_written_as_json():
+    """Os handlers registam eventos estruturados, escritos pela thread do log"""
+    stream = io.StringIO()
+    log = RequestLog(stream=stream, fmt="json")
+    service = VotingService(log=log)
+    
+    credential = CredentialSigner(load_key()[0]).sign(1)
+    service.Vote(voting_pb2.VoteRequest(voting_credential=credential, candidate_id=1), None)
+    service.Vote(voting_pb2.VoteRequest(voting_credential=credential, candidate_id=1), None)
+    service.Vote(voting_pb2.VoteRequest(voting_credential="X", candidate_id=1), None)
+    log.close()
+    
+    records = [json.loads(line) for line in stream.getvalue().splitlines()]
+    assert [r["result"] for r in records] == ["accepted", "already_used", "invalid_credential"]
+    assert all(r["event"] == "vote" and r["level"] == "info" for r in records)
+
+
+def test_sampling_and_level():
+    """Amostragem por nível e nível mínimo"""
+    stream = io.StringIO()
+    log = RequestLog(stream=stream, level=INFO, sampling=request_log.parse_sampling(["info=0"]))
+    
+    log.debug("ignored")
+    log.info("sampled.out")
+    log.error("kept", code=1)
+    log.close()
+    
+    lines = stream.getvalue().splitlines()
+    assert len(lines) == 1
+    assert "ERROR" in lines[0] and "kept code=1" in lines[0]
+
+
+def test_slow_sink_does_not_block_handlers():
+    """Com o destino lento os pedidos não esperam: DEBUG é descartado primeiro"""
+    stream = SlowStream(delay=0.2)
+    log = RequestLog(stream=stream, flush_interval=0.01, max_pending=100)
+    
+    # Primeiro lote ocupa a thread de escrita
+    log.info("first")
+    time.sleep(0.05)
+    
+    start = time.perf_counter()
+    threads = [
+        threading.Thread(target=lambda: [log.debug("noise", n=n) for n in range(1000)])
+        for _ in range(4)
+    ]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    log.info("after")
+    log.log(ERROR, "important")
+    elapsed = time.perf_counter() - start
+    
+    assert elapsed < 0.2
+    assert log.dropped > 0
+    log.close()
+    
+    output = stream.getvalue()
+    assert "important" in output and "after" in output and "log.dropped" in output
+    assert output.count("noise") <= 50
+    assert stream.writes <= 3
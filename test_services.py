@@ -5,8 +5,10 @@ Verifica se os servidores AR e AV estão acessíveis
 
 import sys
 import os
+import secrets
 sys.path.insert(0, os.path.dirname(__file__))
 
+from servers.signed_credentials import CredentialSigner, load_key
 from src.voter_client import VoterRegistrationClient
 from src.voting_client import VotingClient
 
@@ -58,9 +60,10 @@ def test_voting_service():
         else:
             print("   ❌ FALHA - Nenhum candidato retornado")
         
-        # 2. Testa votar (credencial válida)
+        # 2. Testa votar (credencial válida, assinada como a AR a emitiria)
         print("\n🗳️  Testando Vote (credencial válida)...")
-        success, msg = client.vote("CRED-ABC-123", 1)
+        credential = CredentialSigner(load_key()[0]).sign(secrets.randbelow(10 ** 8))
+        success, msg = client.vote(credential, 1)
         if success:
             print(f"   ✅ SUCESSO - {msg}")
         else:
@@ -0,0 +1,251 @@
+"""
+Teste de concorrência do motor de contagem da AV
+Verifica que cada credencial conta uma única vez e que os totais são exatos
+"""
+
+import sys
+import os
+import multiprocessing
+import threading
+sys.path.insert(0, os.path.dirname(__file__))
+
+from servers.tally import TallyEngine, CastResult, credential_digest
+from servers.results_feed import ResultsFeed
+from servers.shared_tally import SharedTally
+from servers.credential_store import CredentialStore
+from servers.candidates import CandidateRegistry
+from servers.voting_server import VotingService
+from servers.signed_credentials import CredentialSigner, load_key
+from generated import voting_pb2
+
+
+THREADS = 16
+CREDENTIALS = 2000
+# Credenciais como as da AR (a AV verifica o MAC com a mesma chave)
+SIGNER = CredentialSigner(load_key()[0])
+
+
+def test_tally_exactly_once():
+    """Várias threads disputam as mesmas credenciais"""
+    engine = TallyEngine([1, 2, 3, 4])
+    accepted = [0] * THREADS
+    barrier = threading.Barrier(THREADS)
+    
+    def worker(index):
+        barrier.wait()
+        for n in range(CREDENTIALS):
+            # Todas as threads tentam usar todas as credenciais
+            if engine.cast(f"CRED-{n}", n % 4 + 1) is CastResult.ACCEPTED:
+                accepted[index] += 1
+    
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(THREADS)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    
+    assert sum(accepted) == CREDENTIALS
+    assert engine.total() == CREDENTIALS
+    assert engine.results() == {cid: CREDENTIALS // 4 for cid in (1, 2, 3, 4)}
+
+
+def test_tally_rejects_unknown_candidate():
+    """Candidato inexistente não consome a credencial"""
+    engine = TallyEngine([1, 2])
+    
+    assert engine.cast("CRED-X", 9) is CastResult.UNKNOWN_CANDIDATE
+    assert engine.cast("CRED-X", 1) is CastResult.ACCEPTED
+    assert engine.cast("CRED-X", 2) is CastResult.ALREADY_USED
+    assert engine.results() == {1: 1, 2: 0}
+
+
+def test_vote_handler_concurrent():
+    """VotingService.Vote chamado em paralelo mantém totais exatos"""
+    service = VotingService()
+    barrier = threading.Barrier(THREADS)
+    per_thread = 200
+    
+    def worker(index):
+        barrier.wait()
+        for n in range(per_thread):
+            request = voting_pb2.VoteRequest(
+                voting_credential=SIGNER.sign(index * per_thread + n),
+                candidate_id=n % 4 + 1
+            )
+            assert service.Vote(request, None).success
+    
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(THREADS)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    
+    response = voting_pb2.GetResultsResponse.FromString(
+        service.GetResults(voting_pb2.GetResultsRequest(), None)
+    )
+    assert sum(r.votes for r in response.results) == THREADS * per_thread
+
+
+def test_cast_many_single_critical_section():
+    """Lotes concorrentes com credenciais repetidas contam uma vez"""
+    engine = TallyEngine([1, 2, 3, 4])
+    batch = [(f"CRED-{n}", n % 4 + 1) for n in range(CREDENTIALS)]
+    # Duplicado dentro do próprio lote
+    batch.append(("CRED-0", 1))
+    accepted = [0] * THREADS
+    barrier = threading.Barrier(THREADS)
+    
+    def worker(index):
+        barrier.wait()
+        results = engine.cast_many(batch)
+        accepted[index] = results.count(CastResult.ACCEPTED)
+    
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(THREADS)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    
+    assert sum(accepted) == CREDENTIALS
+    assert engine.total() == CREDENTIALS
+
+
+def test_results_feed_deltas():
+    """O feed envia snapshot inicial e depois só os candidatos alterados"""
+    engine = TallyEngine([1, 2, 3])
+    feed = ResultsFeed(engine, [(1, "A"), (2, "B"), (3, "C")], interval=60)
+    
+    seq, first = feed.subscribe()
+    assert first.snapshot
+    assert [r.votes for r in first.results] == [0, 0, 0]
+    
+    engine.cast("CRED-1", 2)
+    engine.cast("CRED-2", 2)
+    feed.tick()
+    seq, delta = feed.wait(seq, timeout=1)
+    assert not delta.snapshot
+    assert [(r.id, r.votes) for r in delta.results] == [(2, 2)]
+    
+    # Sem alterações não há nova mensagem
+    feed.tick()
+    assert feed.wait(seq, timeout=0.05) is None
+    
+    # Observador atrasado recebe snapshot completo
+    engine.cast("CRED-3", 1)
+    feed.tick()
+    engine.cast("CRED-4", 3)
+    feed.tick()
+    seq, update = feed.wait(seq, timeout=1)
+    assert update.snapshot
+    assert [r.votes for r in update.results] == [1, 2, 1]
+    feed.stop()
+
+
+
+def test_results_cache_follows_version():
+    """GetResults devolve os mesmos bytes até haver um voto novo"""
+    service = VotingService()
+    request = voting_pb2.GetResultsRequest()
+    
+    first = service.GetResults(request, None)
+    assert service.GetResults(request, None) is first
+    
+    vote = voting_pb2.VoteRequest(voting_credential=SIGNER.sign(1), candidate_id=3)
+    assert service.Vote(vote, None).success
+    
+    response = voting_pb2.GetResultsResponse.FromString(service.GetResults(request, None))
+    assert [r.votes for r in response.results] == [0, 0, 1, 0]
+
+
+def test_candidate_registry_filters():
+    """Registo indexado por eleição e círculo"""
+    registry = CandidateRegistry([
+        (1, "A", "Presidencial", ""),
+        (2, "B", "Legislativas", "Lisboa"),
+        (3, "C", "Legislativas", "Porto"),
+        (4, "D", "Legislativas", "Lisboa"),
+    ])
+    service = VotingService(candidates=registry)
+    
+    def ids(race="", district=""):
+        raw = service.GetCandidates(
+            voting_pb2.GetCandidatesRequest(race=race, district=district), None
+        )
+        # Respostas em cache vêm já serializadas
+        if isinstance(raw, bytes):
+            raw = voting_pb2.GetCandidatesResponse.FromString(raw)
+        return [c.id for c in raw.candidates]
+    
+    assert ids() == [1, 2, 3, 4]
+    assert ids(race="Legislativas") == [2, 3, 4]
+    assert ids(race="Legislativas", district="Lisboa") == [2, 4]
+    assert ids(district="Porto") == [3]
+    assert ids(race="Autárquicas") == []
+    
+    # Boletim sem círculos: cada candidato aparece uma vez na sua eleição
+    ballot = CandidateRegistry([(1, "A", "Presidencial", ""), (2, "B", "Presidencial", "")])
+    assert [c.id for c in ballot.filter("Presidencial")] == [1, 2]
+    assert [c.id for c in ballot.filter("Presidencial", "")] == [1, 2]
+    assert [c.id for c in CandidateRegistry.load().filter("Presidencial")] == [1, 2, 3, 4]
+    
+    vote = voting_pb2.VoteRequest(voting_credential=SIGNER.sign(1), candidate_id=4)
+    assert service.Vote(vote, None).message.endswith("D")
+    assert 5 not in registry
+
+
+def _cast_in_process(tally, credentials):
+    for i, credential in enumerate(credentials):
+        tally.cast(credential, 1 + i % 2)
+
+
+def test_shared_tally_across_processes():
+    """Credenciais sobrepostas entre processos contam uma única vez"""
+    tally = SharedTally([1, 2], capacity=10_000)
+    context = multiprocessing.get_context("fork")
+    credentials = [f"CRED-{i}" for i in range(1000)]
+    
+    try:
+        # Cada processo tenta usar todas as credenciais
+        workers = [
+            context.Process(target=_cast_in_process, args=(tally, credentials))
+            for _ in range(4)
+        ]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        
+        assert all(worker.exitcode == 0 for worker in workers)
+        assert tally.total() == 1000
+        assert sum(tally.results().values()) == 1000
+        assert tally.is_used("CRED-999")
+        assert tally.cast("CRED-0", 1) == CastResult.ALREADY_USED
+        assert tally.cast("CRED-NEW", 2) == CastResult.ACCEPTED
+    finally:
+        tally.close()
+
+
+def test_credential_store_exact_membership():
+    """Tabela compacta: semântica de set, também ao crescer e com Bloom"""
+    for bloom_bits in (0, 10):
+        store = CredentialStore(capacity=8, bloom_bits=bloom_bits)
+        digests = [credential_digest(f"CRED-{i}") for i in range(5000)]
+        
+        assert all(store.add(d) for d in digests[:2500])
+        assert not any(store.add(d) for d in digests[:2500])
+        assert all(d in store for d in digests[:2500])
+        assert not any(d in store for d in digests[2500:])
+        
+        # O digest a zeros coincide com o slot vazio
+        zero = bytes(16)
+        assert zero not in store
+        assert store.add(zero) and zero in store
+        assert len(store) == 2501
+        assert sorted(store) == sorted(digests[:2500] + [zero])
+    
+    # Com valores: cada valor acompanha o seu digest quando a tabela cresce
+    store = CredentialStore(capacity=8, value_size=4)
+    for i, d in enumerate(digests):
+        store.put(d, i.to_bytes(4, "little"))
+    assert store.nbytes > 5000 * 20
+    assert all(store.get(d) == i.to_bytes(4, "little") for i, d in enumerate(digests))